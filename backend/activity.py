@@ -0,0 +1,235 @@
+"""
+Recent activity feed for the DevHub API
+
+New posts, comments and post likes are recorded as they happen: each event is
+stored as an Activity row in the same transaction as the write, and once the
+transaction commits its feed entry (who did what on which post, with the
+names and avatar as they were then) is pushed onto a capped list holding the
+newest ACTIVITY_STREAM_LENGTH entries. Reading the feed takes a slice of that
+list and never joins comments, posts and users.
+
+The list lives in Redis, or in process memory when ACTIVITY_STORE is set to
+"memory". It is reloaded from the Activity table when it is missing, e.g.
+after a Redis restart, and after writes that change entries already in it:
+unlikes and deletions retract their events, and renamed posts or users
+refresh the names shown.
+"""
+
+import collections
+import itertools
+import json
+import logging
+import threading
+from datetime import datetime, timezone
+from redis.exceptions import RedisError
+from sqlalchemy import delete, desc, func
+from config import app, db, redis_client
+from models import Activity, Post, User
+from avatars import avatar_path, SMALL
+
+logger = logging.getLogger(__name__)
+
+POST = "post"
+COMMENT = "comment"
+LIKE = "like"
+
+# Text shown between the user's name and the post title
+ACTIONS = {
+    POST: "published",
+    COMMENT: "commented on",
+    LIKE: "liked",
+}
+
+
+def serialize_activity(activity, user, post):
+    """Builds the feed entry of an event."""
+    return {
+        "id": activity.id,
+        "type": activity.kind,
+        "user": {
+            "id": user.id,
+            "name": user.full_name,
+            "avatar": avatar_path(user.profile_pic, SMALL)
+        },
+        "post": {
+            "id": post.id,
+            "title": post.title
+        },
+        "action": ACTIONS[activity.kind],
+        "timestamp": activity.created.isoformat()
+    }
+
+
+class MemoryActivityStore:
+    """Newest feed entries held in process memory."""
+
+    def __init__(self, length):
+        self.length = length
+        self._entries = None
+        self._lock = threading.Lock()
+
+    def push(self, entry):
+        """Adds an entry, unless the store has not been loaded yet."""
+        with self._lock:
+            if self._entries is not None:
+                self._entries.appendleft(entry)
+
+    def latest(self, count):
+        """Returns the newest entries, or None if the store has not been loaded."""
+        with self._lock:
+            if self._entries is None:
+                return None
+            return list(itertools.islice(self._entries, count))
+
+    def replace(self, entries):
+        with self._lock:
+            self._entries = collections.deque(entries[:self.length], maxlen=self.length)
+
+
+class RedisActivityStore:
+    """Newest feed entries held in a capped Redis list shared by every worker."""
+
+    def __init__(self, client, length, key="activity:stream"):
+        self.client = client
+        self.length = length
+        self.key = key
+
+    def push(self, entry):
+        """Adds an entry, unless the list has not been loaded yet."""
+        with self.client.pipeline() as pipe:
+            # LPUSHX leaves a missing list missing, so it is loaded in full on the next read
+            pipe.lpushx(self.key, json.dumps(entry))
+            pipe.ltrim(self.key, 0, self.length - 1)
+            pipe.execute()
+
+    def latest(self, count):
+        """Returns the newest entries, or None if the list is missing."""
+        entries = self.client.lrange(self.key, 0, count - 1)
+        if not entries:
+            # Redis deletes empty lists, so this is also the answer for an empty feed
+            return None
+        return [json.loads(entry) for entry in entries]
+
+    def replace(self, entries):
+        staging_key = f"{self.key}:staging"
+        with self.client.pipeline() as pipe:
+            pipe.delete(staging_key)
+            if entries:
+                pipe.rpush(staging_key, *[json.dumps(entry) for entry in entries[:self.length]])
+                pipe.rename(staging_key, self.key)
+            else:
+                pipe.delete(self.key)
+            pipe.execute()
+
+
+class ActivityStream:
+    """Recent activity feed recorded at write time.
+
+    Args:
+        store: MemoryActivityStore or RedisActivityStore holding the newest entries
+        length (int): Number of entries kept in the store
+    """
+
+    def __init__(self, store, length):
+        self.store = store
+        self.length = length
+
+    def record(self, kind, user, post, comment=None):
+        """Stores an event in the current transaction.
+
+        Pass the returned entry to publish() once the transaction commits.
+
+        Args:
+            kind (str): POST, COMMENT or LIKE
+            user (User): User who acted
+            post (Post): Post acted on
+            comment (Comment, optional): Comment added, for COMMENT events
+
+        Returns:
+            dict: Feed entry of the event
+        """
+        activity = Activity(kind=kind, user_id=user.id, post_id=post.id,
+                            comment_id=comment.id if comment is not None else None,
+                            # Naive UTC, like the database's CURRENT_TIMESTAMP
+                            created=datetime.now(timezone.utc).replace(tzinfo=None))
+        db.session.add(activity)
+        db.session.flush()
+        return serialize_activity(activity, user, post)
+
+    def publish(self, entry):
+        """Adds a committed event to the feed.
+
+        Failures are logged rather than raised; the event is still in the
+        database and shows up when the feed is next reloaded.
+        """
+        try:
+            self.store.push(entry)
+        except RedisError as exc:
+            logger.warning("Could not publish activity %s: %s", entry["id"], exc)
+
+    def retract(self, **criteria):
+        """Deletes the events matching the given Activity columns in the current transaction.
+
+        Call refresh() once the transaction commits if any were deleted.
+
+        Returns:
+            int: Number of events deleted
+        """
+        conditions = [getattr(Activity, column) == value for column, value in criteria.items()]
+        return db.session.execute(delete(Activity).where(*conditions)).rowcount
+
+    def recorded_at(self, **criteria):
+        """Returns when the first event matching the given Activity columns was recorded, or None."""
+        conditions = [getattr(Activity, column) == value for column, value in criteria.items()]
+        return db.session.scalar(db.select(func.min(Activity.created)).where(*conditions))
+
+    def load(self, count):
+        """Reads the newest entries from the database."""
+        rows = db.session.execute(
+            db.select(Activity, User, Post)
+            .join(User, Activity.user_id == User.id)
+            .join(Post, Activity.post_id == Post.id)
+            .order_by(desc(Activity.id))
+            .limit(count)
+        ).all()
+        return [serialize_activity(activity, user, post) for activity, user, post in rows]
+
+    def refresh(self):
+        """Reloads the store from the database."""
+        try:
+            self.store.replace(self.load(self.length))
+        except RedisError as exc:
+            logger.warning("Could not reload the activity feed: %s", exc)
+
+    def latest(self, count=10):
+        """Returns the newest feed entries, newest first.
+
+        Args:
+            count (int): Number of entries, at most the stream length
+
+        Returns:
+            list: Feed entries
+        """
+        count = min(count, self.length)
+        try:
+            entries = self.store.latest(count)
+            if entries is None:
+                entries = self.load(self.length)
+                self.store.replace(entries)
+        except RedisError as exc:
+            logger.warning("Could not read the activity feed: %s", exc)
+            return self.load(count)
+        return entries[:count]
+
+
+def create_activity_stream():
+    """Builds the activity stream configured for the app."""
+    length = app.config["ACTIVITY_STREAM_LENGTH"]
+    if app.config["ACTIVITY_STORE"] == "memory":
+        store = MemoryActivityStore(length)
+    else:
+        store = RedisActivityStore(redis_client, length)
+    return ActivityStream(store, length)
+
+
+activity_stream = create_activity_stream()
@@ -0,0 +1,135 @@
+"""
+Association table writes for the DevHub API
+
+Likes and bookmarks are rows in association tables keyed by (owner, user).
+Instead of loading a user's whole liked_posts or bookmarked_posts collection
+to test one membership, the endpoints probe and write the single row by its
+primary key, so their cost does not grow with how much a user has liked.
+"""
+
+from sqlalchemy import delete, exists, select
+from sqlalchemy.exc import IntegrityError
+from config import db
+from counters import adjust_counter
+
+
+def ignoring_conflicts(table, conflict_columns):
+    """Builds an INSERT that skips rows colliding on a unique key.
+
+    Uses INSERT ... ON CONFLICT DO NOTHING on PostgreSQL and SQLite and
+    INSERT IGNORE on MySQL.
+
+    Args:
+        table: Table to insert into
+        conflict_columns (list): Columns of the unique key that may collide
+
+    Returns:
+        Insert: The statement, or None if the database has no such clause
+    """
+    dialect = db.session.get_bind().dialect.name
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+        return insert(table).on_conflict_do_nothing(index_elements=conflict_columns)
+    if dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+        return insert(table).on_conflict_do_nothing(index_elements=conflict_columns)
+    if dialect in ("mysql", "mariadb"):
+        return table.insert().prefix_with("IGNORE")
+    return None
+
+
+def insert_ignoring_conflicts(table, rows, conflict_columns):
+    """Inserts rows, skipping those that collide on a unique key.
+
+    Databases without a clause for it (see ignoring_conflicts()) insert row
+    by row in savepoints.
+
+    Args:
+        table: Table to insert into
+        rows (list): Dicts of column values
+        conflict_columns (list): Columns of the unique key that may collide
+
+    Returns:
+        int: Number of rows inserted. Drivers do not report this for
+            multi-row inserts, which count every row as inserted.
+    """
+    if not rows:
+        return 0
+    statement = ignoring_conflicts(table, conflict_columns)
+    if statement is None:
+        inserted = 0
+        for row in rows:
+            try:
+                with db.session.begin_nested():
+                    db.session.execute(table.insert(), row)
+                inserted += 1
+            except IntegrityError:
+                pass
+        return inserted
+
+    if len(rows) == 1:
+        return db.session.execute(statement, rows[0]).rowcount
+    db.session.execute(statement, rows)
+    return len(rows)
+
+
+def _key_clause(table, key):
+    return [table.c[column] == value for column, value in key.items()]
+
+
+def has_association(table, **key):
+    """Checks whether an association row exists, by primary key.
+
+    Args:
+        table: Association table, e.g. post_likes
+        **key: Primary key column values, e.g. post_id=1, user_id=2
+
+    Returns:
+        bool: True if the row exists
+    """
+    return db.session.execute(select(exists().where(*_key_clause(table, key)))).scalar()
+
+
+def associated_ids(table, owner_column, owner_ids, user_id):
+    """Returns which of many owners a user has an association row with.
+
+    Args:
+        table: Association table, e.g. post_likes
+        owner_column (str): Column holding the owner's ID, e.g. "post_id"
+        owner_ids (list): IDs to check
+        user_id (int): ID of the user
+
+    Returns:
+        set: The subset of owner_ids with a row for the user
+    """
+    if not owner_ids:
+        return set()
+    return set(db.session.execute(
+        select(table.c[owner_column])
+        .where(table.c.user_id == user_id, table.c[owner_column].in_(owner_ids))
+    ).scalars())
+
+
+def toggle_association(table, counter, counted_id, **key):
+    """Deletes an association row if it exists and inserts it otherwise.
+
+    The counter column is adjusted in the same transaction only when a row
+    was actually deleted or inserted, so concurrent toggles cannot push it
+    out of step with the table.
+
+    Args:
+        table: Association table, e.g. post_likes
+        counter: Counter column tracking the table, e.g. Post.like_count
+        counted_id (int): Primary key of the row holding the counter
+        **key: Primary key column values of the association row
+
+    Returns:
+        bool: True if the row exists after the toggle
+    """
+    deleted = db.session.execute(delete(table).where(*_key_clause(table, key))).rowcount
+    if deleted:
+        adjust_counter(counter, counted_id, -deleted)
+        return False
+    if insert_ignoring_conflicts(table, [key], list(key)):
+        adjust_counter(counter, counted_id, 1)
+    return True
@@ -0,0 +1,153 @@
+"""
+Profile picture processing for the DevHub API
+
+Uploaded profile pictures are cropped to squares and resized once, at upload
+time, to each size in AVATAR_SIZES. Every variant is written as WebP and as
+JPEG under a name derived from the SHA-256 of the uploaded file, e.g.
+avatars/3f2a...-48.webp. A name therefore always refers to the same bytes, so
+/uploads/avatars/<digest>-<size> is served with an immutable, year-long
+Cache-Control header, picking WebP or JPEG from the request's Accept header.
+
+User.profile_pic holds "avatars/<digest>" for processed pictures. API
+responses reference the variant fitting where the avatar is shown through
+avatar_path(); pictures uploaded before processing existed, and the default
+picture, are referenced as they are until `flask avatars-rebuild` runs.
+"""
+
+import hashlib
+import io
+import os
+import tempfile
+import click
+from PIL import Image, ImageOps, UnidentifiedImageError
+from config import app, db
+from models import User
+
+AVATAR_PREFIX = "avatars/"
+
+# Comment authors and listings, post headers, profile pages
+SMALL = 48
+MEDIUM = 128
+LARGE = 512
+AVATAR_SIZES = (SMALL, MEDIUM, LARGE)
+
+# Format served for each negotiated MIME type, and the file extension it is stored under
+FORMATS = {
+    "image/webp": ("WEBP", "webp"),
+    "image/jpeg": ("JPEG", "jpg"),
+}
+
+
+class InvalidImage(ValueError):
+    """Raised when an upload cannot be decoded as an image."""
+
+
+def variant_filename(digest, size, mimetype):
+    """Returns the file name of a stored variant within AVATAR_FOLDER."""
+    return f"{digest}-{size}.{FORMATS[mimetype][1]}"
+
+
+def avatar_path(profile_pic, size=SMALL):
+    """Returns the path below /uploads/ of a user's picture at the given size.
+
+    Args:
+        profile_pic (str): Value of User.profile_pic
+        size (int): One of AVATAR_SIZES
+
+    Returns:
+        str: e.g. "avatars/<digest>-48", or profile_pic itself for
+            unprocessed pictures
+    """
+    if profile_pic and profile_pic.startswith(AVATAR_PREFIX):
+        return f"{profile_pic}-{size}"
+    return profile_pic
+
+
+def avatar_paths(profile_pic):
+    """Returns the paths of every variant of a user's picture, keyed by size."""
+    return {str(size): avatar_path(profile_pic, size) for size in AVATAR_SIZES}
+
+
+def _write_atomically(path, data):
+    """Writes a file under its final name only once it is complete."""
+    directory = os.path.dirname(path)
+    handle, temp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(handle, "wb") as temp_file:
+            temp_file.write(data)
+        os.replace(temp_path, path)
+    except BaseException:
+        os.unlink(temp_path)
+        raise
+
+
+def _encode(image, image_format):
+    buffer = io.BytesIO()
+    if image_format == "JPEG":
+        if image.mode != "RGB":
+            # JPEG has no transparency; flatten onto white
+            background = Image.new("RGB", image.size, (255, 255, 255))
+            background.paste(image, mask=image.getchannel("A") if image.mode == "RGBA" else None)
+            image = background
+        image.save(buffer, "JPEG", quality=85, optimize=True, progressive=True)
+    else:
+        image.save(buffer, "WEBP", quality=80, method=4)
+    return buffer.getvalue()
+
+
+def save_avatar(data):
+    """Generates and stores every variant of an uploaded picture.
+
+    Variants that already exist, because the same file was uploaded before,
+    are not written again.
+
+    Args:
+        data (bytes): Contents of the uploaded file
+
+    Returns:
+        str: Value to store in User.profile_pic
+
+    Raises:
+        InvalidImage: If the data is not a readable image
+    """
+    digest = hashlib.sha256(data).hexdigest()[:32]
+    folder = app.config["AVATAR_FOLDER"]
+    try:
+        with Image.open(io.BytesIO(data)) as source:
+            image = ImageOps.exif_transpose(source)
+            image = image.convert("RGBA" if "A" in image.getbands() or "transparency" in image.info else "RGB")
+    except (UnidentifiedImageError, Image.DecompressionBombError, OSError, SyntaxError) as exc:
+        raise InvalidImage(str(exc)) from exc
+
+    for size in AVATAR_SIZES:
+        resized = None
+        for mimetype, (image_format, _) in FORMATS.items():
+            path = os.path.join(folder, variant_filename(digest, size, mimetype))
+            if os.path.exists(path):
+                continue
+            if resized is None:
+                resized = ImageOps.fit(image, (size, size), Image.Resampling.LANCZOS)
+            _write_atomically(path, _encode(resized, image_format))
+    return f"{AVATAR_PREFIX}{digest}"
+
+
+@app.cli.command("avatars-rebuild")
+def avatars_rebuild_command():
+    """Generates avatar variants for pictures uploaded before processing existed."""
+    processed = {}
+    users = User.query.filter(User.profile_pic.isnot(None),
+                              ~User.profile_pic.startswith(AVATAR_PREFIX),
+                              User.profile_pic != "default.png").all()
+    for user in users:
+        if user.profile_pic not in processed:
+            path = os.path.join(app.config["UPLOAD_FOLDER"], user.profile_pic)
+            try:
+                with open(path, "rb") as upload:
+                    processed[user.profile_pic] = save_avatar(upload.read())
+            except (OSError, InvalidImage) as exc:
+                click.echo(f"Skipped {user.profile_pic}: {exc}")
+                processed[user.profile_pic] = None
+        if processed[user.profile_pic]:
+            user.profile_pic = processed[user.profile_pic]
+    db.session.commit()
+    click.echo(f"Processed {sum(1 for value in processed.values() if value)} pictures.")
@@ -0,0 +1,105 @@
+"""
+Bulk import and export benchmark
+
+Writes a synthetic NDJSON file (users, posts with Zipf-distributed tags,
+comments, likes and bookmarks), imports it into a throwaway SQLite database
+with the import-data code path, then exports the database again. Reports the
+rows per second of each and how much the resident memory grew during the
+export (Linux only). That includes SQLite's page cache and memory-mapped
+pages, bounded by SQLITE_CACHE_SIZE and SQLITE_MMAP_SIZE, but should not
+grow with the number of posts.
+
+Usage (from the backend directory):
+    python -m benchmarks.bench_bulk --users 20000 --posts 200000 --likes 1000000
+"""
+
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+from benchmarks.bench_feed import zipf_weights, distinct_choices
+
+
+def write_dataset(path, args, rng):
+    """Writes the synthetic records and returns how many were written."""
+    tag_names = [f"tag{index}" for index in range(args.tags)]
+    tag_weights = zipf_weights(args.tags)
+    with open(path, "w", encoding="utf-8") as file:
+        def write(record):
+            file.write(json.dumps(record, separators=(",", ":")) + "\n")
+
+        for index in range(1, args.users + 1):
+            write({"type": "user", "id": index, "username": f"bulk{index}", "email": f"bulk{index}@example.com",
+                   "first_name": "Bulk"})
+        for index in range(1, args.posts + 1):
+            write({"type": "post", "id": index, "host_id": rng.randint(1, args.users), "title": f"Post {index}",
+                   "body": "<p>Benchmark body</p>", "created": "2024-01-01T00:00:00",
+                   "tags": sorted(distinct_choices(rng, tag_names, tag_weights, rng.randint(1, 3)))})
+        for index in range(1, args.comments + 1):
+            write({"type": "comment", "id": index, "post_id": rng.randint(1, args.posts),
+                   "user_id": rng.randint(1, args.users), "body": "Benchmark comment"})
+        for kind, total in (("like", args.likes), ("bookmark", args.likes // 10)):
+            for _ in range(total):
+                write({"type": kind, "post_id": rng.randint(1, args.posts), "user_id": rng.randint(1, args.users)})
+    return args.users + args.posts + args.comments + args.likes + args.likes // 10
+
+
+def resident_memory():
+    """Returns the process's resident set size in bytes, or 0 where /proc is unavailable."""
+    try:
+        with open("/proc/self/statm") as file:
+            return int(file.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--users", type=int, default=20000)
+    parser.add_argument("--posts", type=int, default=200000)
+    parser.add_argument("--comments", type=int, default=200000)
+    parser.add_argument("--likes", type=int, default=1000000)
+    parser.add_argument("--tags", type=int, default=500)
+    parser.add_argument("--batch-size", type=int, default=5000)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="devhub-bench-")
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+    os.environ.setdefault("TRENDING_STORE", "memory")
+    os.environ.setdefault("ACTIVITY_STORE", "memory")
+
+    from config import app, db
+    from bulk import export_records, import_lines
+
+    source = os.path.join(workdir, "import.ndjson")
+    records = write_dataset(source, args, random.Random(42))
+    print(f"Wrote {records} records to {source}\n")
+
+    with app.app_context():
+        db.create_all()
+        with open(source, encoding="utf-8") as file:
+            start = time.perf_counter()
+            importer = import_lines(file, args.batch_size)
+            elapsed = time.perf_counter() - start
+        rows = sum(importer.inserted.values())
+        print(f"import  {rows:>9} rows  {elapsed:>6.1f}s  {rows / elapsed:>9.0f} rows/s  "
+              f"(including counter and timeline rebuilds)")
+
+        baseline = peak = resident_memory()
+        start = time.perf_counter()
+        with open(os.path.join(workdir, "export.ndjson"), "w", encoding="utf-8") as file:
+            exported = 0
+            for record in export_records():
+                file.write(json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n")
+                exported += 1
+                if exported % 10000 == 0:
+                    peak = max(peak, resident_memory())
+        elapsed = time.perf_counter() - start
+        growth = f"resident memory grew {(peak - baseline) / 2 ** 20:.1f} MiB" if baseline else ""
+        print(f"export  {exported:>9} rows  {elapsed:>6.1f}s  {exported / elapsed:>9.0f} rows/s  {growth}")
+
+
+if __name__ == "__main__":
+    main()
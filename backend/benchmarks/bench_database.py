@@ -0,0 +1,154 @@
+"""
+Concurrent read/write benchmark for the SQLite engine profiles
+
+Seeds a throwaway SQLite database, then runs reader threads fetching posts
+and listings alongside writer threads liking and commenting, for a fixed
+time, and reports the throughput of each and how many requests failed.
+Response caching is disabled so every request reaches the database.
+
+Each engine profile runs in its own process, since the engine is configured
+when config.py is imported:
+
+    rollback  the SQLite defaults the app used before: rollback journal,
+              synchronous=FULL, no memory map, 2 MB page cache
+    wal       the current defaults: WAL, synchronous=NORMAL, 256 MB memory
+              map, 64 MB page cache
+
+Both wait up to 5 seconds for a lock, pysqlite's default timeout.
+
+Usage (from the backend directory):
+    python -m benchmarks.bench_database --readers 8 --writers 4 --seconds 10
+"""
+
+import argparse
+import json
+import logging
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+PROFILES = {
+    "rollback": {"SQLITE_JOURNAL_MODE": "delete", "SQLITE_SYNCHRONOUS": "full",
+                 "SQLITE_MMAP_SIZE": "0", "SQLITE_CACHE_SIZE": "-2000"},
+    "wal": {},
+}
+
+
+def seed(users, posts):
+    """Inserts users and posts with a few comments each, in bulk."""
+    from config import db
+    from models import Comment, Post, User
+
+    db.session.execute(db.insert(User), [{
+        "first_name": "Bench", "email": f"bench{index}@example.com", "username": f"bench{index}"
+    } for index in range(users)])
+    db.session.execute(db.insert(Post), [{
+        "host_id": index % users + 1, "title": f"Post {index}", "body": "<p>Benchmark</p>" * 20,
+        "comment_count": 3
+    } for index in range(posts)])
+    db.session.execute(db.insert(Comment), [{
+        "user_id": (index + offset) % users + 1, "post_id": index + 1, "body": "Benchmark comment"
+    } for index in range(posts) for offset in range(3)])
+    db.session.commit()
+
+
+def run_profile(args):
+    """Runs the workload against the profile in the environment and returns its results."""
+    from flask_jwt_extended import create_access_token
+    from config import app, db
+    import main as api
+
+    # Runs without Redis: responses are not cached, and failed invalidation broadcasts are expected
+    logging.getLogger("caching").setLevel(logging.ERROR)
+    api.cache.init_app(app, config={"CACHE_TYPE": "flask_caching.backends.NullCache"})
+
+    with app.app_context():
+        db.create_all()
+        seed(args.users, args.posts)
+        tokens = [create_access_token(identity=user_id) for user_id in range(1, args.users + 1)]
+        journal_mode = db.session.execute(db.text("PRAGMA journal_mode")).scalar()
+
+    counts = {"reads": 0, "writes": 0, "read_errors": 0, "write_errors": 0}
+    lock = threading.Lock()
+    stop = threading.Event()
+
+    def reader(seed_value):
+        rng = random.Random(seed_value)
+        http = app.test_client()
+        while not stop.is_set():
+            if rng.random() < 0.7:
+                response = http.get(f"/get_post/{rng.randint(1, args.posts)}")
+            else:
+                response = http.get("/get_posts?cursor=")
+            with lock:
+                counts["reads" if response.status_code == 200 else "read_errors"] += 1
+
+    def writer(seed_value):
+        rng = random.Random(seed_value)
+        http = app.test_client()
+        while not stop.is_set():
+            headers = {"Authorization": f"Bearer {rng.choice(tokens)}"}
+            post_id = rng.randint(1, args.posts)
+            if rng.random() < 0.7:
+                response = http.post(f"/like_post/{post_id}", headers=headers)
+            else:
+                response = http.post(f"/add_comment/{post_id}", headers=headers, json={"content": "Hi"})
+            with lock:
+                counts["writes" if response.status_code in (200, 201) else "write_errors"] += 1
+
+    def guarded(target, seed_value, errors):
+        try:
+            target(seed_value)
+        except Exception:  # noqa: BLE001 - e.g. "database is locked" raised through the test client
+            with lock:
+                counts[errors] += 1
+            guarded(target, seed_value + 1000, errors)
+
+    threads = [threading.Thread(target=guarded, args=(reader, index, "read_errors"))
+               for index in range(args.readers)]
+    threads += [threading.Thread(target=guarded, args=(writer, index, "write_errors"))
+                for index in range(args.writers)]
+    for thread in threads:
+        thread.start()
+    time.sleep(args.seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    return {"journal_mode": journal_mode, **counts}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--profiles", nargs="+", default=list(PROFILES), choices=list(PROFILES))
+    parser.add_argument("--readers", type=int, default=8)
+    parser.add_argument("--writers", type=int, default=4)
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--posts", type=int, default=5000)
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(run_profile(args)))
+        return
+
+    print(f"{args.readers} readers, {args.writers} writers, {args.seconds:g}s per profile\n")
+    print(f"{'profile':<9} {'journal':<8} {'reads/s':>9} {'writes/s':>9} {'read errors':>12} {'write errors':>13}")
+    for profile in args.profiles:
+        workdir = tempfile.mkdtemp(prefix="devhub-bench-")
+        env = {**os.environ, **PROFILES[profile],
+               "DATABASE_URL": f"sqlite:///{os.path.join(workdir, 'bench.db')}",
+               "SQLITE_BUSY_TIMEOUT": "5000", "TRENDING_STORE": "memory", "ACTIVITY_STORE": "memory"}
+        child = subprocess.run([sys.executable, "-m", "benchmarks.bench_database", "--child", *sys.argv[1:]],
+                               env=env, capture_output=True, text=True, check=True)
+        result = json.loads(child.stdout.strip().splitlines()[-1])
+        print(f"{profile:<9} {result['journal_mode']:<8} {result['reads'] / args.seconds:>9.1f} "
+              f"{result['writes'] / args.seconds:>9.1f} {result['read_errors']:>12} {result['write_errors']:>13}")
+
+
+if __name__ == "__main__":
+    main()
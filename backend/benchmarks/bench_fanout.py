@@ -0,0 +1,146 @@
+"""
+Concurrent fan-out benchmark
+
+Seeds a small synthetic corpus (see bench_load.py) and sends /get_post and
+/search requests from an increasing number of concurrent clients, once with
+the independent queries of each request run one after another
+(FANOUT_WORKERS=0, the plain WSGI mode) and once fanned out on the thread
+pool. Every statement is delayed by --latency-ms on the connection, as a
+database across the network would be; SQLite on local disk answers these
+queries in well under a millisecond, where there is little waiting to
+overlap. Posts are picked uniformly, since serializing the thousands of
+comments on the most popular ones is CPU-bound work fan-out cannot overlap
+under the GIL. Reports throughput and latency percentiles per endpoint, client
+count and mode.
+
+Usage (from the backend directory):
+    python -m benchmarks.bench_fanout
+    python -m benchmarks.bench_fanout --clients 1 8 32 --latency-ms 5 --workers 8
+"""
+
+import argparse
+import logging
+import os
+import random
+import statistics
+import tempfile
+import threading
+import time
+from benchmarks.bench_feed import zipf_weights
+from benchmarks.bench_load import percentile, seed
+from benchmarks.bench_search import build_vocabulary
+
+
+def use_fan_out(workers):
+    """Switches the views to a fan-out pool of the given size, 0 for sequential queries."""
+    import loaders
+    import main as api
+    from fanout import FanOut
+
+    loaders.fan_out = api.fan_out = FanOut(workers)
+
+
+def measure(http_for, requests_for, clients, per_client):
+    """Sends each client's requests from its own thread and returns (latencies, errors, seconds)."""
+    latencies = []
+    errors = []
+    lock = threading.Lock()
+
+    def client(index):
+        http = http_for()
+        recorded, failed = [], 0
+        for url, headers in requests_for(index, per_client):
+            start = time.perf_counter()
+            if http.get(url, headers=headers).status_code >= 400:
+                failed += 1
+            recorded.append(time.perf_counter() - start)
+        with lock:
+            latencies.extend(recorded)
+            errors.append(failed)
+
+    threads = [threading.Thread(target=client, args=(index,)) for index in range(clients)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return latencies, sum(errors), time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--users", type=int, default=2000)
+    parser.add_argument("--posts", type=int, default=20000)
+    parser.add_argument("--likes", type=int, default=100000)
+    parser.add_argument("--bookmarks", type=int, default=10000)
+    parser.add_argument("--comments", type=int, default=100000)
+    parser.add_argument("--tags", type=int, default=200)
+    parser.add_argument("--vocabulary", type=int, default=5000)
+    parser.add_argument("--clients", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--requests", type=int, default=50, help="requests per client, per endpoint and mode")
+    parser.add_argument("--latency-ms", type=float, default=2.0, help="delay added to every SQL statement")
+    parser.add_argument("--workers", type=int, default=4, help="fan-out pool size")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="devhub-bench-")
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(workdir, 'fanout.db')}"
+    os.environ.setdefault("TRENDING_STORE", "memory")
+    os.environ.setdefault("ACTIVITY_STORE", "memory")
+
+    from flask_jwt_extended import create_access_token
+    from sqlalchemy import event
+    from config import app, db
+    import main as api
+
+    logging.getLogger("caching").setLevel(logging.ERROR)
+    logging.getLogger("metrics").setLevel(logging.ERROR)
+    api.cache.init_app(app, config={"CACHE_TYPE": "flask_caching.backends.NullCache"})
+    api.page_cache.local.max_entries = 0
+
+    with app.app_context():
+        db.create_all()
+        start = time.perf_counter()
+        seed(args, random.Random(args.seed))
+        print(f"Seeded in {time.perf_counter() - start:.1f}s")
+        engine = db.engine
+        tokens = [create_access_token(identity=user_id) for user_id in range(1, min(args.users, 1000) + 1)]
+
+    words, _ = build_vocabulary(args.vocabulary, random.Random(args.seed))
+    word_weights = zipf_weights(len(words))
+
+    def get_post_requests(index, count):
+        rng = random.Random(f"{args.seed}-get_post-{index}")
+        for _ in range(count):
+            headers = {"Authorization": f"Bearer {rng.choice(tokens)}"}
+            yield f"/get_post/{rng.randint(1, args.posts)}", headers
+
+    def search_requests(index, count):
+        rng = random.Random(f"{args.seed}-search-{index}")
+        for _ in range(count):
+            yield f"/search?q={rng.choices(words, cum_weights=word_weights)[0]}", None
+
+    def delay(*_):
+        time.sleep(args.latency_ms / 1000)
+
+    event.listen(engine, "before_cursor_execute", delay)
+    print(f"{args.latency_ms:g} ms per statement, fan-out pool of {args.workers}\n")
+    print(f"{'endpoint':<9} {'clients':>7} {'mode':<10} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} "
+          f"{'mean ms':>8} {'errors':>6}")
+    for endpoint, requests_for in (("get_post", get_post_requests), ("search", search_requests)):
+        for clients in args.clients:
+            baseline = None
+            for mode, workers in (("sequential", 0), ("fan-out", args.workers)):
+                use_fan_out(workers)
+                latencies, errors, seconds = measure(app.test_client, requests_for, clients, args.requests)
+                latencies = sorted(latency * 1000 for latency in latencies)
+                throughput = len(latencies) / seconds
+                change = f"  ({throughput / baseline - 1:+.0%} req/s)" if baseline else ""
+                baseline = baseline or throughput
+                print(f"{endpoint:<9} {clients:>7} {mode:<10} {throughput:>8.1f} {percentile(latencies, 0.5):>8.2f} "
+                      f"{percentile(latencies, 0.95):>8.2f} {statistics.fmean(latencies):>8.2f} {errors:>6}{change}")
+    event.remove(engine, "before_cursor_execute", delay)
+
+
+if __name__ == "__main__":
+    main()
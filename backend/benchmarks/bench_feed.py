@@ -0,0 +1,156 @@
+"""
+Home feed benchmark
+
+Seeds a throwaway SQLite database with users following tags and posts
+carrying tags, both drawn from a Zipf distribution so a few tags are very
+popular, then times /feed reads and /create_post writes with the timelines
+built for each fan-out limit:
+
+    fan-in   every followed tag is merged at read time (limit 0)
+    hybrid   the configured FEED_FANOUT_LIMIT
+    fan-out  every tag is copied into timelines, however many followers it has
+
+Usage (from the backend directory):
+    python -m benchmarks.bench_feed --users 10000 --posts 100000
+    python -m benchmarks.bench_feed --modes hybrid --reads 500
+"""
+
+import argparse
+import itertools
+import logging
+import os
+import random
+import statistics
+import tempfile
+import time
+
+
+def zipf_weights(size):
+    """Returns cumulative Zipf weights for ranks 1..size."""
+    return list(itertools.accumulate(1 / rank for rank in range(1, size + 1)))
+
+
+def distinct_choices(rng, population, cum_weights, count):
+    """Draws count distinct items with the given cumulative weights."""
+    chosen = set()
+    while len(chosen) < count:
+        chosen.add(rng.choices(population, cum_weights=cum_weights)[0])
+    return chosen
+
+
+def seed(users, posts, tags, follows, rng, batch_size=10000):
+    """Inserts users, tags, posts with their tags and tag follows in bulk."""
+    from config import db
+    from models import Post, Tag, User, post_tag, tag_follows
+    from counters import recount_all
+
+    db.session.execute(db.insert(User), [{
+        "first_name": "Bench", "email": f"bench{index}@example.com", "username": f"bench{index}"
+    } for index in range(users)])
+    db.session.execute(db.insert(Tag), [{"name": f"tag{index}", "name_key": f"tag{index}"}
+                                        for index in range(tags)])
+    tag_ids = list(range(1, tags + 1))
+    cum_weights = zipf_weights(tags)
+
+    for start in range(0, posts, batch_size):
+        count = min(batch_size, posts - start)
+        db.session.execute(db.insert(Post), [{
+            "host_id": rng.randint(1, users), "title": f"Post {start + index}", "body": "<p>Benchmark</p>"
+        } for index in range(count)])
+        db.session.execute(post_tag.insert(), [
+            {"post_id": start + index + 1, "tag_id": tag_id}
+            for index in range(count)
+            for tag_id in distinct_choices(rng, tag_ids, cum_weights, rng.randint(1, 3))
+        ])
+    db.session.execute(tag_follows.insert(), [
+        {"user_id": user_id, "tag_id": tag_id}
+        for user_id in range(1, users + 1)
+        for tag_id in distinct_choices(rng, tag_ids, cum_weights, follows)
+    ])
+    db.session.commit()
+    recount_all()
+
+
+def percentiles(latencies):
+    return statistics.median(latencies), statistics.quantiles(latencies, n=20)[-1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--users", type=int, default=10000)
+    parser.add_argument("--posts", type=int, default=100000)
+    parser.add_argument("--tags", type=int, default=500)
+    parser.add_argument("--follows", type=int, default=5, help="tags followed by each user")
+    parser.add_argument("--reads", type=int, default=300)
+    parser.add_argument("--writes", type=int, default=50)
+    parser.add_argument("--modes", nargs="+", default=["fan-in", "hybrid", "fan-out"])
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="devhub-bench-")
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+    os.environ.setdefault("TRENDING_STORE", "memory")
+    os.environ.setdefault("ACTIVITY_STORE", "memory")
+
+    from flask_jwt_extended import create_access_token
+    from config import app, db
+    from models import Tag
+    from feeds import rebuild_timelines
+    import main as api
+
+    # Runs without Redis: responses are not cached, and failed invalidation broadcasts are expected
+    logging.getLogger("caching").setLevel(logging.ERROR)
+    api.cache.init_app(app, config={"CACHE_TYPE": "flask_caching.backends.NullCache"})
+    limits = {"fan-in": 0, "hybrid": app.config["FEED_FANOUT_LIMIT"], "fan-out": 2 ** 62}
+
+    with app.app_context():
+        db.create_all()
+        rng = random.Random(42)
+        start = time.perf_counter()
+        seed(args.users, args.posts, args.tags, args.follows, rng)
+        print(f"Seeded {args.users} users, {args.posts} posts and {args.users * args.follows} follows "
+              f"in {time.perf_counter() - start:.1f}s\n")
+
+        http = app.test_client()
+        readers = [{"Authorization": f"Bearer {create_access_token(identity=rng.randint(1, args.users))}"}
+                   for _ in range(args.reads)]
+        writer = {"Authorization": f"Bearer {create_access_token(identity=1)}"}
+        cum_weights = zipf_weights(args.tags)
+        tag_names = [f"tag{index}" for index in range(args.tags)]
+
+        print(f"{'mode':<8} {'fan-in tags':>11} {'timeline rows':>13} {'build':>7} "
+              f"{'read p50':>9} {'read p95':>9} {'page 2 p50':>10} {'write p50':>10} {'write p95':>10}")
+        for mode in args.modes:
+            app.config["FEED_FANOUT_LIMIT"] = limits[mode]
+            start = time.perf_counter()
+            rows = rebuild_timelines()
+            build = time.perf_counter() - start
+            fan_in_tags = Tag.query.filter(Tag.fan_in).count()
+
+            first_pages, second_pages = [], []
+            for headers in readers:
+                start = time.perf_counter()
+                response = http.get("/feed", headers=headers)
+                first_pages.append((time.perf_counter() - start) * 1000)
+                cursor = response.get_json()["next_cursor"]
+                if cursor:
+                    start = time.perf_counter()
+                    http.get(f"/feed?cursor={cursor}", headers=headers)
+                    second_pages.append((time.perf_counter() - start) * 1000)
+
+            writes = []
+            for index in range(args.writes):
+                tags = distinct_choices(rng, tag_names, cum_weights, rng.randint(1, 3))
+                start = time.perf_counter()
+                http.post("/create_post", headers=writer,
+                          json={"title": f"{mode} {index}", "body": "<p>Benchmark</p>", "tags": list(tags)})
+                writes.append((time.perf_counter() - start) * 1000)
+
+            read_p50, read_p95 = percentiles(first_pages)
+            write_p50, write_p95 = percentiles(writes)
+            print(f"{mode:<8} {fan_in_tags:>11} {rows:>13} {build:>6.1f}s "
+                  f"{read_p50:>7.2f}ms {read_p95:>7.2f}ms {statistics.median(second_pages or [0]):>8.2f}ms "
+                  f"{write_p50:>8.2f}ms {write_p95:>8.2f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,361 @@
+"""
+Load benchmark of the main API endpoints
+
+Seeds a SQLite database with a synthetic corpus: users, tags, posts carrying
+one to three tags, likes, bookmarks and comments. Tags, and the posts that
+get likes, bookmarks and comments, are drawn from Zipf distributions, so a
+few are very popular and most get little attention. Concurrent clients then
+send a weighted mix of requests through the Flask test client:
+
+    get_posts          first pages of the listing, 1 to 5
+    get_posts_tag      first page of a tag's listing
+    get_post           a post, with its comments
+    search             one or two words from post titles
+    trending_stories   the trending ranking
+    get_tags           every tag with its post count
+    like_post          like toggles by random users
+    bookmark_post      bookmark toggles by random users
+
+Each client draws its requests from its own seeded generator, so a run with
+the same arguments sends the same requests. Latency percentiles, throughput,
+errors and SQL statements per request are reported for each endpoint and
+written as JSON with --output; --compare prints the change against such a
+file, e.g. one written on another commit.
+
+Response caching is off by default so every request reaches the database;
+--cache simple caches in process memory. Seeding the default corpus takes a
+few minutes, so --database keeps it in a file that later runs copy, leaving
+it as seeded. Users, likes, bookmarks and comments scale with --posts unless
+given, so a smaller --posts seeds a proportionally smaller corpus.
+
+Usage (from the backend directory):
+    python -m benchmarks.bench_load --database /tmp/devhub-load.db --output before.json
+    python -m benchmarks.bench_load --database /tmp/devhub-load.db --compare before.json
+    python -m benchmarks.bench_load --posts 20000 --requests 2000
+"""
+
+import argparse
+import json
+import logging
+import os
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from benchmarks.bench_feed import zipf_weights, distinct_choices
+from benchmarks.bench_search import build_vocabulary
+
+# Relative frequency of each request in the mix
+MIX = {
+    "get_posts": 25,
+    "get_posts_tag": 10,
+    "get_post": 30,
+    "search": 8,
+    "trending_stories": 7,
+    "get_tags": 5,
+    "like_post": 10,
+    "bookmark_post": 5,
+}
+
+
+def ranked_post_ids(posts, seed_value):
+    """Returns post IDs from the most to the least popular."""
+    ranked = list(range(1, posts + 1))
+    random.Random(f"{seed_value}-posts").shuffle(ranked)
+    return ranked
+
+
+def seed(args, rng, batch_size=50000):
+    """Inserts the synthetic corpus in bulk and builds the derived data.
+
+    Likes, bookmarks and comments land on posts by Zipf rank, with ranks
+    shuffled across post IDs so popularity does not follow age.
+    """
+    from config import db
+    from models import Comment, Post, Tag, User, post_bookmarks, post_likes, post_tag
+    from counters import recount_all
+    from search import rebuild_search_index
+
+    words, word_weights = build_vocabulary(args.vocabulary, rng)
+    db.session.execute(db.insert(User), [{
+        "first_name": "Load", "email": f"load{index}@example.com", "username": f"load{index}"
+    } for index in range(args.users)])
+    db.session.execute(db.insert(Tag), [{"name": f"tag{index}", "name_key": f"tag{index}"}
+                                        for index in range(args.tags)])
+    tag_ids = list(range(1, args.tags + 1))
+    tag_weights = zipf_weights(args.tags)
+
+    for start in range(0, args.posts, batch_size):
+        count = min(batch_size, args.posts - start)
+        db.session.execute(db.insert(Post), [{
+            "host_id": rng.randint(1, args.users),
+            "title": " ".join(rng.choices(words, cum_weights=word_weights, k=6)),
+            "body": "<p>" + " ".join(rng.choices(words, cum_weights=word_weights, k=60)) + "</p>"
+        } for _ in range(count)])
+        db.session.execute(post_tag.insert(), [
+            {"post_id": start + index + 1, "tag_id": tag_id}
+            for index in range(count)
+            for tag_id in distinct_choices(rng, tag_ids, tag_weights, rng.randint(1, 3))
+        ])
+
+    ranked_posts = ranked_post_ids(args.posts, args.seed)
+    post_weights = zipf_weights(args.posts)
+    user_ids = range(1, args.users + 1)
+    for table, total in ((post_likes, args.likes), (post_bookmarks, args.bookmarks)):
+        # Duplicate (post, user) pairs are dropped, so slightly fewer rows are stored
+        insert = table.insert().prefix_with("OR IGNORE")
+        for start in range(0, total, batch_size):
+            count = min(batch_size, total - start)
+            db.session.execute(insert, [
+                {"post_id": post_id, "user_id": user_id} for post_id, user_id in zip(
+                    rng.choices(ranked_posts, cum_weights=post_weights, k=count),
+                    rng.choices(user_ids, k=count))
+            ])
+    for start in range(0, args.comments, batch_size):
+        count = min(batch_size, args.comments - start)
+        db.session.execute(db.insert(Comment), [
+            {"post_id": post_id, "user_id": rng.randint(1, args.users),
+             "body": " ".join(rng.choices(words, cum_weights=word_weights, k=12))}
+            for post_id in rng.choices(ranked_posts, cum_weights=post_weights, k=count)
+        ])
+    db.session.commit()
+
+    recount_all()
+    rebuild_search_index()
+    db.session.execute(db.text("ANALYZE"))
+    db.session.commit()
+
+
+def dataset_size():
+    """Counts the rows of the seeded tables."""
+    from config import db
+
+    return {table: db.session.execute(db.text(f'SELECT count(*) FROM "{table}"')).scalar()
+            for table in ("user", "tag", "post", "post_likes", "post_bookmarks", "comment")}
+
+
+def percentile(sorted_values, fraction):
+    """Returns the value below which the given fraction of values falls, by nearest rank."""
+    if not sorted_values:
+        return None
+    return sorted_values[min(len(sorted_values) - 1, max(0, round(fraction * len(sorted_values)) - 1))]
+
+
+def summarize(samples, seconds):
+    """Reduces (latency in seconds, statements, ok) samples to the reported figures."""
+    latencies = sorted(latency * 1000 for latency, _, _ in samples)
+    return {
+        "requests": len(samples),
+        "errors": sum(1 for *_, ok in samples if not ok),
+        "throughput_rps": round(len(samples) / seconds, 2),
+        "p50_ms": round(percentile(latencies, 0.50), 3),
+        "p95_ms": round(percentile(latencies, 0.95), 3),
+        "p99_ms": round(percentile(latencies, 0.99), 3),
+        "mean_ms": round(statistics.fmean(latencies), 3),
+        "queries_per_request": round(statistics.fmean(queries for _, queries, _ in samples), 2),
+        "max_queries": max(queries for _, queries, _ in samples),
+    }
+
+
+def git_commit():
+    """Returns the checked out commit, or None outside a git checkout."""
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def seed_database(args):
+    """Creates the schema and seeds the corpus into the configured database."""
+    from config import app, db
+    import models  # noqa: F401 registers the tables
+
+    with app.app_context():
+        db.create_all()
+        start = time.perf_counter()
+        seed(args, random.Random(args.seed))
+        print(f"Seeded in {time.perf_counter() - start:.1f}s")
+
+
+def run(args):
+    """Drives the request mix against the seeded database and returns the report."""
+    from flask_jwt_extended import create_access_token
+    from config import app, db
+    from metrics import request_metrics
+    from trending import trending_index
+    import main as api
+
+    # Runs without Redis: failed invalidation broadcasts are expected
+    logging.getLogger("caching").setLevel(logging.ERROR)
+    logging.getLogger("metrics").setLevel(logging.ERROR)
+    api.cache.init_app(app, config={"CACHE_TYPE": f"flask_caching.backends.{args.cache.title()}Cache"})
+    if args.cache == "null":
+        api.page_cache.local.max_entries = 0
+
+    with app.app_context():
+        trending_index.rebuild()
+        size = dataset_size()
+        words, _ = build_vocabulary(args.vocabulary, random.Random(args.seed))
+        user_count, post_count, tag_count = size["user"], size["post"], size["tag"]
+        tokens = [create_access_token(identity=user_id) for user_id in
+                  random.Random(args.seed).sample(range(1, user_count + 1), min(user_count, 1000))]
+    print("Dataset: " + ", ".join(f"{count} {table}" for table, count in size.items()) + "\n")
+
+    local = threading.local()
+
+    @app.after_request
+    def count_statements(response):
+        # Runs before the metrics hook finishes the request, and counts the
+        # statements of fanned-out calls on pool threads too
+        local.statements = request_metrics.statement_count()
+        return response
+
+    post_ids = ranked_post_ids(post_count, args.seed)
+    post_weights = zipf_weights(post_count)
+    tag_weights = zipf_weights(tag_count)
+    word_weights = zipf_weights(len(words))
+
+    def request_for(endpoint, rng):
+        """Returns (method, URL, headers) of a request to an endpoint."""
+        if endpoint == "get_posts":
+            return "GET", f"/get_posts?page={rng.randint(1, 5)}", None
+        if endpoint == "get_posts_tag":
+            tag = rng.choices(range(tag_count), cum_weights=tag_weights)[0]
+            return "GET", f"/get_posts?tag=tag{tag}", None
+        if endpoint == "get_post":
+            return "GET", f"/get_post/{rng.choices(post_ids, cum_weights=post_weights)[0]}", None
+        if endpoint == "search":
+            query = " ".join(rng.choices(words, cum_weights=word_weights, k=rng.randint(1, 2)))
+            return "GET", f"/search?q={query}", None
+        if endpoint in ("trending_stories", "get_tags"):
+            return "GET", f"/{endpoint}", None
+        headers = {"Authorization": f"Bearer {rng.choice(tokens)}"}
+        return "POST", f"/{endpoint}/{rng.choices(post_ids, cum_weights=post_weights)[0]}", headers
+
+    endpoints = list(MIX)
+    mix_weights = list(MIX.values())
+    samples = {endpoint: [] for endpoint in endpoints}
+    lock = threading.Lock()
+    per_client = args.requests // args.clients
+
+    def client(index):
+        rng = random.Random(f"{args.seed}-{index}")
+        http = app.test_client()
+        recorded = []
+        for number in range(args.warmup + per_client):
+            endpoint = rng.choices(endpoints, weights=mix_weights)[0]
+            method, url, headers = request_for(endpoint, rng)
+            local.statements = 0
+            start = time.perf_counter()
+            try:
+                ok = http.open(url, method=method, headers=headers).status_code < 500
+            except Exception:  # noqa: BLE001 - e.g. "database is locked" raised through the test client
+                ok = False
+            latency = time.perf_counter() - start
+            if number >= args.warmup:
+                recorded.append((endpoint, (latency, local.statements, ok)))
+        with lock:
+            for endpoint, sample in recorded:
+                samples[endpoint].append(sample)
+
+    threads = [threading.Thread(target=client, args=(index,)) for index in range(args.clients)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    every = [sample for endpoint_samples in samples.values() for sample in endpoint_samples]
+    return {
+        "commit": git_commit(),
+        "settings": {"clients": args.clients, "requests": per_client * args.clients, "warmup": args.warmup,
+                     "seed": args.seed, "cache": args.cache, "journal_mode": app.config["SQLITE_JOURNAL_MODE"]},
+        "dataset": size,
+        "seconds": round(elapsed, 3),
+        "total": summarize(every, elapsed),
+        "endpoints": {endpoint: summarize(endpoint_samples, elapsed)
+                      for endpoint, endpoint_samples in samples.items() if endpoint_samples},
+    }
+
+
+def print_report(report, baseline=None):
+    """Prints the per-endpoint figures, with the change against a baseline report."""
+    def change(name, field):
+        if baseline is None or name not in baseline["endpoints"] and name != "total":
+            return ""
+        before = (baseline["total"] if name == "total" else baseline["endpoints"][name])[field]
+        after = (report["total"] if name == "total" else report["endpoints"][name])[field]
+        return f" ({(after - before) / before:+.0%})" if before else ""
+
+    # Each figure is followed by an 8-wide change column, blank without a baseline
+    print(f"{'endpoint':<17} {'requests':>8} {'errors':>6} {'req/s':>8} {'p50 ms':>7}{'':8} {'p95 ms':>7}{'':8} "
+          f"{'p99 ms':>7}{'':8} {'queries':>7}")
+    for name, figures in [*report["endpoints"].items(), ("total", report["total"])]:
+        print(f"{name:<17} {figures['requests']:>8} {figures['errors']:>6} {figures['throughput_rps']:>8.1f} "
+              f"{figures['p50_ms']:>7.2f}{change(name, 'p50_ms'):>8} {figures['p95_ms']:>7.2f}{change(name, 'p95_ms'):>8} "
+              f"{figures['p99_ms']:>7.2f}{change(name, 'p99_ms'):>8} "
+              f"{figures['queries_per_request']:>7.1f}{change(name, 'queries_per_request'):>8}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--posts", type=int, default=500000)
+    parser.add_argument("--users", type=int, help="defaults to one per 10 posts")
+    parser.add_argument("--likes", type=int, help="defaults to 10 per post")
+    parser.add_argument("--bookmarks", type=int, help="defaults to one per post")
+    parser.add_argument("--comments", type=int, help="defaults to 2 per post")
+    parser.add_argument("--tags", type=int, default=1000)
+    parser.add_argument("--vocabulary", type=int, default=20000)
+    parser.add_argument("--clients", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=4000, help="measured requests, across clients")
+    parser.add_argument("--warmup", type=int, default=20, help="unmeasured requests per client")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--cache", choices=["null", "simple"], default="null")
+    parser.add_argument("--database", help="SQLite file to seed once and reuse; defaults to a new temporary file")
+    parser.add_argument("--output", help="file to write the JSON report to")
+    parser.add_argument("--compare", help="JSON report to compare against")
+    parser.add_argument("--seed-only", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    for name, per_post in (("users", 0.1), ("likes", 10), ("bookmarks", 1), ("comments", 2)):
+        if getattr(args, name) is None:
+            setattr(args, name, max(int(args.posts * per_post), 1))
+
+    os.environ.setdefault("TRENDING_STORE", "memory")
+    os.environ.setdefault("ACTIVITY_STORE", "memory")
+    workdir = tempfile.mkdtemp(prefix="devhub-bench-")
+    path = os.path.join(workdir, "load.db")
+    if args.seed_only or not args.database:
+        os.environ["DATABASE_URL"] = f"sqlite:///{os.path.abspath(args.database) if args.seed_only else path}"
+        seed_database(args)
+        if args.seed_only:
+            return
+    else:
+        # The toggles change the data, so each run works on a copy of the seeded file
+        if not os.path.exists(args.database):
+            subprocess.run([sys.executable, "-m", "benchmarks.bench_load", "--seed-only", *sys.argv[1:]],
+                           env=os.environ, check=True)
+        shutil.copyfile(args.database, path)
+        os.environ["DATABASE_URL"] = f"sqlite:///{path}"
+
+    report = run(args)
+    baseline = None
+    if args.compare:
+        with open(args.compare) as file:
+            baseline = json.load(file)
+        print(f"Compared with {args.compare} (commit {baseline.get('commit')})")
+    print_report(report, baseline)
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(report, file, indent=2, sort_keys=True)
+            file.write("\n")
+        print(f"\nWrote {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""
+Login throughput benchmark
+
+Seeds a throwaway SQLite database with users whose passwords are hashed with
+each method under test, then sends concurrent /login requests and reports
+throughput, latency and how many requests were shed with 503.
+
+Usage (from the backend directory):
+    python -m benchmarks.bench_login --clients 16 --logins 200
+    python -m benchmarks.bench_login --methods pbkdf2:sha256:600000 scrypt:16384:8:1
+"""
+
+import argparse
+import os
+import statistics
+import tempfile
+import threading
+import time
+
+DEFAULT_METHODS = [
+    "pbkdf2:sha256:600000",
+    "pbkdf2:sha256:200000",
+    "scrypt:32768:8:1",
+    "scrypt:16384:8:1",
+]
+
+
+def run_logins(app, username, clients, logins):
+    """Sends logins from concurrent clients and returns (latencies in ms, status counts, seconds)."""
+    latencies = []
+    statuses = {}
+    lock = threading.Lock()
+    per_client = logins // clients
+
+    def client():
+        http = app.test_client()
+        for _ in range(per_client):
+            start = time.perf_counter()
+            response = http.post("/login", json={"username": username, "password": "benchmark-password"})
+            elapsed = (time.perf_counter() - start) * 1000
+            with lock:
+                latencies.append(elapsed)
+                statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+    threads = [threading.Thread(target=client) for _ in range(clients)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return latencies, statuses, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--methods", nargs="+", default=DEFAULT_METHODS)
+    parser.add_argument("--clients", type=int, default=16)
+    parser.add_argument("--logins", type=int, default=200)
+    parser.add_argument("--workers", type=int, help="PASSWORD_HASH_WORKERS")
+    parser.add_argument("--queue-size", type=int, help="PASSWORD_HASH_QUEUE_SIZE")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="devhub-bench-")
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+    if args.workers:
+        os.environ["PASSWORD_HASH_WORKERS"] = str(args.workers)
+    if args.queue_size is not None:
+        os.environ["PASSWORD_HASH_QUEUE_SIZE"] = str(args.queue_size)
+
+    from werkzeug.security import generate_password_hash
+    from config import app, db
+    from models import User
+    import main as api  # noqa: F401 registers the routes
+
+    print(f"{args.clients} clients, {app.config['PASSWORD_HASH_WORKERS']} hashing workers, "
+          f"queue of {app.config['PASSWORD_HASH_QUEUE_SIZE']}\n")
+    print(f"{'method':<24} {'logins/s':>9} {'p50':>9} {'p95':>9} {'503s':>6}")
+    with app.app_context():
+        db.create_all()
+        for index, method in enumerate(args.methods):
+            username = f"bench{index}"
+            db.session.add(User(username=username, email=f"{username}@example.com", first_name="Bench",
+                                password_hash=generate_password_hash("benchmark-password", method)))
+            db.session.commit()
+
+            # Logins must not rehash, so the configured method matches the stored one
+            app.config["PASSWORD_HASH_METHOD"] = method
+            latencies, statuses, seconds = run_logins(app, username, args.clients, args.logins)
+            succeeded = statuses.get(200, 0)
+            print(f"{method:<24} {succeeded / seconds:>9.1f} "
+                  f"{statistics.median(latencies):>7.1f}ms "
+                  f"{statistics.quantiles(latencies, n=20)[-1]:>7.1f}ms "
+                  f"{statuses.get(503, 0):>6}")
+
+
+if __name__ == "__main__":
+    main()
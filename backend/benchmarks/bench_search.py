@@ -0,0 +1,104 @@
+"""
+Search latency benchmark
+
+Seeds a throwaway SQLite database with synthetic posts, builds the full-text
+index and compares /search's LIKE scan against the FTS5 ranked query.
+
+Usage (from the backend directory):
+    python -m benchmarks.bench_search --posts 100000 --runs 20
+"""
+
+import argparse
+import itertools
+import os
+import random
+import statistics
+import tempfile
+import time
+
+SYLLABLES = ["ka", "lo", "mi", "ta", "ren", "do", "su", "vi", "ne", "pra", "ex", "zo", "qu", "fin", "ar"]
+
+
+def build_vocabulary(size, rng):
+    """Builds a vocabulary of distinct pseudo-words with cumulative Zipf weights."""
+    words = set()
+    while len(words) < size:
+        words.add("".join(rng.choices(SYLLABLES, k=rng.randint(2, 4))))
+    words = sorted(words)
+    rng.shuffle(words)
+    return words, list(itertools.accumulate(1 / rank for rank in range(1, size + 1)))
+
+
+def seed_posts(count, words, cum_weights, rng, batch_size=10000):
+    """Inserts synthetic posts with HTML bodies in bulk."""
+    from config import db
+    from models import Post, User
+
+    db.session.execute(db.insert(User), [{
+        "first_name": "Bench", "email": "bench@example.com", "username": "bench"
+    }])
+    for start in range(0, count, batch_size):
+        rows = []
+        for _ in range(min(batch_size, count - start)):
+            title = " ".join(rng.choices(words, cum_weights=cum_weights, k=6))
+            paragraphs = ["<p>" + " ".join(rng.choices(words, cum_weights=cum_weights, k=40))
+                          + "</p>" for _ in range(5)]
+            rows.append({"host_id": 1, "title": title, "body": "".join(paragraphs)})
+        db.session.execute(db.insert(Post), rows)
+    db.session.commit()
+
+
+def time_query(search, query, runs):
+    """Runs a search function repeatedly and returns its latencies in milliseconds."""
+    from config import db
+
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        search(query, 1, 10)
+        timings.append((time.perf_counter() - start) * 1000)
+        db.session.expunge_all()
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--posts", type=int, default=100000)
+    parser.add_argument("--runs", type=int, default=20)
+    parser.add_argument("--vocabulary", type=int, default=20000)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="devhub-bench-")
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+
+    from config import app, db
+    import search
+
+    with app.app_context():
+        db.create_all()
+        start = time.perf_counter()
+        rng = random.Random(42)
+        words, cum_weights = build_vocabulary(args.vocabulary, rng)
+        seed_posts(args.posts, words, cum_weights, rng)
+        print(f"Seeded {args.posts} posts in {time.perf_counter() - start:.1f}s")
+
+        start = time.perf_counter()
+        search.rebuild_search_index()
+        print(f"Built search index in {time.perf_counter() - start:.1f}s\n")
+
+        print(f"{'query':<24} {'like p50':>10} {'like p95':>10} {'fts p50':>10} {'fts p95':>10}")
+        # A frequent, a mid-frequency and a rare word, a two-word query and a miss
+        queries = [words[2], words[200], words[5000 % len(words)],
+                   f"{words[50]} {words[300]}", "nomatchword"]
+        for query in queries:
+            like = time_query(search._like_search, query, args.runs)
+            fts = time_query(lambda q, page, per_page: search._ranked_search(
+                search.build_match_expression(q), page, per_page), query, args.runs)
+            print(f"{query:<24} {statistics.median(like):>9.2f}ms "
+                  f"{statistics.quantiles(like, n=20)[-1]:>9.2f}ms "
+                  f"{statistics.median(fts):>9.2f}ms "
+                  f"{statistics.quantiles(fts, n=20)[-1]:>9.2f}ms")
+
+
+if __name__ == "__main__":
+    main()
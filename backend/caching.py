@@ -0,0 +1,325 @@
+"""
+Dependency-tracked caching for the DevHub API
+
+Cached responses record the posts, tags and listings they were built from.
+Each of those dependencies has a version counter in the cache; an entry is
+stored together with the versions it saw and is only served while they are
+unchanged. A write bumps the versions of what it touched, which invalidates
+exactly the entries built from them instead of clearing the whole cache.
+
+Every worker also keeps a small LRU of recent entries in process memory in
+front of Redis, so hot keys are served without a network round trip. Writes
+publish the dependencies they invalidated on a Redis pub/sub channel and each
+worker drops the matching local entries. When Redis is unreachable the cache
+keeps working from process memory alone and replays the pending invalidations
+once Redis is back.
+
+Dependency names used by the API:
+    post:<id>               a post's own content
+    listing:all             the unfiltered post listing
+    listing:tag:<name>      the post listing filtered by a tag
+    user:<id>               a user's name and picture, shown with their posts
+    tags                    tag usage counts
+    trending                trending story ranking
+"""
+
+import json
+import logging
+import threading
+import time
+import uuid
+from collections import OrderedDict, defaultdict
+from redis.exceptions import RedisError
+from models import normalize_tag_name
+
+logger = logging.getLogger(__name__)
+
+INVALIDATION_CHANNEL = "devhub:cache-invalidations"
+
+_MISSING = object()
+
+
+def post_dependencies(posts):
+    """Returns the dependency names for a list of serialized posts, including their hosts."""
+    return [f"post:{post['id']}" for post in posts] + user_dependencies(post.get("host_id") for post in posts)
+
+
+def user_dependencies(user_ids):
+    """Returns the dependency names for the users shown with cached content."""
+    return [f"user:{user_id}" for user_id in dict.fromkeys(user_ids) if user_id is not None]
+
+
+def listing_dependency(tag=None):
+    """Returns the dependency name of a post listing, optionally filtered by tag."""
+    if tag and tag != 'All':
+        return f"listing:tag:{normalize_tag_name(tag)}"
+    return "listing:all"
+
+
+class LocalCache:
+    """Bounded, TTL-aware LRU cache held in process memory.
+
+    Entries remember their dependencies so they can be dropped when one of
+    them is invalidated.
+
+    Args:
+        max_entries (int, optional): Entries kept before the least recently used is evicted
+        ttl (int, optional): Longest time in seconds an entry is kept
+    """
+
+    def __init__(self, max_entries=1024, ttl=30):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._keys_by_dependency = defaultdict(set)
+        self._lock = threading.Lock()
+
+    def _remove(self, key):
+        item = self._entries.pop(key, None)
+        if item is None:
+            return
+        for dependency in item[2]:
+            keys = self._keys_by_dependency.get(dependency)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._keys_by_dependency[dependency]
+
+    def get(self, key, default=None):
+        """Returns a live entry and marks it as recently used."""
+        with self._lock:
+            item = self._entries.get(key)
+            if item is None:
+                return default
+            if item[0] <= time.monotonic():
+                self._remove(key)
+                return default
+            self._entries.move_to_end(key)
+            return item[1]
+
+    def set(self, key, value, dependencies=(), timeout=None):
+        """Stores an entry, evicting the least recently used ones beyond the bound."""
+        ttl = min(timeout, self.ttl) if timeout else self.ttl
+        with self._lock:
+            self._remove(key)
+            self._entries[key] = (time.monotonic() + ttl, value, tuple(dependencies))
+            for dependency in dependencies:
+                self._keys_by_dependency[dependency].add(key)
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+
+    def invalidate(self, dependencies):
+        """Drops every entry built from one of the given dependencies."""
+        with self._lock:
+            for dependency in dependencies:
+                for key in list(self._keys_by_dependency.get(dependency, ())):
+                    self._remove(key)
+
+    def clear(self):
+        """Drops every entry."""
+        with self._lock:
+            self._entries.clear()
+            self._keys_by_dependency.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class DependencyCache:
+    """Namespaced two-tier cache whose entries are invalidated through their dependencies.
+
+    Args:
+        cache (flask_caching.Cache): Shared cache holding entries and dependency versions
+        local_cache (LocalCache, optional): Per-process cache consulted first
+        redis_client (redis.Redis, optional): Client used to broadcast and receive
+            invalidations; without one, invalidations stay within this process
+        channel (str, optional): Pub/sub channel carrying invalidations
+        retry_interval (int, optional): Seconds to wait before retrying Redis after a failure
+        on_lookup (callable, optional): Called with the namespace and whether it
+            was a hit after every lookup
+    """
+
+    def __init__(self, cache, local_cache=None, redis_client=None,
+                 channel=INVALIDATION_CHANNEL, retry_interval=5, on_lookup=None):
+        self.cache = cache
+        self.local = local_cache if local_cache is not None else LocalCache()
+        self.redis_client = redis_client
+        self.channel = channel
+        self.retry_interval = retry_interval
+        self.on_lookup = on_lookup
+        self._stats = defaultdict(lambda: {"hits": 0, "local_hits": 0, "misses": 0})
+        self._stats_lock = threading.Lock()
+        self._shared_down_until = 0
+        self._pending = set()
+        self._pending_lock = threading.Lock()
+        self._listener = None
+        self._listener_lock = threading.Lock()
+        self._origin = uuid.uuid4().hex
+
+    @staticmethod
+    def _entry_key(namespace, key):
+        return f"{namespace}:{key}"
+
+    @staticmethod
+    def _version_key(dependency):
+        return f"dep:{dependency}"
+
+    def _versions(self, dependencies):
+        """Fetches the current version of each dependency in one round trip."""
+        if not dependencies:
+            return {}
+        keys = [self._version_key(dependency) for dependency in dependencies]
+        return dict(zip(dependencies, self.cache.get_many(*keys)))
+
+    def _record(self, namespace, *outcomes):
+        with self._stats_lock:
+            for outcome in outcomes:
+                self._stats[namespace][outcome] += 1
+
+    def _notify(self, namespace, hit):
+        if self.on_lookup is not None:
+            self.on_lookup(namespace, hit)
+
+    def _shared(self, operation, default=None):
+        """Runs an operation against Redis, degrading to local-only on failure."""
+        if time.monotonic() < self._shared_down_until:
+            return default
+        try:
+            result = operation()
+        except (RedisError, OSError) as exc:
+            logger.warning("Redis unavailable, serving from the local cache: %s", exc)
+            self._shared_down_until = time.monotonic() + self.retry_interval
+            return default
+        if self._pending:
+            self._flush_pending()
+        return result
+
+    def _bump_versions(self, dependencies):
+        backend = self.cache.cache
+        for dependency in dependencies:
+            backend.inc(self._version_key(dependency))
+
+    def _publish(self, dependencies):
+        if self.redis_client is None:
+            return
+        try:
+            self.redis_client.publish(self.channel, json.dumps({
+                "origin": self._origin,
+                "dependencies": list(dependencies)
+            }))
+        except (RedisError, OSError) as exc:
+            logger.warning("Could not broadcast cache invalidation: %s", exc)
+
+    def _flush_pending(self):
+        """Replays invalidations that happened while Redis was unreachable."""
+        with self._pending_lock:
+            pending, self._pending = self._pending, set()
+        try:
+            self._bump_versions(pending)
+        except (RedisError, OSError) as exc:
+            logger.warning("Could not apply cache invalidations: %s", exc)
+            self._shared_down_until = time.monotonic() + self.retry_interval
+            with self._pending_lock:
+                self._pending |= pending
+            return
+        self._publish(pending)
+
+    def _ensure_listener(self):
+        """Starts the background thread applying invalidations from other workers."""
+        if self.redis_client is None or self._listener is not None:
+            return
+        with self._listener_lock:
+            if self._listener is None:
+                self._listener = threading.Thread(
+                    target=self._listen, name="cache-invalidations", daemon=True)
+                self._listener.start()
+
+    def _listen(self):
+        while True:
+            try:
+                pubsub = self.redis_client.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(self.channel)
+                for message in pubsub.listen():
+                    if message.get("type") != "message":
+                        continue
+                    payload = json.loads(message["data"])
+                    # Our own invalidations were applied when they were made
+                    if payload["origin"] != self._origin:
+                        self.local.invalidate(payload["dependencies"])
+            except (RedisError, OSError, ValueError, KeyError) as exc:
+                logger.warning("Cache invalidation channel lost: %s", exc)
+            # Invalidations may have been missed while disconnected
+            self.local.clear()
+            time.sleep(self.retry_interval)
+
+    def get(self, namespace, key):
+        """Returns a cached value, or None if it is missing or was invalidated."""
+        self._ensure_listener()
+        entry_key = self._entry_key(namespace, key)
+        value = self.local.get(entry_key, _MISSING)
+        if value is not _MISSING:
+            self._record(namespace, "hits", "local_hits")
+            self._notify(namespace, True)
+            return value
+
+        def fetch():
+            entry = self.cache.get(entry_key)
+            if entry is not None and self._versions(list(entry["dependencies"])) == entry["dependencies"]:
+                return entry
+            return None
+
+        entry = self._shared(fetch)
+        if entry is not None:
+            self.local.set(entry_key, entry["value"], entry["dependencies"])
+            self._record(namespace, "hits")
+            self._notify(namespace, True)
+            return entry["value"]
+        self._record(namespace, "misses")
+        self._notify(namespace, False)
+        return None
+
+    def set(self, namespace, key, value, timeout=None, depends_on=()):
+        """Caches a value together with the current versions of its dependencies.
+
+        Args:
+            namespace (str): Cache namespace, used for hit and miss statistics
+            key (str): Key of the entry within the namespace
+            value: Value to cache
+            timeout (int, optional): Time to live in seconds
+            depends_on (iterable, optional): Dependency names the value was built from
+        """
+        self._ensure_listener()
+        entry_key = self._entry_key(namespace, key)
+        dependencies = list(dict.fromkeys(depends_on))
+        self.local.set(entry_key, value, dependencies, timeout)
+
+        def store():
+            entry = {"value": value, "dependencies": self._versions(dependencies)}
+            self.cache.set(entry_key, entry, timeout=timeout)
+
+        self._shared(store)
+
+    def invalidate(self, *dependencies):
+        """Bumps the version of each dependency, invalidating the entries built from it.
+
+        Local entries are dropped right away and other workers are notified over
+        pub/sub. If Redis is unreachable the bump is retried once it is back.
+        """
+        dependencies = list(dict.fromkeys(dependencies))
+        self.local.invalidate(dependencies)
+        with self._pending_lock:
+            self._pending.update(dependencies)
+        self._shared(lambda: None)
+
+    def clear(self):
+        """Drops every entry from both tiers."""
+        self.local.clear()
+        self._shared(self.cache.clear)
+
+    def stats(self):
+        """Returns the hit and miss counters of each namespace in this process.
+
+        Hits include local_hits, the ones served from process memory.
+        """
+        with self._stats_lock:
+            return {namespace: dict(counts) for namespace, counts in self._stats.items()}
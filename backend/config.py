@@ -4,15 +4,78 @@ from flask_migrate import Migrate
 from flask_login import LoginManager
 from flask_jwt_extended import JWTManager
 import os
+import redis
 from flask_cors import CORS
+from database import engine_options, configure_engine
 
 app = Flask(__name__)
 
-app.config["SQLALCHEMY_DATABASE_URI"] = "sqlite:///mydatabase.db"
+app.config["SQLALCHEMY_DATABASE_URI"] = os.environ.get("DATABASE_URL", "sqlite:///mydatabase.db")
+
+# Engine profile, chosen by the kind of database (see database.py). SQLite
+# connections get these pragmas; cache_size is in KiB when negative
+app.config["SQLITE_JOURNAL_MODE"] = os.environ.get("SQLITE_JOURNAL_MODE", "wal")
+app.config["SQLITE_SYNCHRONOUS"] = os.environ.get("SQLITE_SYNCHRONOUS", "normal")
+app.config["SQLITE_MMAP_SIZE"] = int(os.environ.get("SQLITE_MMAP_SIZE", 256 * 1024 * 1024))
+app.config["SQLITE_CACHE_SIZE"] = int(os.environ.get("SQLITE_CACHE_SIZE", -64 * 1024))
+app.config["SQLITE_BUSY_TIMEOUT"] = int(os.environ.get("SQLITE_BUSY_TIMEOUT", 5000))  # milliseconds
+# Connection pool for server databases such as PostgreSQL
+app.config["DB_POOL_SIZE"] = int(os.environ.get("DB_POOL_SIZE", 10))
+app.config["DB_MAX_OVERFLOW"] = int(os.environ.get("DB_MAX_OVERFLOW", 20))
+app.config["DB_POOL_TIMEOUT"] = float(os.environ.get("DB_POOL_TIMEOUT", 30))
+app.config["DB_POOL_RECYCLE"] = int(os.environ.get("DB_POOL_RECYCLE", 1800))  # seconds
+app.config["DB_POOL_PRE_PING"] = os.environ.get("DB_POOL_PRE_PING", "1") != "0"
+app.config["SQLALCHEMY_ENGINE_OPTIONS"] = engine_options(app.config)
 app.config["UPLOAD_FOLDER"] = os.path.join(os.path.dirname(os.path.abspath(__file__)), "uploads")
 app.config["ALLOWED_EXTENSIONS"] = {'png', 'jpg', 'jpeg', 'gif'}
-if not os.path.exists(app.config["UPLOAD_FOLDER"]):
-    os.makedirs(app.config["UPLOAD_FOLDER"])
+# Resized profile picture variants, named by content hash
+app.config["AVATAR_FOLDER"] = os.path.join(app.config["UPLOAD_FOLDER"], "avatars")
+if not os.path.exists(app.config["AVATAR_FOLDER"]):
+    os.makedirs(app.config["AVATAR_FOLDER"])
+
+# Redis backs the shared response cache; each worker also keeps a small
+# in-process cache in front of it
+app.config["CACHE_REDIS_URL"] = os.environ.get("REDIS_URL", "redis://localhost:6379/0")
+app.config["CACHE_LOCAL_MAX_ENTRIES"] = int(os.environ.get("CACHE_LOCAL_MAX_ENTRIES", 1024))
+app.config["CACHE_LOCAL_TTL"] = int(os.environ.get("CACHE_LOCAL_TTL", 30))
+
+# Trending scores live in a Redis sorted set ("redis") or in process memory ("memory")
+app.config["TRENDING_STORE"] = os.environ.get("TRENDING_STORE", "redis")
+app.config["TRENDING_HALF_LIFE_HOURS"] = float(os.environ.get("TRENDING_HALF_LIFE_HOURS", 24))
+
+# The recent activity feed keeps its newest entries in a Redis list ("redis")
+# or in process memory ("memory"); every event is also stored in the database
+app.config["ACTIVITY_STORE"] = os.environ.get("ACTIVITY_STORE", "redis")
+app.config["ACTIVITY_STREAM_LENGTH"] = int(os.environ.get("ACTIVITY_STREAM_LENGTH", 100))
+
+# Seconds before each worker reloads its tag autocomplete index from the database
+app.config["TAG_INDEX_TTL"] = int(os.environ.get("TAG_INDEX_TTL", 300))
+
+# New posts are copied into the timeline of each follower of their tags, unless
+# a tag has more than FEED_FANOUT_LIMIT followers; following a tag copies in
+# its FEED_BACKFILL newest posts
+app.config["FEED_FANOUT_LIMIT"] = int(os.environ.get("FEED_FANOUT_LIMIT", 1000))
+app.config["FEED_BACKFILL"] = int(os.environ.get("FEED_BACKFILL", 100))
+
+# Password hashes use werkzeug method strings and are computed on a bounded
+# pool; logins beyond the pool and its queue are answered with 503
+app.config["PASSWORD_HASH_METHOD"] = os.environ.get("PASSWORD_HASH_METHOD", "scrypt:32768:8:1")
+app.config["PASSWORD_HASH_WORKERS"] = int(os.environ.get("PASSWORD_HASH_WORKERS", os.cpu_count() or 2))
+app.config["PASSWORD_HASH_QUEUE_SIZE"] = int(os.environ.get("PASSWORD_HASH_QUEUE_SIZE", 32))
+app.config["PASSWORD_HASH_TIMEOUT"] = float(os.environ.get("PASSWORD_HASH_TIMEOUT", 10))
+
+# Independent queries within a request can run concurrently on a pool of this
+# many threads (see fanout.py); 0, the default, runs them one after another.
+# It pays off when each statement waits on a database across the network and
+# few requests run at once; under load the pool threads only add contention,
+# so measure with benchmarks/bench_fanout.py before enabling it
+app.config["FANOUT_WORKERS"] = int(os.environ.get("FANOUT_WORKERS", 0))
+
+# Posts read from the database at a time by the streaming export
+app.config["EXPORT_BATCH_SIZE"] = int(os.environ.get("EXPORT_BATCH_SIZE", 500))
+
+# Requests taking longer than this many milliseconds are logged with the SQL they ran
+app.config["SLOW_REQUEST_MS"] = float(os.environ.get("SLOW_REQUEST_MS", 500))
 
 app.config["JWT_SECRET_KEY"] = os.environ.get("JWT_SECRET_KEY", "your-secret-key")  # Change this to a secure secret key
 app.config["JWT_ACCESS_TOKEN_EXPIRES"] = 399600  # 1 hour
@@ -25,4 +88,10 @@ login_manager.init_app(app)
 jwt = JWTManager(app)
 
 db = SQLAlchemy(app)
+with app.app_context():
+    configure_engine(db.engine, app.config)
 migrate = Migrate(app, db)
+
+# Shared client for Redis features beyond Flask-Caching (pub/sub, sorted sets);
+# connections are only opened on first use
+redis_client = redis.Redis.from_url(app.config["CACHE_REDIS_URL"])
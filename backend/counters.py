@@ -0,0 +1,70 @@
+"""
+Denormalized counters for the DevHub API
+
+Like, bookmark, comment, tag usage and tag follower counts are stored as columns on their
+rows so reading them is a column fetch instead of a collection load. The
+endpoints that write the association tables adjust the counters in the same
+transaction with relative UPDATE statements, and the `flask recount` command
+rebuilds every counter from the association tables in bulk.
+"""
+
+import click
+from sqlalchemy import func, select, update
+from config import app, db
+from models import Post, Tag, Comment, post_likes, post_bookmarks, post_tag, comment_likes, tag_follows
+
+
+def adjust_counter(column, row_ids, delta):
+    """Adds delta to a counter column within the current transaction.
+
+    Args:
+        column: Counter column to adjust, e.g. Post.like_count
+        row_ids (int or list): Primary key(s) of the rows to update
+        delta (int): Amount to add, negative to decrement
+    """
+    if isinstance(row_ids, int):
+        row_ids = [row_ids]
+    if not row_ids:
+        return
+    model = column.class_
+    db.session.execute(
+        update(model)
+        .where(model.id.in_(row_ids))
+        .values({column: column + delta})
+    )
+
+
+def _count_of(table, foreign_key, owner_id):
+    """Builds a correlated COUNT(*) subquery over an association table."""
+    return select(func.count())\
+        .select_from(table)\
+        .where(foreign_key == owner_id)\
+        .scalar_subquery()
+
+
+def recount_all():
+    """Rebuilds every denormalized counter from the association tables."""
+    options = {"synchronize_session": False}
+    db.session.execute(update(Post).values(
+        like_count=_count_of(post_likes, post_likes.c.post_id, Post.id),
+        bookmark_count=_count_of(post_bookmarks, post_bookmarks.c.post_id, Post.id),
+        comment_count=_count_of(Comment.__table__, Comment.post_id, Post.id),
+        # Keep the edit timestamp untouched by the rebuild
+        updated=Post.updated
+    ), execution_options=options)
+    db.session.execute(update(Comment).values(
+        like_count=_count_of(comment_likes, comment_likes.c.comment_id, Comment.id),
+        updated=Comment.updated
+    ), execution_options=options)
+    db.session.execute(update(Tag).values(
+        post_count=_count_of(post_tag, post_tag.c.tag_id, Tag.id),
+        follower_count=_count_of(tag_follows, tag_follows.c.tag_id, Tag.id)
+    ), execution_options=options)
+    db.session.commit()
+
+
+@app.cli.command("recount")
+def recount_command():
+    """Rebuilds the like, bookmark, comment, tag and follower counters."""
+    recount_all()
+    click.echo("Counters rebuilt.")
@@ -0,0 +1,76 @@
+"""
+Database engine profiles for the DevHub API
+
+The engine is configured from the environment according to the kind of
+database DATABASE_URL points at:
+
+- SQLite: every new connection is switched to write-ahead logging, so
+  readers keep reading while a like or comment is being written, with
+  synchronous=NORMAL (durable at checkpoints; a power loss can only drop
+  the last commits), a memory-mapped read window, a larger page cache and a
+  busy timeout, so a writer waits for the write lock instead of failing
+  with "database is locked".
+- Server databases (PostgreSQL, MySQL): a sized connection pool with
+  overflow, a checkout timeout, periodic recycling and pre-ping, so
+  connections dropped by the server or a proxy are replaced transparently.
+  The driver named in the URL must be installed, e.g. psycopg for
+  postgresql+psycopg://.
+"""
+
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+
+
+def is_sqlite(database_uri):
+    """Checks whether a database URI points at SQLite."""
+    return make_url(database_uri).get_backend_name() == "sqlite"
+
+
+def engine_options(config):
+    """Builds SQLALCHEMY_ENGINE_OPTIONS for the configured database.
+
+    Args:
+        config: App config holding SQLALCHEMY_DATABASE_URI and the DB_POOL_* settings
+
+    Returns:
+        dict: Keyword arguments for create_engine()
+    """
+    if is_sqlite(config["SQLALCHEMY_DATABASE_URI"]):
+        return {}
+    return {
+        "pool_size": config["DB_POOL_SIZE"],
+        "max_overflow": config["DB_MAX_OVERFLOW"],
+        "pool_timeout": config["DB_POOL_TIMEOUT"],
+        "pool_recycle": config["DB_POOL_RECYCLE"],
+        "pool_pre_ping": config["DB_POOL_PRE_PING"],
+    }
+
+
+def sqlite_pragmas(config):
+    """Returns the pragmas applied to each SQLite connection, in order."""
+    return {
+        "busy_timeout": config["SQLITE_BUSY_TIMEOUT"],
+        "journal_mode": config["SQLITE_JOURNAL_MODE"],
+        "synchronous": config["SQLITE_SYNCHRONOUS"],
+        "mmap_size": config["SQLITE_MMAP_SIZE"],
+        "cache_size": config["SQLITE_CACHE_SIZE"],
+    }
+
+
+def configure_engine(engine, config):
+    """Applies the SQLite pragmas to every connection the engine opens.
+
+    Engines for other databases are left as they are.
+    """
+    if engine.dialect.name != "sqlite":
+        return
+    pragmas = sqlite_pragmas(config)
+
+    @event.listens_for(engine, "connect")
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for name, value in pragmas.items():
+                cursor.execute(f"PRAGMA {name}={value}")
+        finally:
+            cursor.close()
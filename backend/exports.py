@@ -0,0 +1,115 @@
+"""
+Streaming post export for the DevHub API
+
+GET /export/posts streams posts as NDJSON for downstream pipelines, oldest
+change first. It walks the (updated, id) index with a yield_per query, so
+memory use stays flat however many posts are exported, and tags and
+counters are read with one query per batch rather than per post.
+
+Every batch is followed by a checkpoint record with a resume token, and the
+stream ends with an end record. Passing a token back as ?resume= continues
+after the position it encodes: an interrupted export restarts from its last
+checkpoint, and the end token starts the next incremental sync. Update times
+only have one-second resolution on SQLite, so the end token points at the
+start of the last second exported and the next sync sends the posts of that
+second again rather than missing ones edited later within it. Clients should
+upsert posts by ID. Deleted posts are not reported.
+
+Record formats:
+    {"type": "post", "id", "host_id", "title", "body", "created", "updated"}
+        plus "tags": [names] and "like_count", "bookmark_count", "comment_count" when included
+    {"type": "checkpoint", "resume_token", "exported"}
+    {"type": "end", "resume_token", "exported"}
+"""
+
+import json
+from datetime import datetime, timezone
+from sqlalchemy import select
+from config import app, db
+from models import Post, Tag, post_tag
+from pagination import after_position, encode_position
+
+# Extras a client can ask for with ?include=
+EXPORT_INCLUDES = frozenset(["tags", "counters"])
+
+COUNTER_COLUMNS = [Post.like_count, Post.bookmark_count, Post.comment_count]
+
+
+def parse_since(value):
+    """Parses an ISO 8601 timestamp into the naive UTC datetime the database stores.
+
+    Raises:
+        ValueError: If the value is not an ISO 8601 timestamp
+    """
+    parsed = datetime.fromisoformat(value)
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+
+def _encode(record):
+    return json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n"
+
+
+def _tag_names(post_ids):
+    """Returns {post_id: [tag names]} for a batch of posts in one query."""
+    names = {post_id: [] for post_id in post_ids}
+    rows = db.session.execute(
+        select(post_tag.c.post_id, Tag.name)
+        .join(Tag, Tag.id == post_tag.c.tag_id)
+        .where(post_tag.c.post_id.in_(post_ids))
+        .order_by(post_tag.c.post_id, post_tag.c.tag_id)
+    )
+    for post_id, name in rows:
+        names[post_id].append(name)
+    return names
+
+
+def export_posts(position=None, include=(), batch_size=None):
+    """Yields posts updated after a position as NDJSON, one chunk per batch.
+
+    Args:
+        position (tuple, optional): (updated, id) to continue after, e.g. from a resume
+            token; (since, 0) exports every post updated at or after since
+        include (iterable, optional): Extras from EXPORT_INCLUDES to add to each post
+        batch_size (int, optional): Posts fetched at a time. Defaults to EXPORT_BATCH_SIZE.
+
+    Yields:
+        str: Newline-terminated records of one batch followed by its checkpoint,
+            and finally the end record
+    """
+    columns = [Post.id, Post.host_id, Post.title, Post.body, Post.created, Post.updated]
+    if "counters" in include:
+        columns += COUNTER_COLUMNS
+    keys = [column.key for column in columns]
+    statement = select(*columns).order_by(Post.updated, Post.id)
+    if position:
+        statement = statement.where(after_position(Post.updated, Post.id, position))
+    batch_size = batch_size or app.config["EXPORT_BATCH_SIZE"]
+    result = db.session.connection().execute(statement.execution_options(yield_per=batch_size))
+
+    exported = 0
+    last = None
+    for rows in result.partitions():
+        tags = _tag_names([row.id for row in rows]) if "tags" in include else None
+        lines = []
+        for row in rows:
+            record = {"type": "post", **dict(zip(keys, row))}
+            record["created"] = row.created.isoformat() if row.created else None
+            record["updated"] = row.updated.isoformat() if row.updated else None
+            if tags is not None:
+                record["tags"] = tags[row.id]
+            lines.append(_encode(record))
+        exported += len(rows)
+        last = rows[-1]
+        lines.append(_encode({"type": "checkpoint", "resume_token": encode_position(last.updated, last.id),
+                              "exported": exported}))
+        yield "".join(lines)
+
+    if last is not None:
+        resume_token = encode_position(last.updated, 0)
+    elif position:
+        resume_token = encode_position(*position)
+    else:
+        resume_token = None
+    yield _encode({"type": "end", "resume_token": resume_token, "exported": exported})
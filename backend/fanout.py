@@ -0,0 +1,106 @@
+"""
+Concurrent fan-out for the DevHub API
+
+Views run on the WSGI server's worker threads, and a view that makes several
+independent queries used to wait for each in turn. fan_out.run() runs such
+calls at the same time: the first on the calling thread and the rest on a
+shared, bounded thread pool, so the request takes as long as its slowest
+query rather than the sum of them. Database drivers and Redis clients
+release the GIL while they wait, so the calls overlap even in one process.
+
+Each pooled call runs in its own application context, and so with its own
+database session and connection, under a copy of the caller's request
+context and a copy of its g (the JWT identity, the request's metrics).
+Calls should therefore only read, and return plain data rather than ORM
+instances, which are detached once the call's session closes. Calls made
+from a pool thread run inline, so nested fan-outs never wait on a pool they
+have exhausted.
+
+The pooled calls take their connections from the same engine pool as the
+request threads. So that a request never holds a connection while waiting
+for calls that need one, run() ends the caller's transaction before it fans
+out and again once its own call returns; with every worker thread waiting
+in a fan-out, the pool still has the connections the calls need. The
+caller's read transaction is rolled back to do so, which expires its loaded
+instances; a caller with unsaved changes gets a RuntimeError instead, as
+fanning out would discard them. Each call reads in its own transaction: on
+databases other than SQLite the calls may see different snapshots, e.g. a
+comment added between the post being read and its comments being read.
+
+FANOUT_WORKERS sets the pool size; 0, the default, runs every call in turn
+on the calling thread.
+"""
+
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+from flask import copy_current_request_context, g, has_app_context, has_request_context
+from config import app, db
+
+
+class FanOut:
+    """Runs independent calls concurrently on a bounded thread pool.
+
+    Args:
+        workers (int): Number of pool threads, or 0 to run calls sequentially
+    """
+
+    def __init__(self, workers):
+        self.workers = workers
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="fan-out") if workers else None
+        self._local = threading.local()
+
+    def run(self, *calls):
+        """Runs calls concurrently and returns their results in order.
+
+        Args:
+            *calls: Functions taking no arguments
+
+        Returns:
+            list: The value each call returned
+
+        Raises:
+            RuntimeError: If the caller's session has unsaved changes
+            Exception: The first failing call's exception, once every call has finished
+        """
+        if self._executor is None or len(calls) < 2 or getattr(self._local, "pooled", False):
+            return [call() for call in calls]
+
+        _release_connection()
+        futures = [self._executor.submit(self._pooled(call)) for call in calls[1:]]
+        try:
+            first = calls[0]()
+        finally:
+            _release_connection()
+            wait(futures)
+        return [first, *(future.result() for future in futures)]
+
+    def _pooled(self, call):
+        """Wraps a call to run on a pool thread in a new app context with the caller's request and g."""
+        shared = dict(vars(g)) if has_app_context() else {}
+        if has_request_context():
+            call = copy_current_request_context(call)
+
+        def pooled():
+            self._local.pooled = True
+            try:
+                with app.app_context():
+                    vars(g).update(shared)
+                    return call()
+            finally:
+                self._local.pooled = False
+
+        return pooled
+
+
+def _release_connection():
+    """Ends the caller's read transaction, returning its connection to the pool."""
+    if not has_app_context():
+        return
+    session = db.session()
+    if session.new or session.dirty or session.deleted:
+        raise RuntimeError("Commit or discard session changes before fanning out")
+    if session.in_transaction():
+        session.rollback()
+
+
+fan_out = FanOut(app.config["FANOUT_WORKERS"])
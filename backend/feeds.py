@@ -0,0 +1,221 @@
+"""
+Home feeds for the DevHub API
+
+Users follow tags, and their home feed lists the posts carrying any tag they
+follow, newest first. Feeds are ordered by post ID, which follows creation
+order, so every source of a feed can be read from an index in that order.
+
+Most feeds are precomputed: when a post is created it is copied into the
+timeline (the feed_entry table) of every follower of its tags with a single
+INSERT ... SELECT, and reading a feed is an index range scan of the user's
+timeline. A tag with more than FEED_FANOUT_LIMIT followers would make each
+new post write that many rows, so once a tag crosses the limit it is marked
+fan_in and its posts are no longer copied. Instead, reading a feed merges the
+timeline with the newest posts of each fan_in tag the user follows, each read
+from the (tag_id, post_id) index of post_tags. The mark is kept when the tag
+later loses followers, so its posts from that time are never missing from
+feeds; `flask feed-rebuild` recomputes the marks and every timeline.
+"""
+
+import click
+from sqlalchemy import delete, desc, func, insert, literal, select, union_all, update
+from config import app, db
+from models import Tag, post_tag, tag_follows, feed_entries
+from associations import insert_ignoring_conflicts, toggle_association
+
+
+def fan_out_post(post_id, tags):
+    """Copies a new post into the timelines of its tags' followers.
+
+    Runs in the current transaction. Followers of fan_in tags are skipped;
+    they see the post when reading their feed.
+
+    Args:
+        post_id (int): ID of the new post
+        tags (list): The post's Tag objects
+    """
+    tag_ids = [tag.id for tag in tags if not tag.fan_in]
+    if not tag_ids:
+        return
+    followers = select(tag_follows.c.user_id, literal(post_id))\
+        .where(tag_follows.c.tag_id.in_(tag_ids))\
+        .distinct()
+    db.session.execute(insert(feed_entries).from_select(["user_id", "post_id"], followers))
+
+
+def remove_from_timelines(post_id):
+    """Deletes a post from every timeline in the current transaction."""
+    db.session.execute(delete(feed_entries).where(feed_entries.c.post_id == post_id))
+
+
+def _recent_post_ids(tag_id):
+    """Returns the IDs of a tag's FEED_BACKFILL newest posts."""
+    return db.session.execute(
+        select(post_tag.c.post_id)
+        .where(post_tag.c.tag_id == tag_id)
+        .order_by(desc(post_tag.c.post_id))
+        .limit(app.config["FEED_BACKFILL"])
+    ).scalars().all()
+
+
+def _backfill_timeline(user_id, tag_id):
+    """Copies a tag's newest posts into a user's timeline."""
+    recent = _recent_post_ids(tag_id)
+    insert_ignoring_conflicts(feed_entries,
+                              [{"user_id": user_id, "post_id": post_id} for post_id in recent],
+                              ["user_id", "post_id"])
+
+
+def _prune_timeline(user_id, tag_id):
+    """Drops an unfollowed tag's posts from a user's timeline, unless another followed tag has them."""
+    still_followed = select(post_tag.c.post_id).where(post_tag.c.tag_id.in_(
+        select(tag_follows.c.tag_id).where(tag_follows.c.user_id == user_id)))
+    db.session.execute(
+        delete(feed_entries)
+        .where(feed_entries.c.user_id == user_id,
+               feed_entries.c.post_id.in_(select(post_tag.c.post_id).where(post_tag.c.tag_id == tag_id)),
+               feed_entries.c.post_id.not_in(still_followed))
+    )
+
+
+def toggle_follow(user_id, tag):
+    """Follows a tag, or unfollows it if already followed.
+
+    Runs in the current transaction. Following a tag copies its newest posts
+    into the user's timeline, or marks the tag fan_in when the new follower
+    takes it past FEED_FANOUT_LIMIT.
+
+    Args:
+        user_id (int): ID of the user
+        tag (Tag): Tag to follow or unfollow
+
+    Returns:
+        bool: True if the user follows the tag after the toggle
+    """
+    following = toggle_association(tag_follows, Tag.follower_count, tag.id,
+                                   tag_id=tag.id, user_id=user_id)
+    if not following:
+        _prune_timeline(user_id, tag.id)
+    elif not tag.fan_in:
+        followers = db.session.execute(select(Tag.follower_count).where(Tag.id == tag.id)).scalar()
+        if followers > app.config["FEED_FANOUT_LIMIT"]:
+            db.session.execute(update(Tag).where(Tag.id == tag.id).values(fan_in=True))
+        else:
+            _backfill_timeline(user_id, tag.id)
+    return following
+
+
+def fan_out_imported(first_post_id, follows):
+    """Brings timelines up to date after a bulk import.
+
+    Runs in the current transaction, after the follower counts have been
+    recounted. Tags the import took past FEED_FANOUT_LIMIT are marked fan_in,
+    the imported posts are copied to the followers of their other tags, and
+    each imported follow copies in the tag's newest posts, as if the posts had
+    been created and the tags followed one by one. Existing timeline entries
+    are kept.
+
+    Args:
+        first_post_id (int): Lowest ID given to an imported post; every post
+            from it on was imported
+        follows (iterable): (tag_id, user_id) pairs of the imported follows
+    """
+    db.session.execute(update(Tag).where(~Tag.fan_in, Tag.follower_count > app.config["FEED_FANOUT_LIMIT"])
+                       .values(fan_in=True), execution_options={"synchronize_session": False})
+    fan_in = set(db.session.execute(select(Tag.id).where(Tag.fan_in)).scalars())
+
+    followers = select(tag_follows.c.user_id, post_tag.c.post_id)\
+        .join(post_tag, post_tag.c.tag_id == tag_follows.c.tag_id)\
+        .where(post_tag.c.post_id >= first_post_id, post_tag.c.tag_id.not_in(fan_in))\
+        .distinct()
+    db.session.execute(insert(feed_entries).from_select(["user_id", "post_id"], followers))
+
+    users_by_tag = {}
+    for tag_id, user_id in follows:
+        if tag_id not in fan_in:
+            users_by_tag.setdefault(tag_id, set()).add(user_id)
+    for tag_id, user_ids in users_by_tag.items():
+        recent = _recent_post_ids(tag_id)
+        insert_ignoring_conflicts(feed_entries,
+                                  [{"user_id": user_id, "post_id": post_id}
+                                   for user_id in user_ids for post_id in recent],
+                                  ["user_id", "post_id"])
+
+
+def feed_post_ids(user_id, before=None, per_page=10):
+    """Returns the IDs of one page of a user's feed, newest first.
+
+    The user's timeline and the newest posts of each fan_in tag they follow
+    are read in one statement, each bounded to a page, and merged.
+
+    Args:
+        user_id (int): ID of the user
+        before (int, optional): Only return posts older than this post ID,
+            the cursor returned with the previous page
+        per_page (int, optional): Posts per page. Defaults to 10.
+
+    Returns:
+        tuple: (list of post IDs, ID to pass as before for the next page or None)
+    """
+    limit = per_page + 1
+    timeline = select(feed_entries.c.post_id.label("post_id"))\
+        .where(feed_entries.c.user_id == user_id)
+    if before is not None:
+        timeline = timeline.where(feed_entries.c.post_id < before)
+    streams = [timeline.order_by(desc(feed_entries.c.post_id)).limit(limit)]
+
+    fan_in_tags = db.session.execute(
+        select(tag_follows.c.tag_id)
+        .join(Tag, Tag.id == tag_follows.c.tag_id)
+        .where(tag_follows.c.user_id == user_id, Tag.fan_in)
+    ).scalars()
+    for tag_id in fan_in_tags:
+        stream = select(post_tag.c.post_id.label("post_id")).where(post_tag.c.tag_id == tag_id)
+        if before is not None:
+            stream = stream.where(post_tag.c.post_id < before)
+        streams.append(stream.order_by(desc(post_tag.c.post_id)).limit(limit))
+
+    if len(streams) == 1:
+        post_ids = db.session.execute(streams[0]).scalars().all()
+    else:
+        # Each stream keeps its own ORDER BY and LIMIT inside a subquery
+        merged = union_all(*[select(stream.subquery()) for stream in streams])
+        post_ids = sorted(set(db.session.execute(merged).scalars()), reverse=True)[:limit]
+
+    if len(post_ids) > per_page:
+        return post_ids[:per_page], post_ids[per_page - 1]
+    return post_ids, None
+
+
+def rebuild_timelines():
+    """Recomputes the fan_in marks and rebuilds every timeline.
+
+    Each follower of a tag that is not fan_in gets the tag's FEED_BACKFILL
+    newest posts, as if they had just followed it.
+
+    Returns:
+        int: Number of timeline entries written
+    """
+    db.session.execute(update(Tag).values(fan_in=Tag.follower_count > app.config["FEED_FANOUT_LIMIT"]),
+                       execution_options={"synchronize_session": False})
+    db.session.execute(delete(feed_entries))
+    ranked = select(
+        post_tag.c.tag_id,
+        post_tag.c.post_id,
+        func.row_number().over(partition_by=post_tag.c.tag_id,
+                               order_by=desc(post_tag.c.post_id)).label("position")
+    ).subquery()
+    entries = select(tag_follows.c.user_id, ranked.c.post_id)\
+        .join(ranked, ranked.c.tag_id == tag_follows.c.tag_id)\
+        .join(Tag, Tag.id == tag_follows.c.tag_id)\
+        .where(~Tag.fan_in, ranked.c.position <= app.config["FEED_BACKFILL"])\
+        .distinct()
+    db.session.execute(insert(feed_entries).from_select(["user_id", "post_id"], entries))
+    db.session.commit()
+    return db.session.execute(select(func.count()).select_from(feed_entries)).scalar()
+
+
+@app.cli.command("feed-rebuild")
+def feed_rebuild_command():
+    """Rebuilds the home feed timelines from the tag follows."""
+    click.echo(f"Wrote {rebuild_timelines()} timeline entries.")
@@ -0,0 +1,197 @@
+"""
+Batched loaders for the DevHub API
+
+This module builds the JSON payloads returned by the post endpoints. Every loader
+runs a fixed number of queries, no matter how many comments, likes or tags are
+attached to the posts it serializes, so the cost of a request no longer grows
+with the popularity of a post.
+"""
+
+from sqlalchemy import func, select
+from sqlalchemy.orm import aliased, joinedload, selectinload
+from config import db
+from models import Post, User, Comment, post_likes, comment_likes
+from avatars import avatar_path, SMALL, MEDIUM
+from fanout import fan_out
+
+
+def _author_data(user):
+    """Serializes the author block embedded in comment payloads."""
+    if not user:
+        return {"id": None, "name": None, "avatar": None}
+    return {
+        "id": user.id,
+        "name": user.full_name,
+        "avatar": avatar_path(user.profile_pic, SMALL)
+    }
+
+
+def listing_options():
+    """Returns the loader options used by every post listing query.
+
+    Hosts are joined into the page query and tags are fetched for the whole
+    page with a single IN query.
+    """
+    return (joinedload(Post.host), selectinload(Post.tags))
+
+
+def serialize_post_summaries(posts, include_body=True, body_length=None):
+    """Serializes a page of posts for the listing endpoints.
+
+    The posts should be loaded with listing_options() so hosts and tags are
+    already in the session; like counts come from the counter column.
+
+    Args:
+        posts (list): Post instances to serialize
+        include_body (bool, optional): Whether to include the post body. Defaults to True.
+        body_length (int, optional): Truncate bodies longer than this many characters
+
+    Returns:
+        list: Post payloads in the get_posts response shape
+    """
+    posts_data = []
+    for post in posts:
+        host = post.host
+        post_data = {
+            "id": post.id,
+            "title": post.title,
+            "created": post.created.isoformat(),
+            "host_id": post.host_id,
+            "host_username": host.username if host else None,
+            "host_avatar": avatar_path(host.profile_pic, SMALL) if host else None,
+            "likes": post.like_count,
+            "tags": [tag.name for tag in post.tags]
+        }
+        if include_body:
+            body = post.body
+            if body and body_length and len(body) > body_length:
+                body = body[:body_length] + "..."
+            post_data["body"] = body
+        posts_data.append(post_data)
+    return posts_data
+
+
+def post_detail_version(post_id):
+    """Fetches what a post's detail payload is built from, in one query.
+
+    Writes to the post, its counters, its comments or the profiles of its
+    host and commenters change at least one of the returned values, so they
+    can validate a cached copy of the payload without loading it.
+
+    Args:
+        post_id (int): ID of the post
+
+    Returns:
+        Row: (updated, like_count, comment_count, comments_updated,
+            comment_likes, host_updated, commenters_updated), or None if the
+            post does not exist
+    """
+    host = aliased(User)
+    commenter = aliased(User)
+    return db.session.execute(
+        select(Post.updated, Post.like_count, Post.comment_count,
+               func.max(Comment.updated).label("comments_updated"),
+               func.sum(Comment.like_count).label("comment_likes"),
+               func.max(host.updated).label("host_updated"),
+               func.max(commenter.updated).label("commenters_updated"))
+        .outerjoin(host, host.id == Post.host_id)
+        .outerjoin(Comment, Comment.post_id == Post.id)
+        .outerjoin(commenter, commenter.id == Comment.user_id)
+        .where(Post.id == post_id)
+        .group_by(Post.id)
+    ).first()
+
+
+def load_post_detail(post_id, viewer_id=None):
+    """Loads a single post with its comments and viewer state.
+
+    The post, host and tags, the comments with their authors and the viewer's
+    likes are independent, so they are loaded concurrently (see fanout.py);
+    like counts come from the counter columns. Each is read in its own
+    transaction, so a comment or like made meanwhile may show up in one part
+    and not another.
+
+    Args:
+        post_id (int): ID of the post to load
+        viewer_id (int, optional): ID of the authenticated user, if any
+
+    Returns:
+        dict: Post payload in the get_post response shape, or None if the
+            post does not exist
+    """
+    post_data, comments, (is_liked, liked_comment_ids) = fan_out.run(
+        lambda: _load_post(post_id),
+        lambda: _load_comments(post_id),
+        lambda: _load_viewer_state(post_id, viewer_id)
+    )
+    if not post_data:
+        return None
+
+    for comment in comments:
+        comment["isLiked"] = comment["id"] in liked_comment_ids
+    post_data["isLiked"] = is_liked
+    post_data["comments"] = comments
+    return post_data
+
+
+def _load_post(post_id):
+    """Serializes a post with its host and tags, or returns None if it does not exist.
+
+    The viewer state and comments are filled in by load_post_detail.
+    """
+    post = db.session.get(Post, post_id, options=[
+        joinedload(Post.host),
+        selectinload(Post.tags)
+    ])
+    if not post:
+        return None
+
+    host = post.host
+    return {
+        "id": post.id,
+        "title": post.title,
+        "body": post.body,
+        "created": post.created.isoformat(),
+        "host_id": post.host_id,
+        "host_username": host.username if host else None,
+        "host_avatar": avatar_path(host.profile_pic, MEDIUM) if host else None,
+        "likes": post.like_count,
+        "isLiked": False,
+        "tags": [tag.name for tag in post.tags],
+        "comments": []
+    }
+
+
+def _load_comments(post_id):
+    """Serializes a post's comments with their authors, oldest first."""
+    comment_rows = db.session.query(Comment, User)\
+        .outerjoin(User, Comment.user_id == User.id)\
+        .filter(Comment.post_id == post_id)\
+        .order_by(Comment.id)\
+        .all()
+    return [{
+        "id": comment.id,
+        "content": comment.body,
+        "created": comment.created.isoformat(),
+        "author": _author_data(user),
+        "likes": comment.like_count
+    } for comment, user in comment_rows]
+
+
+def _load_viewer_state(post_id, viewer_id):
+    """Returns whether the viewer liked a post and the IDs of its comments they liked."""
+    if not viewer_id:
+        return False, set()
+    is_liked = db.session.execute(
+        select(post_likes.c.post_id).where(
+            post_likes.c.post_id == post_id,
+            post_likes.c.user_id == viewer_id
+        )
+    ).first() is not None
+    liked_comment_ids = set(db.session.execute(
+        select(comment_likes.c.comment_id)
+        .join(Comment, Comment.id == comment_likes.c.comment_id)
+        .where(Comment.post_id == post_id,
+               comment_likes.c.user_id == viewer_id)
+    ).scalars())
+    return is_liked, liked_comment_ids
@@ -14,32 +14,77 @@ Key features:
 - Comment management
 - Like and bookmark functionality
 - Tag management
+- Tag follows and home feeds
 - Search functionality
 - Trending stories
 - Recent activities
+- Streaming post export
 
 Note: Ensure that all required dependencies are installed and the database is properly
 configured before running this application.
 """
 
-from flask import jsonify, request, send_from_directory
+from flask import Response, jsonify, request, send_from_directory, stream_with_context
 from flask_jwt_extended import create_access_token, jwt_required, get_jwt_identity, verify_jwt_in_request
-from config import db, app, login_manager
-from models import Post, User, Tag, Comment, post_likes
-from werkzeug.utils import secure_filename
-import os
+from config import db, app, login_manager, redis_client
+from models import (Post, User, Tag, Comment, post_bookmarks, post_likes, comment_likes, tag_follows,
+                    normalize_tag_name)
+from loaders import load_post_detail, post_detail_version, listing_options, serialize_post_summaries
+from responses import (weak_etag, timestamp_of, prepare_response, is_not_modified,
+                       not_modified_response, send_prepared)
+from counters import adjust_counter
+from associations import associated_ids, has_association, toggle_association
+from search import search_posts, search_posts_after, index_post, remove_post
+from pagination import keyset_page, decode_position, InvalidCursor
+from caching import DependencyCache, LocalCache, listing_dependency, post_dependencies, user_dependencies
+from trending import trending_index, LIKE_WEIGHT, BOOKMARK_WEIGHT, COMMENT_WEIGHT
+from tag_index import tag_index
+from tags import resolve_tags
+from feeds import fan_out_post, remove_from_timelines, toggle_follow, feed_post_ids
+from activity import activity_stream, POST, COMMENT, LIKE
+from passwords import PasswordHashingBusy
+from exports import export_posts, parse_since, EXPORT_INCLUDES
+from fanout import fan_out
+import query_audit  # noqa: F401 registers flask audit-queries
+import bulk  # noqa: F401 registers flask export-data and import-data
+from metrics import request_metrics
+from avatars import (save_avatar, avatar_path, avatar_paths, variant_filename, InvalidImage,
+                     AVATAR_SIZES, SMALL, LARGE)
 from sqlalchemy import or_, desc, func
+from sqlalchemy.orm import joinedload
 from flask_caching import Cache
-import uuid
 
 # Redis configuration for caching
 cache = Cache(app, config={
     'CACHE_TYPE': 'redis',
-    # Adjust this URL if Redis server is not local
-    'CACHE_REDIS_URL': 'redis://localhost:6379/0',
+    # Set REDIS_URL if Redis server is not local
+    'CACHE_REDIS_URL': app.config["CACHE_REDIS_URL"],
     'CACHE_DEFAULT_TIMEOUT': 300  # 5 minutes default cache timeout
 })
 
+# Cached responses record the posts, tags and listings they depend on, so
+# writes only invalidate the entries they affect. Hot entries are also kept
+# in process memory, kept fresh by invalidations broadcast over Redis pub/sub.
+page_cache = DependencyCache(
+    cache,
+    local_cache=LocalCache(max_entries=app.config["CACHE_LOCAL_MAX_ENTRIES"],
+                           ttl=app.config["CACHE_LOCAL_TTL"]),
+    redis_client=redis_client,
+    on_lookup=request_metrics.record_cache_lookup
+)
+
+# Largest number of post or comment IDs accepted by /viewer_state
+MAX_VIEWER_STATE_IDS = 200
+
+# Avatar variants never change under a given name
+AVATAR_MAX_AGE = 365 * 24 * 3600
+
+
+@app.errorhandler(PasswordHashingBusy)
+def password_hashing_busy(error):
+    """Answers logins and registrations with 503 while password hashing is saturated."""
+    return jsonify({"message": "Server is busy, please try again"}), 503, {"Retry-After": "1"}
+
 
 @login_manager.user_loader
 def load_user(id):
@@ -94,6 +139,10 @@ def login():
     user = User.query.filter(func.lower(User.username) == username).first()
 
     if user and user.check_password(password):
+        # Hashes made with older parameters are replaced while the password is at hand
+        if user.password_needs_rehash():
+            user.set_password(password)
+            db.session.commit()
         access_token = create_access_token(identity=user.id)
         return jsonify({"access_token": access_token}), 200
     else:
@@ -114,17 +163,26 @@ def create_post():
         return jsonify({"message": "Title and body are required"}), 400
 
     new_post = Post(host_id=current_user_id, title=title, body=body)
-
-    for tag_name in tags:
-        tag = Tag.query.filter_by(name=tag_name).first()
-        if not tag:
-            tag = Tag(name=tag_name)
-            db.session.add(tag)
-        new_post.tags.append(tag)
+    new_post.tags = resolve_tags(tags)
 
     db.session.add(new_post)
+    db.session.flush()
+    adjust_counter(Tag.post_count, [tag.id for tag in new_post.tags], 1)
+    index_post(new_post)
+    fan_out_post(new_post.id, new_post.tags)
+    activity = activity_stream.record(POST, User.query.get(current_user_id), new_post)
+    tag_names = [tag.name for tag in new_post.tags]
     db.session.commit()
-    cache.clear()  # Clear all cache when a new post is created
+    activity_stream.publish(activity)
+    for tag_name in tag_names:
+        tag_index.add(tag_name)
+    # Invalidate the listings the new post appears in and the tag counts
+    page_cache.invalidate(
+        listing_dependency(),
+        *[listing_dependency(tag_name) for tag_name in tag_names],
+        "tags",
+        "trending"
+    )
     return jsonify({"message": "Post created successfully"}), 201
 
 # Retrieve a single post by its ID
@@ -140,53 +198,32 @@ def get_post(post_id):
     Returns:
         tuple: JSON response with post data and status code
             success: ({"id": int, "title": str, ...}, 200)
+            not modified: (empty, 304)
             error: ({"message": str}, 404)
     """
-    post = Post.query.get(post_id)
-    if not post:
-        return jsonify({"message": "Post not found"}), 404
-
-    host = User.query.get(post.host_id)
-
     # Check if user is authenticated
-    current_user = None
+    current_user_id = None
     try:
         verify_jwt_in_request(optional=True)
         current_user_id = get_jwt_identity()
-        if current_user_id:
-            current_user = User.query.get(current_user_id)
     except:
         pass
 
-    comments = []
-    for comment in post.comments:
-        user = User.query.get(comment.user_id)
-        comments.append({
-            "id": comment.id,
-            "content": comment.body,
-            "created": comment.created.isoformat(),
-            "author": {
-                "id": user.id,
-                "name": user.full_name,
-                "avatar": user.profile_pic
-            },
-            "likes": len(comment.likes),
-            "isLiked": current_user in comment.likes if current_user else False
-        })
+    # Probe the post's versions first so revalidations skip loading it
+    version = post_detail_version(post_id)
+    if not version:
+        return jsonify({"message": "Post not found"}), 404
+    etag = weak_etag("post", post_id, current_user_id, *version)
+    last_modified = max(timestamp_of(updated) or 0 for updated in (
+        version.updated, version.comments_updated, version.host_updated, version.commenters_updated))
+    if is_not_modified(etag, last_modified):
+        return not_modified_response(etag, last_modified, private=True)
+
+    post_data = load_post_detail(post_id, current_user_id)
+    if not post_data:
+        return jsonify({"message": "Post not found"}), 404
 
-    return jsonify({
-        "id": post.id,
-        "title": post.title,
-        "body": post.body,
-        "created": post.created.isoformat(),
-        "host_id": post.host_id,
-        "host_username": host.username if host else None,
-        "host_avatar": host.profile_pic if host else None,
-        "likes": len(post.liked_by),
-        "isLiked": current_user in post.liked_by if current_user else False,
-        "tags": [tag.name for tag in post.tags],
-        "comments": comments
-    })
+    return send_prepared(prepare_response(post_data, etag, last_modified, precompress=False), private=True)
 
 # Retrieve all posts or with optional pagination
 
@@ -195,45 +232,64 @@ def get_post(post_id):
 def get_posts():
     """Retrieves all posts with optional pagination and tag filtering.
 
+    Passing a cursor (empty for the first page) switches to keyset pagination,
+    which skips the total count unless with_total=1 is given.
+
     Args:
         page (int, optional): Page number. Defaults to 1.
         tag (str, optional): Tag to filter posts by.
+        cursor (str, optional): Cursor returned with the previous page.
+        with_total (int, optional): Set to 1 to include the total in cursor mode.
 
     Returns:
         tuple: JSON response with posts data and metadata
             success: ({"posts": list, "total": int, "pages": int, "current_page": int}, 200)
+            success (cursor mode): ({"posts": list, "next_cursor": str}, 200)
+            not modified: (empty, 304)
+            error: ({"message": str}, 400)
     """
     page = request.args.get('page', 1, type=int)
     per_page = 10
     tag = request.args.get('tag')
+    cursor = request.args.get('cursor')
+    with_total = request.args.get('with_total', 0, type=int) == 1
 
-    cache_key = f"posts_page_{page}_tag_{tag}"
-    cached_data = cache.get(cache_key)
+    if cursor is not None:
+        cache_key = f"posts_cursor_{cursor}_tag_{tag}_total_{with_total}"
+    else:
+        cache_key = f"posts_page_{page}_tag_{tag}"
+    cached_data = page_cache.get("posts", cache_key)
     if cached_data:
-        return jsonify(cached_data)
+        return send_prepared(cached_data)
 
-    query = Post.query
+    query = Post.query.options(*listing_options())
 
     if tag and tag != 'All':
-        query = query.filter(Post.tags.any(Tag.name == tag))
+        query = query.filter(Post.tags.any(Tag.name_key == normalize_tag_name(tag)))
+
+    if cursor is not None:
+        try:
+            posts = keyset_page(query, cursor, per_page, include_total=with_total)
+        except InvalidCursor:
+            return jsonify({"message": "Invalid cursor"}), 400
 
-    posts = query.order_by(desc(Post.created)).paginate(
+        result = {
+            "posts": serialize_post_summaries(posts.items),
+            "next_cursor": posts.next_cursor
+        }
+        if with_total:
+            result["total"] = posts.total
+
+        payload = prepare_response(result, weak_etag(
+            "posts", cache_key, posts.next_cursor, posts.total, post_versions(posts.items)))
+        page_cache.set("posts", cache_key, payload, timeout=60,  # Cache for 1 minute
+                       depends_on=[listing_dependency(tag), *post_dependencies(result["posts"])])
+        return send_prepared(payload)
+
+    posts = query.order_by(desc(Post.created), desc(Post.id)).paginate(
         page=page, per_page=per_page, error_out=False)
 
-    posts_data = []
-    for post in posts.items:
-        host = User.query.get(post.host_id)
-        posts_data.append({
-            "id": post.id,
-            "title": post.title,
-            "body": post.body,
-            "created": post.created.isoformat(),
-            "host_id": post.host_id,
-            "host_username": host.username if host else None,
-            "host_avatar": host.profile_pic if host else None,
-            "likes": len(post.liked_by),
-            "tags": [tag.name for tag in post.tags]
-        })
+    posts_data = serialize_post_summaries(posts.items)
 
     result = {
         "posts": posts_data,
@@ -242,8 +298,20 @@ def get_posts():
         "current_page": page
     }
 
-    cache.set(cache_key, result, timeout=60)  # Cache for 1 minute
-    return jsonify(result)
+    payload = prepare_response(result, weak_etag(
+        "posts", cache_key, posts.total, post_versions(posts.items)))
+    page_cache.set("posts", cache_key, payload, timeout=60,  # Cache for 1 minute
+                   depends_on=[listing_dependency(tag), *post_dependencies(posts_data)])
+    return send_prepared(payload)
+
+
+def post_versions(posts):
+    """Returns the row versions identifying the state of listed posts and their hosts.
+
+    Like counts are included since Post.updated only has second resolution.
+    """
+    return [(post.id, post.updated, post.like_count, post.host.updated if post.host else None)
+            for post in posts]
 
 # New edit_post endpoint
 
@@ -267,10 +335,14 @@ def edit_post(post_id):
         post.title = title
     if body:
         post.body = body
+    index_post(post)
 
     # Commit the changes to the database
     db.session.commit()
-    cache.clear()  # Clear all cache when a post is edited
+    page_cache.invalidate(f"post:{post.id}")
+    if title:
+        # The activity feed shows post titles
+        activity_stream.refresh()
     return jsonify({"message": "Post updated successfully", "post": {"id": post.id, "title": post.title, "body": post.body}})
 
 # New delete_post endpoint
@@ -285,9 +357,25 @@ def delete_post(post_id):
         return jsonify({"message": "Post not found"}), 404
 
     # Delete the post from the database
+    tag_names = [tag.name for tag in post.tags]
+    adjust_counter(Tag.post_count, [tag.id for tag in post.tags], -1)
+    remove_post(post.id)
+    retracted = activity_stream.retract(post_id=post.id)
+    remove_from_timelines(post.id)
     db.session.delete(post)
     db.session.commit()
-    cache.clear()  # Clear all cache when a post is deleted
+    if retracted:
+        activity_stream.refresh()
+    trending_index.remove(post_id)
+    for tag_name in tag_names:
+        tag_index.add(tag_name, -1)
+    # Invalidate every entry showing the post and the listings it appeared in
+    page_cache.invalidate(
+        f"post:{post_id}",
+        listing_dependency(),
+        *[listing_dependency(tag_name) for tag_name in tag_names],
+        "tags"
+    )
     return jsonify({"message": "Post deleted successfully"})
 
 
@@ -308,7 +396,8 @@ def get_current_user():
         "firstName": user.first_name,
         "lastName": user.last_name,
         "bio": user.bio,
-        "profile_pic": user.profile_pic
+        "profile_pic": avatar_path(user.profile_pic, LARGE),
+        "avatars": avatar_paths(user.profile_pic)
     }), 200
 
 
@@ -344,18 +433,20 @@ def edit_profile():
     if 'bio' in data:
         user.bio = data['bio']
 
-    # Handle profile picture upload
+    # Handle profile picture upload; resized variants are stored under content-hash names
     if 'profile_pic' in request.files:
         file = request.files['profile_pic']
         if file and allowed_file(file.filename):
-            filename = secure_filename(file.filename)
-            file_extension = os.path.splitext(filename)[1]
-            new_filename = f"{uuid.uuid4()}{file_extension}"
-            file_path = os.path.join(app.config['UPLOAD_FOLDER'], new_filename)
-            file.save(file_path)
-            user.profile_pic = new_filename
+            try:
+                user.profile_pic = save_avatar(file.read())
+            except InvalidImage:
+                return jsonify({"message": "Profile picture is not a valid image"}), 400
 
     db.session.commit()
+    if {'firstName', 'lastName', 'username'} & data.keys() or 'profile_pic' in request.files:
+        # Cached posts and the activity feed show names and pictures
+        page_cache.invalidate(f"user:{user.id}")
+        activity_stream.refresh()
 
     return jsonify({
         "message": "Profile updated successfully",
@@ -366,7 +457,8 @@ def edit_profile():
             "firstName": user.first_name,
             "lastName": user.last_name,
             "bio": user.bio,
-            "profile_pic": user.profile_pic
+            "profile_pic": avatar_path(user.profile_pic, LARGE),
+            "avatars": avatar_paths(user.profile_pic)
         }
     }), 200
 
@@ -386,6 +478,30 @@ def uploaded_file(filename):
     return send_from_directory(app.config['UPLOAD_FOLDER'], filename)
 
 
+@app.route('/uploads/avatars/<digest>-<int:size>')
+def avatar_variant(digest, size):
+    """Serves a resized profile picture as WebP or JPEG.
+
+    Args:
+        digest (str): Content hash of the uploaded picture
+        size (int): Width and height in pixels, one of AVATAR_SIZES
+
+    Returns:
+        Response: The image, cacheable forever since its name fixes its content
+    """
+    if size not in AVATAR_SIZES or not digest.isalnum():
+        return jsonify({"message": "Avatar not found"}), 404
+
+    accepted = {mimetype for mimetype, quality in request.accept_mimetypes if quality > 0}
+    mimetype = "image/webp" if "image/webp" in accepted else "image/jpeg"
+    response = send_from_directory(app.config['AVATAR_FOLDER'], variant_filename(digest, size, mimetype),
+                                   mimetype=mimetype, max_age=AVATAR_MAX_AGE)
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    response.vary.add("Accept")
+    return response
+
+
 @app.route("/logout", methods=["POST"])
 @jwt_required()
 def logout():
@@ -397,73 +513,146 @@ def logout():
 def search():
     """Searches posts and users based on query string.
 
+    Posts are matched against the full-text index and ranked by relevance,
+    each with a highlighted snippet of the matching body text. Passing a
+    cursor (empty for the first page) switches to keyset pagination over the
+    matching posts, newest first; users are then only returned with the
+    first page.
+
     Args:
         q (str): Search query
         page (int, optional): Page number. Defaults to 1
         per_page (int, optional): Results per page. Defaults to 10
+        cursor (str, optional): Cursor returned with the previous page
+        with_total (int, optional): Set to 1 to include totals in cursor mode
 
     Returns:
         tuple: JSON response with search results and metadata
             success: ({"results": dict, "total_posts": int, ...}, 200)
+            success (cursor mode): ({"results": dict, "next_cursor": str}, 200)
             error: ({"message": str}, 400)
     """
     query = request.args.get('q', '')
     page = request.args.get('page', 1, type=int)
     per_page = request.args.get('per_page', 10, type=int)
+    cursor = request.args.get('cursor')
+    with_total = request.args.get('with_total', 0, type=int) == 1
 
     if not query:
         return jsonify({"message": "No search query provided"}), 400
 
-    cache_key = f"search_{query}_page_{page}_per_page_{per_page}"
-    cached_result = cache.get(cache_key)
+    if cursor is not None:
+        cache_key = f"search_{query}_cursor_{cursor}_per_page_{per_page}_total_{with_total}"
+    else:
+        cache_key = f"search_{query}_page_{page}_per_page_{per_page}"
+    cached_result = page_cache.get("search", cache_key)
     if cached_result:
-        return jsonify(cached_result)
-
-    # Search in posts (title and body) and order by creation date descending
-    posts = Post.query.filter(or_(
-        Post.title.ilike(f'%{query}%'),
-        # Post.body.ilike(f'%{query}%')
-    )).order_by(desc(Post.created)).paginate(page=page, per_page=per_page, error_out=False)
-
-    users = User.query.filter(or_(
-        User.username.ilike(f'%{query}%'),
-        User.first_name.ilike(f'%{query}%'),
-        User.last_name.ilike(f'%{query}%')
-    )).paginate(page=page, per_page=per_page, error_out=False)
+        return send_prepared(cached_result)
+
+    if cursor is not None:
+        try:
+            posts = search_posts_after(query, cursor, per_page, include_total=with_total)
+        except InvalidCursor:
+            return jsonify({"message": "Invalid cursor"}), 400
+        result = search_cursor_page(query, posts, first_page=not cursor,
+                                    per_page=per_page, with_total=with_total)
+        payload = prepare_response(result)
+        page_cache.set("search", cache_key, payload, timeout=300,
+                       depends_on=post_dependencies(result["results"]["posts"]))
+        return send_prepared(payload)
+
+    # Posts (title and body, ranked by relevance) and users are searched
+    # concurrently, each in its own transaction
+    (posts_data, total_posts, posts_pages), (users_data, total_users, users_pages) = fan_out.run(
+        lambda: search_posts_page(query, page, per_page),
+        lambda: search_users_page(query, page, per_page)
+    )
 
     results = {
-        "posts": [{
-            "id": post.id,
-            "title": post.title,
-            "body": post.body[:200] + "..." if len(post.body) > 200 else post.body,
-            "host_username": User.query.get(post.host_id).username,
-            "created": post.created.isoformat()
-        } for post in posts.items],
-        "users": [{
-            "id": user.id,
-            "username": user.username,
-            "full_name": user.full_name,
-            "profile_pic": user.profile_pic
-        } for user in users.items]
+        "posts": posts_data,
+        "users": users_data
     }
 
     result = {
         "results": results,
-        "total_posts": posts.total,
-        "total_users": users.total,
+        "total_posts": total_posts,
+        "total_users": total_users,
         "current_page": page,
-        "posts_pages": posts.pages,
-        "users_pages": users.pages
+        "posts_pages": posts_pages,
+        "users_pages": users_pages
     }
 
-    # Cache search results for 5 minutes
-    cache.set(cache_key, result, timeout=300)
-    return jsonify(result)
+    # Cache search results for 5 minutes; new posts show up once they expire
+    payload = prepare_response(result)
+    page_cache.set("search", cache_key, payload, timeout=300,
+                   depends_on=post_dependencies(results["posts"]))
+    return send_prepared(payload)
+
+
+def user_search_query(query):
+    """Builds the query matching users by username or name."""
+    return User.query.filter(or_(
+        User.username.ilike(f'%{query}%'),
+        User.first_name.ilike(f'%{query}%'),
+        User.last_name.ilike(f'%{query}%')
+    ))
+
+
+def search_posts_page(query, page, per_page):
+    """Searches one page of posts and returns (posts data, total, pages)."""
+    posts = search_posts(query, page=page, per_page=per_page)
+    return serialize_search_posts(posts), posts.total, posts.pages
+
+
+def search_users_page(query, page, per_page):
+    """Searches one page of users and returns (users data, total, pages)."""
+    users = user_search_query(query).paginate(page=page, per_page=per_page, error_out=False)
+    return serialize_search_users(users.items), users.total, users.pages
+
+
+def serialize_search_posts(posts):
+    """Serializes post search results with their highlighted snippets."""
+    posts_data = serialize_post_summaries(posts.items, body_length=200)
+    for post_data in posts_data:
+        post_data["snippet"] = posts.snippets.get(post_data["id"])
+    return posts_data
+
+
+def serialize_search_users(users):
+    """Serializes user search results."""
+    return [{
+        "id": user.id,
+        "username": user.username,
+        "full_name": user.full_name,
+        "profile_pic": avatar_path(user.profile_pic, SMALL)
+    } for user in users]
+
+
+def search_cursor_page(query, posts, first_page, per_page, with_total):
+    """Builds the /search response for a keyset-paginated page of posts."""
+    users_query = user_search_query(query)
+    users = users_query.limit(per_page).all() if first_page else []
+
+    result = {
+        "results": {
+            "posts": serialize_search_posts(posts),
+            "users": serialize_search_users(users)
+        },
+        "next_cursor": posts.next_cursor
+    }
+    if with_total:
+        result["total_posts"] = posts.total
+        result["total_users"] = users_query.count()
+    return result
 
 
 @app.route("/trending_stories", methods=["GET"])
 def trending_stories():
-    """Retrieves trending stories based on likes.
+    """Retrieves trending stories based on recent engagement.
+
+    Posts are ranked by their time-decayed like, comment and bookmark score;
+    when fewer than ten posts have a score, the rest are filled in by
+    all-time like counts.
 
     Args:
         None
@@ -471,40 +660,46 @@ def trending_stories():
     Returns:
         tuple: JSON response with trending stories data
             success: (list of {"id": int, "title": str, "likes": int, "host_username": str}, 200)
+            not modified: (empty, 304)
     """
     # Check cache first
-    cached_data = cache.get('trending_stories')
+    cached_data = page_cache.get("trending", 'trending_stories')
     if cached_data:
-        return jsonify(cached_data)
-
-    # Query to get posts and their like counts
-    trending_posts = db.session.query(
-        Post,
-        db.func.count(post_likes.c.user_id).label('likes_count')
-    ).outerjoin(
-        post_likes,
-        Post.id == post_likes.c.post_id
-    ).group_by(
-        Post.id
-    ).order_by(
-        db.desc('likes_count')
-    ).limit(10).all()
+        return send_prepared(cached_data)
+
+    trending_posts = []
+    ranked = trending_index.top(10)
+    if ranked:
+        ranked_ids = [post_id for post_id, _ in ranked]
+        posts_by_id = {post.id: post for post in Post.query.options(
+            joinedload(Post.host)
+        ).filter(Post.id.in_(ranked_ids))}
+        trending_posts = [posts_by_id[post_id] for post_id in ranked_ids if post_id in posts_by_id]
+    if len(trending_posts) < 10:
+        # Fill the rest by the maintained like counter
+        fill = Post.query.options(joinedload(Post.host)).order_by(desc(Post.like_count), desc(Post.id))
+        if trending_posts:
+            fill = fill.filter(Post.id.notin_([post.id for post in trending_posts]))
+        trending_posts += fill.limit(10 - len(trending_posts)).all()
 
     # Format the response data
     trending_data = []
-    for post, likes_count in trending_posts:
+    for post in trending_posts:
         trending_data.append({
             "id": post.id,
             "title": post.title,
-            "likes": likes_count,
+            "likes": post.like_count,
             "host_username": post.host.username if post.host else None
         })
 
     # Cache the results
-    cache.set('trending_stories', trending_data,
-              timeout=300)  # Cache for 5 minutes
+    payload = prepare_response(trending_data, weak_etag("trending", post_versions(trending_posts)))
+    page_cache.set("trending", 'trending_stories', payload,
+                   timeout=300,  # Cache for 5 minutes
+                   depends_on=["trending", *post_dependencies(trending_data),
+                               *user_dependencies(post.host_id for post in trending_posts)])
 
-    return jsonify(trending_data)
+    return send_prepared(payload)
 
 
 @app.route("/get_tags", methods=["GET"])
@@ -517,22 +712,129 @@ def get_tags():
     Returns:
         tuple: JSON response with tags data
             success: (list of {"name": str, "count": int}, 200)
+            not modified: (empty, 304)
     """
-    cached_data = cache.get('all_tags')
+    cached_data = page_cache.get("tags", 'all_tags')
     if cached_data:
-        return jsonify(cached_data)
-
-    tags = Tag.query.all()
-    tag_data = []
-    for tag in tags:
-        tag_data.append({
-            "name": tag.name,
-            # This assumes you have a relationship set up between Tag and Post
-            "count": len(tag.tags)
-        })
+        return send_prepared(cached_data)
+
+    tag_data = [{"name": name, "count": post_count}
+                for name, post_count in db.session.execute(db.select(Tag.name, Tag.post_count))]
+
+    payload = prepare_response(tag_data, weak_etag("tags", tag_data))
+    page_cache.set("tags", 'all_tags', payload,
+                   timeout=3600, depends_on=["tags"])  # Cache for 1 hour
+    return send_prepared(payload)
+
+
+@app.route("/tags/suggest", methods=["GET"])
+def suggest_tags():
+    """Suggests existing tags for a partially typed tag name.
+
+    Args:
+        prefix (str): Beginning of the tag name, matched case-insensitively
+        limit (int, optional): Maximum number of suggestions. Defaults to 10.
+
+    Returns:
+        tuple: JSON response with the suggestions
+            success: (list of {"name": str, "count": int}, 200)
+            error: ({"message": str}, 400)
+    """
+    prefix = request.args.get('prefix', '').strip()
+    limit = max(1, min(request.args.get('limit', 10, type=int), 50))
+    if not prefix:
+        return jsonify({"message": "No prefix provided"}), 400
+
+    suggestions = tag_index.suggest(prefix, limit=limit)
+    return jsonify([{"name": name, "count": count} for name, count in suggestions])
+
+
+@app.route("/follow_tag/<path:tag_name>", methods=["POST"])
+@jwt_required()
+def follow_tag(tag_name):
+    """Follows a tag, or unfollows it if already followed.
+
+    Args:
+        tag_name (str): Name of the tag, matched case-insensitively
+
+    Returns:
+        tuple: JSON response with the new state
+            success: ({"message": str, "isFollowing": bool, "followers": int}, 200)
+            error: ({"message": str}, 404)
+    """
+    current_user_id = get_jwt_identity()
+    tag = Tag.query.filter_by(name_key=normalize_tag_name(tag_name)).first()
+
+    if not tag:
+        return jsonify({"message": "Tag not found"}), 404
+
+    is_following = toggle_follow(current_user_id, tag)
+    if is_following:
+        message = "Tag followed successfully"
+    else:
+        message = "Tag unfollowed successfully"
+
+    db.session.commit()
+
+    return jsonify({
+        "message": message,
+        "isFollowing": is_following,
+        "followers": tag.follower_count
+    }), 200
 
-    cache.set('all_tags', tag_data, timeout=3600)  # Cache for 1 hour
-    return jsonify(tag_data)
+
+@app.route("/followed_tags", methods=["GET"])
+@jwt_required()
+def get_followed_tags():
+    """Retrieves the tags the user follows.
+
+    Returns:
+        tuple: JSON response with the tags
+            success: (list of {"name": str, "count": int}, 200)
+    """
+    current_user_id = get_jwt_identity()
+    tags = db.session.execute(
+        db.select(Tag.name, Tag.post_count)
+        .join(tag_follows, tag_follows.c.tag_id == Tag.id)
+        .where(tag_follows.c.user_id == current_user_id)
+        .order_by(Tag.name_key)
+    )
+    return jsonify([{"name": name, "count": post_count} for name, post_count in tags])
+
+
+@app.route("/feed", methods=["GET"])
+@jwt_required()
+def get_feed():
+    """Retrieves the user's home feed: posts with any tag they follow, newest first.
+
+    Args:
+        cursor (str, optional): Cursor returned with the previous page
+
+    Returns:
+        tuple: JSON response with one page of posts
+            success: ({"posts": list, "next_cursor": str or None}, 200)
+            not modified: (empty, 304)
+            error: ({"message": str}, 400)
+    """
+    current_user_id = get_jwt_identity()
+    per_page = 10
+    cursor = request.args.get('cursor')
+    try:
+        before = int(cursor) if cursor else None
+    except ValueError:
+        return jsonify({"message": "Invalid cursor"}), 400
+
+    post_ids, next_before = feed_post_ids(current_user_id, before, per_page)
+    posts = Post.query.options(*listing_options()).filter(Post.id.in_(post_ids)).all() if post_ids else []
+    posts.sort(key=lambda post: post_ids.index(post.id))
+
+    result = {
+        "posts": serialize_post_summaries(posts),
+        "next_cursor": str(next_before) if next_before is not None else None
+    }
+    payload = prepare_response(result, weak_etag("feed", current_user_id, cursor, post_versions(posts)),
+                               precompress=False)
+    return send_prepared(payload, private=True)
 
 
 @app.route("/bookmark_post/<int:post_id>", methods=["POST"])
@@ -545,16 +847,20 @@ def bookmark_post(post_id):
     if not user or not post:
         return jsonify({"message": "User or post not found"}), 404
 
-    if post in user.bookmarked_posts:
-        user.bookmarked_posts.remove(post)
-        is_bookmarked = False
-        message = "Post unbookmarked successfully"
-    else:
-        user.bookmarked_posts.append(post)
-        is_bookmarked = True
+    is_bookmarked = toggle_association(post_bookmarks, Post.bookmark_count, post.id,
+                                       post_id=post.id, user_id=user.id)
+    if is_bookmarked:
         message = "Post bookmarked successfully"
+    else:
+        message = "Post unbookmarked successfully"
 
     db.session.commit()
+    if is_bookmarked:
+        trending_index.record(post_id, BOOKMARK_WEIGHT)
+    else:
+        # Bookmarks are stored without a time, so the withdrawal is weighed now
+        trending_index.withdraw(post_id, BOOKMARK_WEIGHT)
+    page_cache.invalidate("trending")
 
     return jsonify({
         "message": message,
@@ -573,7 +879,7 @@ def is_bookmarked(post_id):
     if not user or not post:
         return jsonify({"message": "User or post not found"}), 404
 
-    is_bookmarked = post in user.bookmarked_posts
+    is_bookmarked = has_association(post_bookmarks, post_id=post.id, user_id=user.id)
 
     return jsonify({
         "isBookmarked": is_bookmarked
@@ -589,15 +895,31 @@ def get_bookmarks():
     if not user:
         return jsonify({"message": "User not found"}), 404
 
-    bookmarked_posts = []
+    query = Post.query.options(*listing_options())\
+        .join(post_bookmarks, Post.id == post_bookmarks.c.post_id)\
+        .filter(post_bookmarks.c.user_id == current_user_id)
+
+    # Keyset pagination is opt-in; without a cursor every bookmark is returned
+    cursor = request.args.get('cursor')
+    if cursor is not None:
+        per_page = request.args.get('per_page', 10, type=int)
+        with_total = request.args.get('with_total', 0, type=int) == 1
+        try:
+            page = keyset_page(query, cursor, per_page, include_total=with_total)
+        except InvalidCursor:
+            return jsonify({"message": "Invalid cursor"}), 400
+
+        result = {
+            "posts": serialize_post_summaries(page.items, include_body=False),
+            "next_cursor": page.next_cursor
+        }
+        if with_total:
+            result["total"] = page.total
+        return jsonify(result), 200
 
-    for post in user.bookmarked_posts:
-        bookmarked_posts.append({
-            "id": post.id,
-            "title": post.title,
-            "created": post.created.isoformat(),
-            "host_username": post.host.username if post.host else None,
-        })
+    posts = query.order_by(desc(Post.created), desc(Post.id)).all()
+
+    bookmarked_posts = serialize_post_summaries(posts, include_body=False)
 
     return jsonify(bookmarked_posts), 200
 
@@ -612,18 +934,27 @@ def like_post(post_id):
     if not user or not post:
         return jsonify({"message": "User or post not found"}), 404
 
-    if post in user.liked_posts:
-        user.liked_posts.remove(post)
-        is_liked = False
-        message = "Post unliked successfully"
-    else:
-        user.liked_posts.append(post)
-        is_liked = True
+    is_liked = toggle_association(post_likes, Post.like_count, post.id,
+                                  post_id=post.id, user_id=user.id)
+    activity = retracted = None
+    if is_liked:
         message = "Post liked successfully"
+        activity = activity_stream.record(LIKE, user, post)
+    else:
+        message = "Post unliked successfully"
+        liked_at = activity_stream.recorded_at(kind=LIKE, post_id=post.id, user_id=user.id)
+        retracted = activity_stream.retract(kind=LIKE, post_id=post.id, user_id=user.id)
 
     db.session.commit()
+    if is_liked:
+        trending_index.record(post_id, LIKE_WEIGHT)
+        activity_stream.publish(activity)
+    else:
+        trending_index.withdraw(post_id, LIKE_WEIGHT, liked_at)
+        if retracted:
+            activity_stream.refresh()
 
-    cache.delete('trending_stories')
+    page_cache.invalidate("trending")
     return jsonify({
         "message": message,
         "isLiked": is_liked,
@@ -641,7 +972,7 @@ def is_liked(post_id):
     if not user or not post:
         return jsonify({"message": "User or post not found"}), 404
 
-    is_liked = post in user.liked_posts
+    is_liked = has_association(post_likes, post_id=post.id, user_id=user.id)
 
     return jsonify({
         "isLiked": is_liked
@@ -658,13 +989,21 @@ def add_comment(post_id):
     if not content:
         return jsonify({"message": "Comment content is required"}), 400
 
+    user = User.query.get(current_user_id)
+    post = Post.query.get(post_id)
     new_comment = Comment(user_id=current_user_id,
                           post_id=post_id, body=content)
     db.session.add(new_comment)
+    adjust_counter(Post.comment_count, post_id, 1)
+    activity = None
+    if user and post:
+        db.session.flush()
+        activity = activity_stream.record(COMMENT, user, post, new_comment)
     db.session.commit()
-    # Invalidate the recent activities cache
-    cache.delete('view//recent_activities')
-    user = User.query.get(current_user_id)
+    if activity:
+        activity_stream.publish(activity)
+    trending_index.record(post_id, COMMENT_WEIGHT)
+    page_cache.invalidate("trending")
 
     return jsonify({
         "id": new_comment.id,
@@ -673,7 +1012,7 @@ def add_comment(post_id):
         "author": {
             "id": user.id,
             "name": user.full_name,
-            "avatar": user.profile_pic
+            "avatar": avatar_path(user.profile_pic, SMALL)
         },
         "likes": 0
     }), 201
@@ -689,21 +1028,19 @@ def like_comment(comment_id):
     if not user or not comment:
         return jsonify({"message": "User or comment not found"}), 404
 
-    if user in comment.likes:
-        comment.likes.remove(user)
-        is_liked = False
-        message = "Comment unliked successfully"
-    else:
-        comment.likes.append(user)
-        is_liked = True
+    is_liked = toggle_association(comment_likes, Comment.like_count, comment.id,
+                                  comment_id=comment.id, user_id=user.id)
+    if is_liked:
         message = "Comment liked successfully"
+    else:
+        message = "Comment unliked successfully"
 
     db.session.commit()
 
     return jsonify({
         "message": message,
         "isLiked": is_liked,
-        "likes": len(comment.likes)
+        "likes": comment.like_count
     }), 200
 
 
@@ -717,13 +1054,66 @@ def is_comment_liked(comment_id):
     if not user or not comment:
         return jsonify({"message": "User or comment not found"}), 404
 
-    is_liked = user in comment.likes
+    is_liked = has_association(comment_likes, comment_id=comment.id, user_id=user.id)
 
     return jsonify({
         "isLiked": is_liked
     }), 200
 
 
+def parse_id_list(value):
+    """Parses a comma-separated list of IDs, e.g. "1,2,3".
+
+    Raises:
+        ValueError: If an item is not an integer
+    """
+    if not value:
+        return []
+    return list(dict.fromkeys(int(item) for item in value.split(",") if item.strip()))
+
+
+@app.route("/viewer_state", methods=["GET"])
+@jwt_required()
+def get_viewer_state():
+    """Retrieves the user's like and bookmark state for many posts and comments.
+
+    Each association table is queried once for all the requested IDs.
+
+    Args:
+        post_ids (str, optional): Comma-separated post IDs
+        comment_ids (str, optional): Comma-separated comment IDs
+
+    Returns:
+        tuple: JSON response with the state keyed by ID
+            success: ({"posts": {id: {"isLiked": bool, "isBookmarked": bool}},
+                       "comments": {id: {"isLiked": bool}}}, 200)
+            error: ({"message": str}, 400)
+    """
+    current_user_id = get_jwt_identity()
+    try:
+        post_ids = parse_id_list(request.args.get('post_ids'))
+        comment_ids = parse_id_list(request.args.get('comment_ids'))
+    except ValueError:
+        return jsonify({"message": "IDs must be integers"}), 400
+    if len(post_ids) > MAX_VIEWER_STATE_IDS or len(comment_ids) > MAX_VIEWER_STATE_IDS:
+        return jsonify({"message": f"At most {MAX_VIEWER_STATE_IDS} IDs of each kind are allowed"}), 400
+
+    liked_posts = associated_ids(post_likes, "post_id", post_ids, current_user_id)
+    bookmarked_posts = associated_ids(post_bookmarks, "post_id", post_ids, current_user_id)
+    liked_comments = associated_ids(comment_likes, "comment_id", comment_ids, current_user_id)
+
+    return jsonify({
+        "posts": {
+            post_id: {"isLiked": post_id in liked_posts, "isBookmarked": post_id in bookmarked_posts}
+            for post_id in post_ids
+        },
+        "comments": {
+            comment_id: {"isLiked": comment_id in liked_comments}
+            for comment_id in comment_ids
+        }
+    }), 200
+
+
 @app.route("/delete_comment/<int:comment_id>", methods=["DELETE"])
 @jwt_required()
 def delete_comment(comment_id):
@@ -736,56 +1126,102 @@ def delete_comment(comment_id):
     if comment.user_id != current_user_id:
         return jsonify({"message": "Unauthorized to delete this comment"}), 403
 
+    adjust_counter(Post.comment_count, comment.post_id, -1)
+    retracted = activity_stream.retract(comment_id=comment.id)
+    post_id, commented_at = comment.post_id, comment.created
     db.session.delete(comment)
     db.session.commit()
-    # Invalidate the recent activities cache
-    cache.delete('view//recent_activities')
+    trending_index.withdraw(post_id, COMMENT_WEIGHT, commented_at)
+    page_cache.invalidate("trending")
+    if retracted:
+        activity_stream.refresh()
     return jsonify({"message": "Comment deleted successfully"}), 200
 
 
 @app.route("/recent_activities", methods=["GET"])
 @jwt_required()
 def get_recent_activities():
-    """Retrieves recent activities (comments) on posts.
+    """Retrieves the newest posts, comments and likes.
+
+    Entries are recorded when the events happen (see activity.py), so this
+    reads a slice of the stored feed.
 
     Args:
-        None
+        limit (int, optional): Number of entries, default 10
 
     Returns:
         tuple: JSON response with recent activities data
-            success: (list of {"user": dict, "post": dict, "action": str, "timestamp": str}, 200)
+            success: (list of {"id": int, "type": str, "user": dict, "post": dict,
+                      "action": str, "timestamp": str}, 200)
     """
-    cached_data = cache.get('recent_activities')
-    if cached_data:
-        return jsonify(cached_data), 200
-
-    # Get the 10 most recent comments
-    recent_activities = db.session.query(Comment, Post, User)\
-        .join(Post, Comment.post_id == Post.id)\
-        .join(User, Comment.user_id == User.id)\
-        .order_by(desc(Comment.created))\
-        .limit(10)\
-        .all()
-
-    activity_data = []
-    for comment, post, commenter in recent_activities:
-        activity_data.append({
-            "user": {
-                "id": commenter.id,
-                "name": commenter.full_name,
-                "avatar": commenter.profile_pic
-            },
-            "post": {
-                "id": post.id,
-                "title": post.title
-            },
-            "action": "commented on",
-            "timestamp": comment.created.isoformat()
-        })
+    limit = max(request.args.get('limit', 10, type=int), 1)
+    # Retractions can remove the newest entries, so only the ETag identifies the feed's state
+    return send_prepared(prepare_response(activity_stream.latest(limit), precompress=False))
+
+
+@app.route("/export/posts", methods=["GET"])
+@jwt_required()
+def export_posts_stream():
+    """Streams posts as NDJSON, oldest change first, for incremental syncs.
+
+    The stream ends with an end record whose resume token starts the next
+    sync; checkpoint records between batches carry tokens for resuming an
+    interrupted export (see exports.py).
+
+    Args:
+        since (str, optional): ISO 8601 timestamp; only posts updated at or after it are exported
+        resume (str, optional): Resume token from an earlier export, used instead of since
+        include (str, optional): Comma-separated extras: tags, counters
+
+    Returns:
+        tuple: NDJSON stream and status code
+            success: (application/x-ndjson, 200)
+            error: ({"message": str}, 400)
+    """
+    position = None
+    since = request.args.get('since')
+    resume = request.args.get('resume')
+    include = {name for name in request.args.get('include', '').split(',') if name}
+
+    if include - EXPORT_INCLUDES:
+        return jsonify({"message": f"Unknown include: {', '.join(sorted(include - EXPORT_INCLUDES))}"}), 400
+    if resume:
+        try:
+            position = decode_position(resume)
+        except InvalidCursor:
+            return jsonify({"message": "Invalid resume token"}), 400
+    elif since:
+        try:
+            position = (parse_since(since), 0)
+        except ValueError:
+            return jsonify({"message": "Invalid since timestamp"}), 400
+
+    return Response(stream_with_context(export_posts(position, include)), mimetype="application/x-ndjson",
+                    headers={"Cache-Control": "no-store"})
+
+
+@app.route("/cache_stats", methods=["GET"])
+@jwt_required()
+def cache_stats():
+    """Reports cache hits and misses per namespace for this worker.
+
+    Returns:
+        tuple: JSON response with the counters
+            success: ({"posts": {"hits": int, "misses": int}, ...}, 200)
+    """
+    return jsonify(page_cache.stats()), 200
+
+
+@app.route("/metrics", methods=["GET"])
+@jwt_required()
+def metrics():
+    """Reports request latency, SQL, cache and response size figures per endpoint for this worker.
 
-    cache.set('recent_activities', activity_data,
-              timeout=60)  # Cache for 1 minute
-    return jsonify(activity_data), 200
+    Returns:
+        tuple: Metrics in the Prometheus text exposition format
+            success: (text/plain; version=0.0.4, 200)
+    """
+    return request_metrics.render(), 200, {"Content-Type": "text/plain; version=0.0.4; charset=utf-8"}
 
 
 if __name__ == "__main__":
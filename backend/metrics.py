@@ -0,0 +1,210 @@
+"""
+Per-request performance metrics for the DevHub API
+
+Every request is timed from Flask's before_request to after_request hooks,
+and SQLAlchemy cursor events count the statements it runs and the time spent
+in them. Together with the response cache lookups it made and the size of the
+response body, the figures are aggregated per endpoint into histograms and
+counters, served in the Prometheus text format at /metrics. An endpoint
+whose statement count grows with the page size is an N+1 query.
+
+Requests slower than SLOW_REQUEST_MS are logged with every statement they ran
+and how long each took.
+
+Metrics are kept in process memory, so each worker reports its own requests;
+Prometheus adds them up across workers.
+"""
+
+import bisect
+import logging
+import threading
+import time
+from collections import defaultdict
+from flask import g, has_request_context, request
+from sqlalchemy import event
+from config import app, db
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds of the histogram buckets
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+STATEMENT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576)
+
+# Longest statement text written to the slow request log
+MAX_LOGGED_STATEMENT = 500
+
+
+class Histogram:
+    """Cumulative bucket counts of observed values, with their sum.
+
+    Args:
+        buckets (tuple): Sorted upper bounds of the buckets, excluding +Inf
+    """
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0
+        self.count = 0
+
+    def observe(self, value):
+        """Adds a value to the first bucket whose bound is not below it."""
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self):
+        """Returns (upper bound, count of values up to it) pairs, ending with +Inf."""
+        pairs, total = [], 0
+        for bound, count in zip((*self.buckets, float("inf")), self.counts):
+            total += count
+            pairs.append((bound, total))
+        return pairs
+
+
+def _labels(labels):
+    escaped = (str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+               for value in labels.values())
+    return ",".join(f'{name}="{value}"' for name, value in zip(labels, escaped))
+
+
+def _number(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class RequestMetrics:
+    """Collects request, SQL and cache figures per endpoint.
+
+    Args:
+        slow_threshold (float): Seconds after which a request is logged with its statements
+    """
+
+    HISTOGRAMS = {
+        "devhub_request_duration_seconds": ("Time spent answering requests.", LATENCY_BUCKETS),
+        "devhub_request_sql_statements": ("SQL statements run per request.", STATEMENT_BUCKETS),
+        "devhub_request_sql_duration_seconds": ("Time spent running SQL per request.", LATENCY_BUCKETS),
+        "devhub_response_size_bytes": ("Size of response bodies as sent.", SIZE_BUCKETS),
+    }
+    COUNTERS = {
+        "devhub_requests_total": "Requests answered, by status code.",
+        "devhub_cache_lookups_total": "Response cache lookups, by namespace and result.",
+    }
+
+    def __init__(self, slow_threshold):
+        self.slow_threshold = slow_threshold
+        self._histograms = {name: {} for name in self.HISTOGRAMS}
+        self._counters = {name: defaultdict(int) for name in self.COUNTERS}
+        self._lock = threading.Lock()
+
+    def init_app(self, app, engine):
+        """Registers the request hooks on an app and the cursor hooks on its engine."""
+        app.before_request(self._start_request)
+        app.after_request(self._finish_request)
+        event.listen(engine, "before_cursor_execute", self._start_statement)
+        event.listen(engine, "after_cursor_execute", self._finish_statement)
+
+    @staticmethod
+    def _current():
+        """Returns the figures of the request being answered, or None outside requests."""
+        return g.get("_request_metrics") if has_request_context() else None
+
+    def _start_request(self):
+        g._request_metrics = {"start": time.perf_counter(), "statements": [], "cache": []}
+
+    def _start_statement(self, conn, cursor, statement, parameters, context, executemany):
+        if self._current() is not None:
+            conn.info.setdefault("_metrics_start", []).append(time.perf_counter())
+
+    def _finish_statement(self, conn, cursor, statement, parameters, context, executemany):
+        current = self._current()
+        starts = conn.info.get("_metrics_start")
+        if current is None or not starts:
+            return
+        elapsed = time.perf_counter() - starts.pop()
+        # Appending is atomic, so statements run by fanned-out calls are recorded safely
+        current["statements"].append((statement, elapsed))
+
+    def statement_count(self):
+        """Returns how many statements the current request has run so far, including fanned-out calls."""
+        current = self._current()
+        return len(current["statements"]) if current is not None else 0
+
+    def record_cache_lookup(self, namespace, hit):
+        """Notes a response cache lookup made by the current request."""
+        current = self._current()
+        if current is not None:
+            current["cache"].append((namespace, hit))
+
+    def _finish_request(self, response):
+        current = g.pop("_request_metrics", None)
+        if current is None:
+            return response
+        duration = time.perf_counter() - current["start"]
+        sql_time = sum(elapsed for _, elapsed in current["statements"])
+        endpoint = request.endpoint or "unmatched"
+        labels = (("endpoint", endpoint), ("method", request.method))
+        with self._lock:
+            self._counters["devhub_requests_total"][(*labels, ("status", str(response.status_code)))] += 1
+            for namespace, hit in current["cache"]:
+                key = (("endpoint", endpoint), ("namespace", namespace), ("result", "hit" if hit else "miss"))
+                self._counters["devhub_cache_lookups_total"][key] += 1
+            self._observe("devhub_request_duration_seconds", labels, duration)
+            self._observe("devhub_request_sql_statements", labels, len(current["statements"]))
+            self._observe("devhub_request_sql_duration_seconds", labels, sql_time)
+            # Streamed bodies have no length until they are sent
+            if response.content_length is not None:
+                self._observe("devhub_response_size_bytes", labels, response.content_length)
+
+        if duration >= self.slow_threshold:
+            self._log_slow_request(endpoint, response, duration, sql_time, current["statements"])
+        return response
+
+    def _observe(self, name, labels, value):
+        histogram = self._histograms[name].get(labels)
+        if histogram is None:
+            histogram = self._histograms[name][labels] = Histogram(self.HISTOGRAMS[name][1])
+        histogram.observe(value)
+
+    def _log_slow_request(self, endpoint, response, duration, sql_time, statements):
+        lines = [f"  {elapsed * 1000:8.2f} ms  {' '.join(statement.split())[:MAX_LOGGED_STATEMENT]}"
+                 for statement, elapsed in statements]
+        logger.warning("Slow request %s %s (%s) answered %s in %.0f ms; %d SQL statements took %.0f ms%s",
+                       request.method, request.full_path.rstrip("?"), endpoint, response.status_code,
+                       duration * 1000, len(statements), sql_time * 1000,
+                       "".join(f"\n{line}" for line in lines))
+
+    def render(self):
+        """Renders every metric in the Prometheus text exposition format.
+
+        Returns:
+            str: Metric families separated by newlines
+        """
+        lines = []
+        with self._lock:
+            for name, help_text in self.COUNTERS.items():
+                lines += [f"# HELP {name} {help_text}", f"# TYPE {name} counter"]
+                for labels, value in sorted(self._counters[name].items()):
+                    lines.append(f"{name}{{{_labels(dict(labels))}}} {value}")
+            for name, (help_text, _) in self.HISTOGRAMS.items():
+                lines += [f"# HELP {name} {help_text}", f"# TYPE {name} histogram"]
+                for labels, histogram in sorted(self._histograms[name].items()):
+                    labels = dict(labels)
+                    for bound, count in histogram.cumulative():
+                        lines.append(f"{name}_bucket{{{_labels({**labels, 'le': _number(bound)})}}} {count}")
+                    lines.append(f"{name}_sum{{{_labels(labels)}}} {_number(histogram.sum)}")
+                    lines.append(f"{name}_count{{{_labels(labels)}}} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+    def reset(self):
+        """Drops every recorded figure."""
+        with self._lock:
+            self._histograms = {name: {} for name in self.HISTOGRAMS}
+            self._counters = {name: defaultdict(int) for name in self.COUNTERS}
+
+
+request_metrics = RequestMetrics(app.config["SLOW_REQUEST_MS"] / 1000)
+with app.app_context():
+    request_metrics.init_app(app, db.engine)
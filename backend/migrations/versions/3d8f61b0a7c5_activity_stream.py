@@ -0,0 +1,60 @@
+"""Activity stream
+
+Adds the activity table behind the recent activity feed and fills it with
+the existing posts and comments, oldest first. Likes were never timestamped,
+so only likes made from now on appear.
+
+Revision ID: 3d8f61b0a7c5
+Revises: e7a19b4c2f60
+Create Date: 2026-10-18 06:12:45.903127
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3d8f61b0a7c5'
+down_revision = 'e7a19b4c2f60'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('activity',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('kind', sa.String(length=20), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('post_id', sa.Integer(), nullable=False),
+    sa.Column('comment_id', sa.Integer(), nullable=True),
+    sa.Column('created', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['comment_id'], ['comment.id'], ),
+    sa.ForeignKeyConstraint(['post_id'], ['post.id'], ),
+    sa.ForeignKeyConstraint(['user_id'], ['user.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('activity', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_activity_comment_id'), ['comment_id'], unique=False)
+        batch_op.create_index(batch_op.f('ix_activity_post_id'), ['post_id'], unique=False)
+
+    # IDs follow creation time, which is the order the feed is read in
+    op.execute("""
+        INSERT INTO activity (kind, user_id, post_id, comment_id, created)
+        SELECT kind, user_id, post_id, comment_id, created FROM (
+            SELECT 'post' AS kind, host_id AS user_id, id AS post_id,
+                   NULL AS comment_id, created
+            FROM post WHERE host_id IS NOT NULL
+            UNION ALL
+            SELECT 'comment', user_id, post_id, id, created
+            FROM comment WHERE user_id IS NOT NULL AND post_id IS NOT NULL
+        ) AS events
+        ORDER BY created
+    """)
+
+
+def downgrade():
+    with op.batch_alter_table('activity', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_activity_post_id'))
+        batch_op.drop_index(batch_op.f('ix_activity_comment_id'))
+
+    op.drop_table('activity')
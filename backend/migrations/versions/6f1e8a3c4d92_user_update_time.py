@@ -0,0 +1,30 @@
+"""Add user.updated
+
+Records when a profile last changed, so cached posts and comments showing
+the user's name and picture can be revalidated. Existing users start
+without a time.
+
+Revision ID: 6f1e8a3c4d92
+Revises: 9c4d2b7e15f3
+Create Date: 2026-10-18 15:04:38.271945
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '6f1e8a3c4d92'
+down_revision = '9c4d2b7e15f3'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('updated', sa.DateTime(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.drop_column('updated')
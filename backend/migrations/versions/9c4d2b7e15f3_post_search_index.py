@@ -0,0 +1,70 @@
+"""Post search index
+
+Creates the post_search FTS5 table on SQLite and indexes the existing posts,
+as `flask search-reindex` does. Other databases keep the LIKE search.
+
+Revision ID: 9c4d2b7e15f3
+Revises: 5b2e7d14c9a8
+Create Date: 2026-10-18 13:27:05.846193
+
+"""
+from html.parser import HTMLParser
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9c4d2b7e15f3'
+down_revision = '5b2e7d14c9a8'
+branch_labels = None
+depends_on = None
+
+BATCH_SIZE = 1000
+
+post = sa.table('post',
+    sa.column('id', sa.Integer),
+    sa.column('title', sa.String),
+    sa.column('body', sa.Text)
+)
+
+
+class TextExtractor(HTMLParser):
+    # Frozen copy of search._TextExtractor
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.parts = []
+
+    def handle_data(self, data):
+        self.parts.append(data)
+
+
+def html_to_text(body):
+    # Frozen copy of search.html_to_text
+    if not body:
+        return ""
+    extractor = TextExtractor()
+    extractor.feed(body)
+    extractor.close()
+    return " ".join(" ".join(extractor.parts).split())
+
+
+def upgrade():
+    bind = op.get_bind()
+    if bind.dialect.name != 'sqlite':
+        return
+    op.execute("CREATE VIRTUAL TABLE IF NOT EXISTS post_search "
+               "USING fts5(title, body, tokenize='unicode61 remove_diacritics 2')")
+    op.execute("DELETE FROM post_search")
+
+    insert = sa.text("INSERT INTO post_search (rowid, title, body) VALUES (:id, :title, :body)")
+    rows = bind.execute(sa.select(post.c.id, post.c.title, post.c.body).order_by(post.c.id)).all()
+    for start in range(0, len(rows), BATCH_SIZE):
+        bind.execute(insert, [
+            {"id": post_id, "title": title, "body": html_to_text(body)}
+            for post_id, title, body in rows[start:start + BATCH_SIZE]
+        ])
+
+
+def downgrade():
+    if op.get_bind().dialect.name == 'sqlite':
+        op.execute("DROP TABLE IF EXISTS post_search")
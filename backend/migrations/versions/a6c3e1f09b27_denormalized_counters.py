@@ -0,0 +1,83 @@
+"""Denormalized counters
+
+Adds the like, bookmark and comment counters on posts, the like counter on
+comments and the usage counter on tags, and fills them from the association
+tables as `flask recount` does.
+
+Revision ID: a6c3e1f09b27
+Revises: 8bda73dc8e69
+Create Date: 2026-10-18 04:49:20.318644
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a6c3e1f09b27'
+down_revision = '8bda73dc8e69'
+branch_labels = None
+depends_on = None
+
+post = sa.table('post',
+    sa.column('id', sa.Integer),
+    sa.column('like_count', sa.Integer),
+    sa.column('bookmark_count', sa.Integer),
+    sa.column('comment_count', sa.Integer)
+)
+comment = sa.table('comment',
+    sa.column('id', sa.Integer),
+    sa.column('post_id', sa.Integer),
+    sa.column('like_count', sa.Integer)
+)
+tag = sa.table('tag',
+    sa.column('id', sa.Integer),
+    sa.column('post_count', sa.Integer)
+)
+post_likes = sa.table('post_likes', sa.column('post_id', sa.Integer))
+post_bookmarks = sa.table('post_bookmarks', sa.column('post_id', sa.Integer))
+post_tags = sa.table('post_tags', sa.column('tag_id', sa.Integer))
+comment_likes = sa.table('comment_likes', sa.column('comment_id', sa.Integer))
+
+
+def count_of(table, foreign_key, owner_id):
+    # Frozen copy of counters._count_of
+    return sa.select(sa.func.count()).select_from(table).where(foreign_key == owner_id).scalar_subquery()
+
+
+def upgrade():
+    with op.batch_alter_table('post', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('like_count', sa.Integer(), server_default='0', nullable=False))
+        batch_op.add_column(sa.Column('bookmark_count', sa.Integer(), server_default='0', nullable=False))
+        batch_op.add_column(sa.Column('comment_count', sa.Integer(), server_default='0', nullable=False))
+
+    with op.batch_alter_table('comment', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('like_count', sa.Integer(), server_default='0', nullable=False))
+
+    with op.batch_alter_table('tag', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('post_count', sa.Integer(), server_default='0', nullable=False))
+
+    op.execute(post.update().values(
+        like_count=count_of(post_likes, post_likes.c.post_id, post.c.id),
+        bookmark_count=count_of(post_bookmarks, post_bookmarks.c.post_id, post.c.id),
+        comment_count=count_of(comment, comment.c.post_id, post.c.id)
+    ))
+    op.execute(comment.update().values(
+        like_count=count_of(comment_likes, comment_likes.c.comment_id, comment.c.id)
+    ))
+    op.execute(tag.update().values(
+        post_count=count_of(post_tags, post_tags.c.tag_id, tag.c.id)
+    ))
+
+
+def downgrade():
+    with op.batch_alter_table('tag', schema=None) as batch_op:
+        batch_op.drop_column('post_count')
+
+    with op.batch_alter_table('comment', schema=None) as batch_op:
+        batch_op.drop_column('like_count')
+
+    with op.batch_alter_table('post', schema=None) as batch_op:
+        batch_op.drop_column('comment_count')
+        batch_op.drop_column('bookmark_count')
+        batch_op.drop_column('like_count')
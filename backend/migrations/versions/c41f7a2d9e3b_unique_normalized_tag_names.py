@@ -0,0 +1,81 @@
+"""Unique normalized tag names
+
+Adds tag.name_key, the case-folded, whitespace-collapsed tag name, with a
+unique index. Tags sharing a name key are merged into the one with the
+lowest ID: their posts are moved over and the post counts recomputed.
+
+Revision ID: c41f7a2d9e3b
+Revises: a6c3e1f09b27
+Create Date: 2026-10-18 05:02:37.418215
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c41f7a2d9e3b'
+down_revision = 'a6c3e1f09b27'
+branch_labels = None
+depends_on = None
+
+tag = sa.table('tag',
+    sa.column('id', sa.Integer),
+    sa.column('name', sa.String),
+    sa.column('name_key', sa.String),
+    sa.column('post_count', sa.Integer)
+)
+post_tags = sa.table('post_tags',
+    sa.column('post_id', sa.Integer),
+    sa.column('tag_id', sa.Integer)
+)
+
+
+def normalize_tag_name(name):
+    # Frozen copy of models.normalize_tag_name
+    return " ".join(name.split()).casefold()
+
+
+def merge_duplicate_tags(connection):
+    survivors = {}
+    duplicates = {}
+    for tag_id, name in connection.execute(sa.select(tag.c.id, tag.c.name).order_by(tag.c.id)):
+        key = normalize_tag_name(name)
+        if key in survivors:
+            duplicates[tag_id] = survivors[key]
+        else:
+            survivors[key] = tag_id
+        connection.execute(tag.update().where(tag.c.id == tag_id).values(name_key=key))
+
+    for duplicate_id, survivor_id in duplicates.items():
+        tagged_posts = sa.select(post_tags.c.post_id).where(post_tags.c.tag_id == survivor_id)
+        # Posts carrying both tags keep only the survivor
+        connection.execute(post_tags.delete().where(post_tags.c.tag_id == duplicate_id,
+                                                    post_tags.c.post_id.in_(tagged_posts)))
+        connection.execute(post_tags.update().where(post_tags.c.tag_id == duplicate_id)
+                           .values(tag_id=survivor_id))
+        connection.execute(tag.delete().where(tag.c.id == duplicate_id))
+
+    if duplicates:
+        usage = sa.select(sa.func.count()).select_from(post_tags)\
+            .where(post_tags.c.tag_id == tag.c.id).scalar_subquery()
+        connection.execute(tag.update().where(tag.c.id.in_(set(duplicates.values())))
+                           .values(post_count=usage))
+
+
+def upgrade():
+    with op.batch_alter_table('tag', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('name_key', sa.String(length=200), nullable=True))
+
+    merge_duplicate_tags(op.get_bind())
+
+    with op.batch_alter_table('tag', schema=None) as batch_op:
+        batch_op.alter_column('name_key', existing_type=sa.String(length=200), nullable=False)
+        batch_op.create_index(batch_op.f('ix_tag_name_key'), ['name_key'], unique=True)
+
+
+def downgrade():
+    # Merged tags are not split up again
+    with op.batch_alter_table('tag', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_tag_name_key'))
+        batch_op.drop_column('name_key')
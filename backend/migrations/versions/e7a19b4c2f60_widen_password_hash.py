@@ -0,0 +1,35 @@
+"""Widen user.password_hash
+
+scrypt hashes in werkzeug's format are 162 characters, more than the
+previous 128.
+
+Revision ID: e7a19b4c2f60
+Revises: c41f7a2d9e3b
+Create Date: 2026-10-18 05:31:52.206417
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e7a19b4c2f60'
+down_revision = 'c41f7a2d9e3b'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.alter_column('password_hash',
+               existing_type=sa.String(length=128),
+               type_=sa.String(length=256),
+               existing_nullable=True)
+
+
+def downgrade():
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.alter_column('password_hash',
+               existing_type=sa.String(length=256),
+               type_=sa.String(length=128),
+               existing_nullable=True)
@@ -1,17 +1,27 @@
 from config import db
 from flask_login import UserMixin
-from werkzeug.security import generate_password_hash, check_password_hash
+from passwords import hash_password, verify_password, needs_rehash
+from datetime import datetime, timezone
 from sqlalchemy.sql import func
 
+
+def utcnow():
+    """Returns the current time as the naive UTC datetime the database stores."""
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
 class User(db.Model, UserMixin):
     id = db.Column(db.Integer, primary_key=True)
     first_name = db.Column(db.String(50), nullable=False)
     last_name = db.Column(db.String(50), nullable=True)
     email = db.Column(db.String(120), unique=True, nullable=False)
     username = db.Column(db.String(50), unique=True, nullable=False)
-    password_hash = db.Column(db.String(128))
+    password_hash = db.Column(db.String(256))
     bio = db.Column(db.Text, nullable=True, default='')
     profile_pic = db.Column(db.String(255), nullable=True, default='default.png')
+    # Validates cached posts and comments that show the user's name and
+    # picture; set in Python so that edits within one second still change it
+    updated = db.Column(db.DateTime, default=utcnow, onupdate=utcnow)
 
     hosted_posts = db.relationship('Post', backref='host')
     commented_posts = db.relationship('Post', secondary='post_commentors', backref='commentors')
@@ -20,10 +30,13 @@ class User(db.Model, UserMixin):
     comments = db.relationship('Comment', backref='user')
 
     def set_password(self, password):
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = hash_password(password)
 
     def check_password(self, password):
-        return check_password_hash(self.password_hash, password)
+        return verify_password(self.password_hash, password)
+
+    def password_needs_rehash(self):
+        return bool(self.password_hash) and needs_rehash(self.password_hash)
 
     @property
     def full_name(self):
@@ -32,9 +45,26 @@ class User(db.Model, UserMixin):
     def __repr__(self):
         return f'<User {self.username}>'
 
+# Usernames are looked up case-insensitively
+db.Index('ix_user_username_lower', func.lower(User.username))
+
+def normalize_tag_name(name):
+    """Returns the case-folded, whitespace-collapsed form that identifies a tag."""
+    return " ".join(name.split()).casefold()
+
+def _default_name_key(context):
+    return normalize_tag_name(context.get_current_parameters()["name"])
+
 class Tag(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(200), nullable=False)
+    # Tags differing only in case or spacing are the same tag
+    name_key = db.Column(db.String(200), nullable=False, unique=True, index=True, default=_default_name_key)
+    post_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    follower_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    # Set once a tag has too many followers to copy its posts into each of
+    # their timelines; its posts are then merged into feeds when read (see feeds.py)
+    fan_in = db.Column(db.Boolean, nullable=False, default=False, server_default=db.false())
 
     def __repr__(self):
         return f'<Tag {self.name}>'
@@ -54,29 +84,57 @@ post_bookmarks = db.Table('post_bookmarks',
     db.Column('user_id', db.Integer, db.ForeignKey('user.id'), primary_key=True)
 )
 
+# The primary keys lead with the post; these serve lookups by user
+db.Index('ix_post_likes_user_id_post_id', post_likes.c.user_id, post_likes.c.post_id)
+db.Index('ix_post_bookmarks_user_id_post_id', post_bookmarks.c.user_id, post_bookmarks.c.post_id)
+
 post_tag = db.Table('post_tags',
     db.Column('post_id', db.Integer, db.ForeignKey('post.id'), primary_key=True),
     db.Column('tag_id', db.Integer, db.ForeignKey('tag.id'), primary_key=True)
 )
 
+# Reads a tag's posts newest first
+db.Index('ix_post_tags_tag_id_post_id', post_tag.c.tag_id, post_tag.c.post_id)
+
+tag_follows = db.Table('tag_follows',
+    db.Column('tag_id', db.Integer, db.ForeignKey('tag.id'), primary_key=True),
+    db.Column('user_id', db.Integer, db.ForeignKey('user.id'), primary_key=True, index=True)
+)
+
+# Per-user home timelines: the posts fanned out to each follower of their tags
+feed_entries = db.Table('feed_entry',
+    db.Column('user_id', db.Integer, db.ForeignKey('user.id'), primary_key=True),
+    db.Column('post_id', db.Integer, db.ForeignKey('post.id'), primary_key=True, index=True)
+)
+
 class Post(db.Model):
+    # Listings are ordered by (created, id), newest first, and exports by (updated, id)
+    __table_args__ = (db.Index('ix_post_created_id', 'created', 'id'),
+                      db.Index('ix_post_updated_id', 'updated', 'id'))
+
     id = db.Column(db.Integer, primary_key=True)
-    host_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=True)
+    host_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=True, index=True)
     title = db.Column(db.String(200), nullable=False)
     body = db.Column(db.Text, nullable=True)
     updated = db.Column(db.DateTime, default=func.now(), onupdate=func.now())
     created = db.Column(db.DateTime, default=func.now())
 
+    # Denormalized counters, kept in step with the association tables by the
+    # endpoints that write them (see counters.py)
+    like_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    bookmark_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    comment_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+
     tags = db.relationship("Tag", secondary=post_tag, backref='tags')
     comments = db.relationship('Comment', backref='post')
 
     @property
     def likes(self):
-       return len(self.liked_by) 
+        return self.like_count
 
     @property
     def bookmarks(self):
-        return len(self.bookmarked_by)
+        return self.bookmark_count
 
     def __repr__(self):
         return f'<Post {self.name}>'
@@ -84,10 +142,11 @@ class Post(db.Model):
 class Comment(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=True)
-    post_id = db.Column(db.Integer, db.ForeignKey('post.id'), nullable=True)
+    post_id = db.Column(db.Integer, db.ForeignKey('post.id'), nullable=True, index=True)
     body = db.Column(db.Text, nullable=False)
     updated = db.Column(db.DateTime, default=func.now(), onupdate=func.now())
     created = db.Column(db.DateTime, default=func.now())
+    like_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
 
     likes = db.relationship('User', secondary='comment_likes', backref='liked_comments')
 
@@ -97,4 +156,17 @@ class Comment(db.Model):
 comment_likes = db.Table('comment_likes',
     db.Column('comment_id', db.Integer, db.ForeignKey('comment.id'), primary_key=True),
     db.Column('user_id', db.Integer, db.ForeignKey('user.id'), primary_key=True)
-)
\ No newline at end of file
+)
+
+db.Index('ix_comment_likes_user_id_comment_id', comment_likes.c.user_id, comment_likes.c.comment_id)
+class Activity(db.Model):
+    """An event shown in the recent activity feed, recorded when it happens."""
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(20), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    post_id = db.Column(db.Integer, db.ForeignKey('post.id'), nullable=False, index=True)
+    comment_id = db.Column(db.Integer, db.ForeignKey('comment.id'), nullable=True, index=True)
+    created = db.Column(db.DateTime, default=func.now())
+
+    def __repr__(self):
+        return f'<Activity {self.kind} {self.post_id}>'
@@ -0,0 +1,116 @@
+"""
+Keyset pagination for the DevHub API
+
+Listing endpoints can page through posts with an opaque cursor instead of a
+page number. A cursor encodes the (created, id) position of the last post on
+the previous page, so each page is a bounded index range scan rather than an
+OFFSET query, and the total row count is only computed when asked for.
+
+SQLite stores timestamps as text and compares them as text: func.now()
+writes "2024-01-01 10:00:00" while timestamps bound from Python are written
+as "2024-01-01 10:00:00.000000". Positions on a whole second are therefore
+matched in both forms, so posts created within the same second are neither
+skipped nor repeated; other databases compare real timestamps.
+"""
+
+import base64
+import binascii
+from datetime import datetime
+from sqlalchemy import and_, desc, literal, or_
+from sqlalchemy.dialects import sqlite
+from config import db
+from models import Post
+
+# SQLite renders DateTime binds with microseconds; this variant renders them
+# without, as func.now() writes them
+SECOND_TIMESTAMP = db.DateTime().with_variant(sqlite.DATETIME(truncate_microseconds=True), "sqlite")
+
+
+class InvalidCursor(ValueError):
+    """Raised when a client sends a cursor that was not issued by the API."""
+
+
+class KeysetPage:
+    """A page of posts fetched by keyset pagination."""
+
+    def __init__(self, items, next_cursor, total=None):
+        self.items = items
+        self.next_cursor = next_cursor
+        self.total = total
+
+
+def encode_position(timestamp, row_id):
+    """Encodes a (timestamp, id) keyset position as an opaque string."""
+    raw = f"{timestamp.isoformat()}|{row_id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_position(token):
+    """Decodes a string from encode_position into its (timestamp, id) position.
+
+    Raises:
+        InvalidCursor: If the string is malformed
+    """
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        timestamp, row_id = base64.urlsafe_b64decode(padded).decode().split("|")
+        return datetime.fromisoformat(timestamp), int(row_id)
+    except (binascii.Error, UnicodeDecodeError, ValueError) as exc:
+        raise InvalidCursor("Invalid cursor") from exc
+
+
+def after_position(column, id_column, position, descending=False):
+    """Builds the condition for rows that follow a (timestamp, id) position.
+
+    Args:
+        column: Timestamp column the rows are ordered by
+        id_column: ID column breaking ties between equal timestamps
+        position (tuple): (timestamp, id) of the last row already seen
+        descending (bool, optional): Whether rows are ordered newest first. Defaults to False.
+
+    Returns:
+        Filter expression for the rows after the position
+    """
+    timestamp, row_id = position
+    exact = literal(timestamp, db.DateTime())
+    equal = [exact]
+    bound = exact
+    if timestamp.microsecond == 0:
+        # Also match the form func.now() writes; it sorts before every other
+        # form of the same second
+        second = literal(timestamp, SECOND_TIMESTAMP)
+        equal.append(second)
+        if descending:
+            bound = second
+    if descending:
+        return or_(column < bound, and_(column.in_(equal), id_column < row_id))
+    return or_(column > bound, and_(column.in_(equal), id_column > row_id))
+
+
+def keyset_page(query, cursor=None, per_page=10, include_total=False):
+    """Fetches one page of posts, newest first, starting after a cursor.
+
+    Args:
+        query: Post query with the listing's filters applied and no ordering
+        cursor (str, optional): Cursor returned with the previous page
+        per_page (int, optional): Posts per page. Defaults to 10.
+        include_total (bool, optional): Whether to count all matching posts. Defaults to False.
+
+    Returns:
+        KeysetPage: The page's posts and the cursor of the next page, if any
+
+    Raises:
+        InvalidCursor: If the cursor is malformed
+    """
+    total = query.order_by(None).count() if include_total else None
+
+    if cursor:
+        query = query.filter(after_position(Post.created, Post.id, decode_position(cursor), descending=True))
+
+    # Fetch one extra post to learn whether another page follows
+    posts = query.order_by(desc(Post.created), desc(Post.id)).limit(per_page + 1).all()
+    next_cursor = None
+    if len(posts) > per_page:
+        posts = posts[:per_page]
+        next_cursor = encode_position(posts[-1].created, posts[-1].id)
+    return KeysetPage(posts, next_cursor, total)
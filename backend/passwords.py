@@ -0,0 +1,94 @@
+"""
+Password hashing for the DevHub API
+
+Hashing a password is deliberately expensive, so it runs on a small dedicated
+thread pool rather than on the request thread that asked for it. The hash
+functions release the GIL, so the pool's threads hash in parallel while the
+number of hashes in flight stays bounded. Requests beyond the pool size wait
+in a bounded queue; when the queue is full, or a hash waits longer than
+PASSWORD_HASH_TIMEOUT, PasswordHashingBusy is raised and the API answers
+503 instead of letting login bursts tie up every worker.
+
+The hash method is set by PASSWORD_HASH_METHOD using werkzeug's method
+strings, e.g. "scrypt:32768:8:1" or "pbkdf2:sha256:600000". Hashes made with
+other parameters still verify, and are replaced on the user's next login.
+"""
+
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+from werkzeug.security import check_password_hash, generate_password_hash
+from config import app
+
+
+class PasswordHashingBusy(Exception):
+    """Raised when the hashing pool cannot take more work."""
+
+
+class HashingPool:
+    """Bounded thread pool that rejects work once its queue is full.
+
+    Args:
+        workers (int): Number of hashes computed at once
+        queue_size (int): Number of hashes allowed to wait for a worker
+        timeout (float): Seconds a caller waits for its hash before giving up
+    """
+
+    def __init__(self, workers, queue_size, timeout):
+        self.timeout = timeout
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="password-hash")
+        self._slots = threading.BoundedSemaphore(workers + queue_size)
+
+    def run(self, function, *args):
+        """Runs function on the pool and returns its result.
+
+        Raises:
+            PasswordHashingBusy: If the queue is full or the result takes
+                longer than the timeout
+        """
+        if not self._slots.acquire(blocking=False):
+            raise PasswordHashingBusy("Password hashing queue is full")
+        try:
+            future = self._executor.submit(function, *args)
+        except BaseException:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        try:
+            return future.result(timeout=self.timeout)
+        except TimeoutError:
+            future.cancel()
+            raise PasswordHashingBusy("Timed out waiting for password hashing")
+
+
+pool = HashingPool(app.config["PASSWORD_HASH_WORKERS"],
+                   app.config["PASSWORD_HASH_QUEUE_SIZE"],
+                   app.config["PASSWORD_HASH_TIMEOUT"])
+
+
+_method_prefixes = {}
+
+
+def _method_prefix(method):
+    """Returns the method as werkzeug records it in a hash, with defaults filled in."""
+    prefix = _method_prefixes.get(method)
+    if prefix is None:
+        prefix = pool.run(generate_password_hash, "", method).split("$", 1)[0]
+        _method_prefixes[method] = prefix
+    return prefix
+
+
+def hash_password(password):
+    """Hashes a password with the configured method on the hashing pool."""
+    return pool.run(generate_password_hash, password, app.config["PASSWORD_HASH_METHOD"])
+
+
+def verify_password(password_hash, password):
+    """Checks a password against a stored hash on the hashing pool."""
+    if not password_hash:
+        return False
+    return pool.run(check_password_hash, password_hash, password)
+
+
+def needs_rehash(password_hash):
+    """Checks whether a stored hash was made with other than the configured method."""
+    return password_hash.split("$", 1)[0] != _method_prefix(app.config["PASSWORD_HASH_METHOD"])
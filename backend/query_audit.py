@@ -0,0 +1,212 @@
+"""
+Query plan audit for the DevHub API
+
+`flask audit-queries` sends a request to each read endpoint through the test
+client, records every SELECT the request runs and asks the database for its
+plan: EXPLAIN QUERY PLAN on SQLite, EXPLAIN on PostgreSQL. Plans that read a
+whole table are flagged, and the command exits with status 1 if any are.
+Plans sorting rows in a temporary B-tree instead of reading them in index
+order are listed as notes; that is fine for a page of rows fetched by ID.
+
+Only read endpoints are requested, plus a login with a wrong password, so
+the audit can run against a copy of production data. Plans depend on the
+statistics the database keeps, so run ANALYZE on a realistic dataset first
+for plans matching production. Sample IDs are taken from the newest rows.
+"""
+
+import re
+import click
+from contextlib import contextmanager
+from flask_jwt_extended import create_access_token
+from sqlalchemy import desc, event, func, select
+from config import app, db
+from models import Comment, Post, Tag, User
+
+# (method, URL template, whether the request is authenticated); the
+# placeholders are filled by sample_values()
+AUDITED_REQUESTS = [
+    ("GET", "/get_posts", False),
+    ("GET", "/get_posts?cursor=", False),
+    ("GET", "/get_posts?tag={tag}", False),
+    ("GET", "/get_posts?cursor=&tag={tag}", False),
+    ("GET", "/get_post/{post_id}", False),
+    ("GET", "/get_post/{post_id}", True),
+    ("GET", "/trending_stories", False),
+    ("GET", "/get_tags", False),
+    ("GET", "/tags/suggest?prefix={tag_prefix}", False),
+    ("GET", "/search?q={word}", False),
+    ("GET", "/search?q={word}&cursor=", False),
+    ("GET", "/bookmarks", True),
+    ("GET", "/bookmarks?cursor=", True),
+    ("GET", "/is_liked/{post_id}", True),
+    ("GET", "/is_bookmarked/{post_id}", True),
+    ("GET", "/is_comment_liked/{comment_id}", True),
+    ("GET", "/viewer_state?post_ids={post_id}&comment_ids={comment_id}", True),
+    ("GET", "/recent_activities", True),
+    ("GET", "/feed", True),
+    ("GET", "/followed_tags", True),
+    ("GET", "/current_user", True),
+    ("POST", "/login", False),
+]
+
+# Statements known to read a whole table by design, as (endpoint, table)
+EXPECTED_SCANS = {
+    ("GET /get_tags", "tag"),  # lists every tag
+    ("GET /tags/suggest?prefix={tag_prefix}", "tag"),  # loads the autocomplete index
+    ("GET /search?q={word}", "user"),  # substring match on user names
+    ("GET /search?q={word}&cursor=", "user"),
+    ("GET /recent_activities", "activity"),  # newest rows in rowid order, stopped by LIMIT
+}
+
+# Full-text tables are searched through their own index
+_SQLITE_SCAN = re.compile(r"^SCAN (\w+)(?!.* USING )(?!.* VIRTUAL TABLE)")
+_POSTGRES_SCAN = re.compile(r"Seq Scan on (\w+)")
+
+
+@contextmanager
+def recorded_selects(engine):
+    """Records the SELECT statements run on an engine, with their parameters."""
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith(("SELECT", "WITH")):
+            statements.append((statement, parameters))
+
+    event.listen(engine, "before_cursor_execute", record)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
+
+
+def plan_problems(connection, statement, parameters, tables):
+    """Explains a statement and returns the problems in its plan.
+
+    Args:
+        connection: Connection to run EXPLAIN on
+        statement (str): SQL as sent to the driver
+        parameters: Driver parameters of the statement
+        tables (set): Names of the database's tables, to tell them from subqueries
+
+    Returns:
+        list: (kind, table or None, plan line) tuples, kind being "scan" for
+            full scans or "sort" for temporary B-tree sorts
+    """
+    dialect = connection.dialect.name
+    problems = []
+    if dialect == "sqlite":
+        rows = connection.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters)
+        for row in rows:
+            detail = row[-1]
+            scan = _SQLITE_SCAN.match(detail)
+            if scan and scan.group(1) in tables:
+                problems.append(("scan", scan.group(1), detail))
+            elif detail.startswith("USE TEMP B-TREE FOR ORDER BY"):
+                problems.append(("sort", None, detail))
+    elif dialect == "postgresql":
+        for (line,) in connection.exec_driver_sql(f"EXPLAIN {statement}", parameters):
+            scan = _POSTGRES_SCAN.search(line)
+            if scan and scan.group(1) in tables:
+                problems.append(("scan", scan.group(1), line.strip()))
+    else:
+        raise click.ClickException(f"Query plans of {dialect} databases are not supported")
+    return problems
+
+
+def sample_values():
+    """Picks existing rows to fill the URL templates with.
+
+    Returns:
+        dict: Template values, without the keys no row exists for
+    """
+    values = {}
+    post_id = db.session.execute(
+        select(Post.id).where(Post.comment_count > 0).order_by(desc(Post.id)).limit(1)
+    ).scalar() or db.session.execute(select(func.max(Post.id))).scalar()
+    if post_id:
+        values["post_id"] = post_id
+        values["word"] = (db.session.get(Post, post_id).title.split() or ["post"])[0]
+    comment_id = db.session.execute(select(func.max(Comment.id))).scalar()
+    if comment_id:
+        values["comment_id"] = comment_id
+    tag = db.session.execute(select(Tag.name).order_by(desc(Tag.post_count)).limit(1)).scalar()
+    if tag:
+        values["tag"] = tag
+        values["tag_prefix"] = tag[:2]
+    return values
+
+
+def audit(user=None):
+    """Requests every audited endpoint and explains the queries each runs.
+
+    Args:
+        user (User, optional): User to authenticate as; authenticated
+            requests are skipped without one
+
+    Returns:
+        list: (endpoint, statement count, [(kind, table, plan line, statement)])
+            per request; the statement count is None for skipped requests
+    """
+    import main  # the endpoints and their response cache
+
+    # Cached responses would hide the queries behind them
+    main.cache.init_app(app, config={"CACHE_TYPE": "flask_caching.backends.NullCache"})
+    values = sample_values()
+    client = app.test_client()
+    headers = {"Authorization": f"Bearer {create_access_token(identity=user.id)}"} if user else None
+    tables = set(db.inspect(db.engine).get_table_names())
+    report = []
+    for method, template, authenticated in AUDITED_REQUESTS:
+        endpoint = f"{method} {template}"
+        try:
+            url = template.format(**values)
+        except KeyError:
+            report.append((endpoint, None, []))
+            continue
+        if authenticated and headers is None:
+            report.append((endpoint, None, []))
+            continue
+
+        main.page_cache.local.clear()
+        with recorded_selects(db.engine) as statements:
+            if method == "POST":
+                username = user.username if user else "audit"
+                client.post(url, json={"username": username, "password": "not the password"})
+            else:
+                client.get(url, headers=headers if authenticated else None)
+
+        problems = []
+        with db.engine.connect() as connection:
+            for statement, parameters in statements:
+                for kind, table, detail in plan_problems(connection, statement, parameters, tables):
+                    if (endpoint, table) not in EXPECTED_SCANS:
+                        problems.append((kind, table, detail, statement))
+        report.append((endpoint, len(statements), problems))
+    return report
+
+
+@app.cli.command("audit-queries")
+@click.option("--user", "username", help="Username to send authenticated requests as; defaults to the first user")
+def audit_queries_command(username):
+    """Explains the queries of each read endpoint and flags full scans."""
+    query = User.query.filter_by(username=username) if username else User.query.order_by(User.id)
+    user = query.first()
+    if username and not user:
+        raise click.ClickException(f"No user named {username}")
+
+    flagged = 0
+    for endpoint, count, problems in audit(user):
+        if count is None:
+            click.echo(f"SKIP  {endpoint}  (no sample data)")
+            continue
+        scans = sum(1 for kind, *_ in problems if kind == "scan")
+        status = "FLAG" if scans else "NOTE" if problems else "OK"
+        click.echo(f"{status:<4}  {endpoint}  ({count} queries)")
+        for kind, table, detail, statement in problems:
+            click.echo(f"      {kind}: {detail}")
+            click.echo(f"      {' '.join(statement.split())[:200]}")
+        flagged += scans
+    if flagged:
+        click.echo(f"{flagged} full scans found.")
+        raise SystemExit(1)
+    click.echo("No full scans found.")
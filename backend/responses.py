@@ -0,0 +1,166 @@
+"""
+Prepared JSON responses for the DevHub API
+
+Read endpoints build their response once as a prepared payload: the final
+JSON bytes, gzip and (when the brotli package is installed) Brotli
+compressed copies, and the validators used for conditional requests. Cached
+endpoints store the payload itself, so a cache hit picks the encoding the
+client accepts and sends those bytes as they are, without unpickling a dict
+and serializing it again.
+
+Each payload carries a weak ETag computed from the versions of the rows it
+was built from (IDs, update times and counters) and a Last-Modified time.
+Responses are sent with `Cache-Control: no-cache` so browsers keep the body
+but revalidate it on every use, and a request whose If-None-Match or
+If-Modified-Since still matches is answered with an empty 304. Uncached
+endpoints run a cheap probe query for the versions before loading anything.
+"""
+
+import gzip
+import hashlib
+import json
+import time
+from datetime import datetime, timezone
+from flask import Response, request
+from config import app
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - brotli is optional
+    brotli = None
+
+# Bodies smaller than this are sent uncompressed
+MIN_COMPRESS_SIZE = 512
+
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 6
+
+
+def _gzip(data):
+    return gzip.compress(data, compresslevel=GZIP_LEVEL, mtime=0)
+
+
+def _brotli(data):
+    return brotli.compress(data, quality=BROTLI_QUALITY, mode=brotli.MODE_TEXT)
+
+
+# Supported encodings in order of preference
+COMPRESSORS = {"br": _brotli, "gzip": _gzip} if brotli else {"gzip": _gzip}
+
+
+def weak_etag(*versions):
+    """Derives an ETag value from row versions.
+
+    Args:
+        *versions: JSON-serializable values identifying the response content,
+            e.g. (id, updated) pairs of the rows it shows
+
+    Returns:
+        str: Opaque ETag value, without quotes
+    """
+    encoded = json.dumps(versions, separators=(",", ":"), default=str)
+    return hashlib.sha1(encoded.encode("utf-8")).hexdigest()[:24]
+
+
+def timestamp_of(value):
+    """Converts a naive UTC datetime from the database to a Unix timestamp."""
+    if value is None:
+        return None
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.timestamp()
+
+
+def prepare_response(body, etag=None, last_modified=None, precompress=True):
+    """Serializes a response body once, for sending as often as needed.
+
+    Args:
+        body: JSON-serializable response body
+        etag (str, optional): Value from weak_etag(); defaults to a hash of
+            the serialized body
+        last_modified (float, optional): Unix timestamp of the last change;
+            defaults to now, the time the body was built
+        precompress (bool): Compress with every supported encoding now,
+            for payloads that will be cached; otherwise only the encoding a
+            request asks for is produced, when it is sent
+
+    Returns:
+        dict: Payload for send_prepared()
+    """
+    data = app.json.response(body).get_data()
+    encoded = {}
+    if precompress and len(data) >= MIN_COMPRESS_SIZE:
+        encoded = {encoding: compress(data) for encoding, compress in COMPRESSORS.items()}
+    return {
+        "data": data,
+        "encoded": encoded,
+        "etag": etag or hashlib.sha1(data).hexdigest()[:24],
+        "last_modified": last_modified if last_modified is not None else time.time()
+    }
+
+
+def is_not_modified(etag, last_modified=None):
+    """Checks the request's preconditions against the current validators.
+
+    If-None-Match takes precedence; If-Modified-Since is only consulted when
+    the request has no If-None-Match.
+    """
+    if request.if_none_match:
+        return request.if_none_match.contains_weak(etag)
+    if request.if_modified_since and last_modified is not None:
+        return int(last_modified) <= request.if_modified_since.timestamp()
+    return False
+
+
+def negotiate_encoding():
+    """Returns the preferred supported encoding the request accepts, or None."""
+    accepted = request.accept_encodings
+    best, best_quality = None, 0
+    for encoding in COMPRESSORS:
+        quality = accepted[encoding]
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+def _set_validators(response, etag, last_modified, private):
+    response.set_etag(etag, weak=True)
+    if last_modified is not None:
+        response.last_modified = datetime.fromtimestamp(int(last_modified), tz=timezone.utc)
+    response.cache_control.no_cache = True
+    if private:
+        response.cache_control.private = True
+        response.vary.add("Authorization")
+    return response
+
+
+def not_modified_response(etag, last_modified=None, private=False):
+    """Builds an empty 304 response carrying the validators."""
+    return _set_validators(Response(status=304), etag, last_modified, private)
+
+
+def send_prepared(payload, private=False):
+    """Answers with 304 if the request's validators match, else with the body.
+
+    The body is sent in the best encoding the client accepts.
+
+    Args:
+        payload (dict): Value returned by prepare_response()
+        private (bool): Whether the body depends on the authenticated user
+
+    Returns:
+        Response: 304, or 200 with the JSON body
+    """
+    if is_not_modified(payload["etag"], payload["last_modified"]):
+        return not_modified_response(payload["etag"], payload["last_modified"], private)
+
+    data = payload["data"]
+    encoding = negotiate_encoding() if len(data) >= MIN_COMPRESS_SIZE else None
+    if encoding:
+        encoded = payload["encoded"].get(encoding)
+        data = encoded if encoded is not None else COMPRESSORS[encoding](data)
+    response = Response(data, mimetype=app.json.mimetype)
+    if encoding:
+        response.content_encoding = encoding
+    response.vary.add("Accept-Encoding")
+    return _set_validators(response, payload["etag"], payload["last_modified"], private)
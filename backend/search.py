@@ -0,0 +1,278 @@
+"""
+Full-text search for the DevHub API
+
+Posts are indexed in an SQLite FTS5 table holding the title and the plain text
+of the body, keyed by the post's ID. The index is written in the same
+transaction as the post itself, so /search can rank matches with BM25 and
+return highlighted snippets instead of scanning the posts table with
+leading-wildcard LIKEs. Databases without FTS5 keep the LIKE search.
+
+The 9c4d2b7e15f3 migration creates and fills the index on existing
+databases; `flask search-reindex` rebuilds it from the posts table.
+"""
+
+import html
+import math
+import re
+from html.parser import HTMLParser
+import click
+from sqlalchemy import DDL, desc, event, literal_column, select, table, text
+from config import app, db
+from models import Post
+from loaders import listing_options
+from pagination import keyset_page
+
+SEARCH_TABLE = "post_search"
+
+# Title matches weigh more than body matches when ranking
+TITLE_WEIGHT = 10.0
+BODY_WEIGHT = 1.0
+
+# Private-use markers placed around matches by snippet(), swapped for <mark>
+# tags once the snippet text has been escaped
+_MATCH_START = "\ue000"
+_MATCH_END = "\ue001"
+
+_CREATE_SEARCH_TABLE = (
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {SEARCH_TABLE} "
+    "USING fts5(title, body, tokenize='unicode61 remove_diacritics 2')"
+)
+
+_availability = {}
+
+event.listen(db.metadata, "after_create",
+             DDL(_CREATE_SEARCH_TABLE).execute_if(dialect="sqlite"))
+event.listen(db.metadata, "before_drop",
+             DDL(f"DROP TABLE IF EXISTS {SEARCH_TABLE}").execute_if(dialect="sqlite"))
+
+
+class _TextExtractor(HTMLParser):
+    """Collects the text content of an HTML fragment."""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.parts = []
+
+    def handle_data(self, data):
+        self.parts.append(data)
+
+
+def html_to_text(body):
+    """Strips the markup from a post body, leaving whitespace-separated text."""
+    if not body:
+        return ""
+    extractor = _TextExtractor()
+    extractor.feed(body)
+    extractor.close()
+    return " ".join(" ".join(extractor.parts).split())
+
+
+def search_index_available():
+    """Checks whether the database has a usable FTS5 search index.
+
+    The result is remembered per engine, so the probe runs once per process.
+    """
+    engine = db.engine
+    if engine.url not in _availability:
+        available = False
+        if engine.dialect.name == "sqlite":
+            available = db.session.execute(text(
+                "SELECT 1 FROM sqlite_master WHERE name = :name"
+            ), {"name": SEARCH_TABLE}).first() is not None
+        _availability[engine.url] = available
+    return _availability[engine.url]
+
+
+def index_post(post):
+    """Adds or refreshes a post in the search index within the current transaction."""
+    if not search_index_available():
+        return
+    remove_post(post.id)
+    db.session.execute(text(
+        f"INSERT INTO {SEARCH_TABLE} (rowid, title, body) VALUES (:id, :title, :body)"
+    ), {"id": post.id, "title": post.title, "body": html_to_text(post.body)})
+
+
+def remove_post(post_id):
+    """Removes a post from the search index within the current transaction."""
+    if not search_index_available():
+        return
+    db.session.execute(text(
+        f"DELETE FROM {SEARCH_TABLE} WHERE rowid = :id"
+    ), {"id": post_id})
+
+
+def build_match_expression(query):
+    """Turns free-form user input into an FTS5 MATCH expression.
+
+    Every word becomes a quoted prefix term, so punctuation in the input can
+    never be read as FTS5 query syntax. Returns None when the input has no
+    searchable words.
+    """
+    terms = re.findall(r"\w+", query)
+    if not terms:
+        return None
+    return " ".join(f'"{term}"*' for term in terms)
+
+
+def _format_snippet(snippet):
+    """Escapes a raw FTS5 snippet and highlights its matches with <mark>."""
+    escaped = html.escape(snippet or "")
+    return escaped.replace(_MATCH_START, "<mark>").replace(_MATCH_END, "</mark>")
+
+
+class SearchResults:
+    """A page of post search results, shaped like a Flask-SQLAlchemy pagination."""
+
+    def __init__(self, items, total, page, per_page, snippets=None, next_cursor=None):
+        self.items = items
+        self.total = total
+        self.page = page
+        self.per_page = per_page
+        self.snippets = snippets or {}
+        self.next_cursor = next_cursor
+
+    @property
+    def pages(self):
+        if not self.total or not self.per_page:
+            return 0
+        return math.ceil(self.total / self.per_page)
+
+
+def _ranked_search(match, page, per_page):
+    """Runs a BM25-ranked FTS5 query and loads the matching posts."""
+    params = {"match": match, "limit": per_page, "offset": (page - 1) * per_page,
+              "start": _MATCH_START, "end": _MATCH_END}
+    total = db.session.execute(text(
+        f"SELECT count(*) FROM {SEARCH_TABLE} WHERE {SEARCH_TABLE} MATCH :match"
+    ), params).scalar()
+
+    rows = db.session.execute(text(
+        f"SELECT rowid, snippet({SEARCH_TABLE}, 1, :start, :end, '…', 16) "
+        f"FROM {SEARCH_TABLE} WHERE {SEARCH_TABLE} MATCH :match "
+        f"ORDER BY bm25({SEARCH_TABLE}, {TITLE_WEIGHT}, {BODY_WEIGHT}) "
+        "LIMIT :limit OFFSET :offset"
+    ), params).all()
+
+    post_ids = [row[0] for row in rows]
+    posts_by_id = {post.id: post for post in Post.query.options(*listing_options())
+                   .filter(Post.id.in_(post_ids))} if post_ids else {}
+    items = [posts_by_id[post_id] for post_id in post_ids if post_id in posts_by_id]
+    snippets = {row[0]: _format_snippet(row[1]) for row in rows}
+    return SearchResults(items, total, page, per_page, snippets)
+
+
+def _match_snippets(match, post_ids):
+    """Fetches highlighted body snippets for a set of matching posts."""
+    if not post_ids:
+        return {}
+    rows = db.session.execute(text(
+        f"SELECT rowid, snippet({SEARCH_TABLE}, 1, :start, :end, '…', 16) "
+        f"FROM {SEARCH_TABLE} WHERE {SEARCH_TABLE} MATCH :match "
+        f"AND rowid IN ({', '.join(str(int(post_id)) for post_id in post_ids)})"
+    ), {"match": match, "start": _MATCH_START, "end": _MATCH_END}).all()
+    return {row[0]: _format_snippet(row[1]) for row in rows}
+
+
+def _like_search(query, page, per_page):
+    """Matches post titles with a LIKE scan, newest first."""
+    posts = Post.query.options(*listing_options())\
+        .filter(Post.title.ilike(f'%{query}%'))\
+        .order_by(desc(Post.created), desc(Post.id))\
+        .paginate(page=page, per_page=per_page, error_out=False)
+    return SearchResults(posts.items, posts.total, page, per_page)
+
+
+def search_posts(query, page=1, per_page=10):
+    """Searches post titles and bodies.
+
+    Args:
+        query (str): Free-form search input
+        page (int, optional): Page number. Defaults to 1.
+        per_page (int, optional): Results per page. Defaults to 10.
+
+    Returns:
+        SearchResults: Matching posts, ranked by relevance when the full-text
+            index is available and by creation date otherwise
+    """
+    page = max(page, 1)
+    if search_index_available():
+        match = build_match_expression(query)
+        if not match:
+            return SearchResults([], 0, page, per_page)
+        return _ranked_search(match, page, per_page)
+    return _like_search(query, page, per_page)
+
+
+def search_posts_after(query, cursor=None, per_page=10, include_total=False):
+    """Searches post titles and bodies newest first, using keyset pagination.
+
+    Args:
+        query (str): Free-form search input
+        cursor (str, optional): Cursor returned with the previous page
+        per_page (int, optional): Results per page. Defaults to 10.
+        include_total (bool, optional): Whether to count all matches. Defaults to False.
+
+    Returns:
+        SearchResults: Matching posts with the cursor of the next page, if any
+
+    Raises:
+        InvalidCursor: If the cursor is malformed
+    """
+    posts_query = Post.query.options(*listing_options())
+    match = None
+    if search_index_available():
+        match = build_match_expression(query)
+        if not match:
+            return SearchResults([], 0 if include_total else None, None, per_page)
+        matching_ids = select(literal_column("rowid"))\
+            .select_from(table(SEARCH_TABLE))\
+            .where(text(f"{SEARCH_TABLE} MATCH :match").bindparams(match=match))
+        posts_query = posts_query.filter(Post.id.in_(matching_ids))
+    else:
+        posts_query = posts_query.filter(Post.title.ilike(f'%{query}%'))
+
+    page = keyset_page(posts_query, cursor, per_page, include_total)
+    snippets = _match_snippets(match, [post.id for post in page.items]) if match else {}
+    return SearchResults(page.items, page.total, None, per_page, snippets, page.next_cursor)
+
+
+def rebuild_search_index(batch_size=1000):
+    """Rebuilds the search index from the posts table.
+
+    Args:
+        batch_size (int, optional): Posts read and indexed per batch. Defaults to 1000.
+
+    Returns:
+        int: Number of posts indexed
+    """
+    db.session.execute(text(_CREATE_SEARCH_TABLE))
+    _availability.pop(db.engine.url, None)
+    db.session.execute(text(f"DELETE FROM {SEARCH_TABLE}"))
+
+    indexed = 0
+    batch = []
+    rows = db.session.execute(
+        db.select(Post.id, Post.title, Post.body).execution_options(yield_per=batch_size)
+    )
+    insert = text(f"INSERT INTO {SEARCH_TABLE} (rowid, title, body) VALUES (:id, :title, :body)")
+    for post_id, title, body in rows:
+        batch.append({"id": post_id, "title": title, "body": html_to_text(body)})
+        if len(batch) >= batch_size:
+            db.session.execute(insert, batch)
+            indexed += len(batch)
+            batch = []
+    if batch:
+        db.session.execute(insert, batch)
+        indexed += len(batch)
+    db.session.commit()
+    return indexed
+
+
+@app.cli.command("search-reindex")
+def search_reindex_command():
+    """Rebuilds the full-text search index from the posts table."""
+    if db.engine.dialect.name != "sqlite":
+        click.echo("Full-text search requires SQLite with FTS5.")
+        return
+    click.echo(f"Indexed {rebuild_search_index()} posts.")
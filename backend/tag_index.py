@@ -0,0 +1,91 @@
+"""
+Tag autocomplete for the DevHub API
+
+Tag names are kept in process memory as a sorted array of case-folded keys,
+so the tags starting with a prefix are the contiguous slice found by two
+binary searches. The matches are ranked by how many posts use them.
+
+Each worker loads the index from the tag table on first use and reloads it
+after TAG_INDEX_TTL seconds, which picks up tags created by other workers.
+Tags created or dropped by this worker are applied immediately.
+"""
+
+import bisect
+import heapq
+import threading
+import time
+from config import app, db
+from models import Tag
+
+# Sorts after every character a tag name can contain
+_PREFIX_END = "\U0010ffff"
+
+
+class TagPrefixIndex:
+    """Sorted in-memory index of tag names and their post counts.
+
+    Args:
+        ttl (float): Seconds after which the index is reloaded from the database
+    """
+
+    def __init__(self, ttl=300):
+        self.ttl = ttl
+        self._entries = []
+        self._counts = {}
+        self._loaded_at = None
+        self._lock = threading.Lock()
+
+    def _load(self):
+        """Rebuilds the index from the tag table."""
+        counts = {}
+        for name, post_count in db.session.execute(db.select(Tag.name, Tag.post_count)):
+            counts[name] = counts.get(name, 0) + (post_count or 0)
+        self._counts = counts
+        self._entries = sorted((name.casefold(), name) for name in counts)
+        self._loaded_at = time.monotonic()
+
+    def _ensure_loaded(self):
+        if self._loaded_at is None or time.monotonic() - self._loaded_at > self.ttl:
+            self._load()
+
+    def add(self, name, delta=1):
+        """Adjusts a tag's post count, inserting the tag if it is new.
+
+        Does nothing until the index has been loaded, as the load will
+        include the tag.
+        """
+        with self._lock:
+            if self._loaded_at is None:
+                return
+            if name not in self._counts:
+                bisect.insort(self._entries, (name.casefold(), name))
+                self._counts[name] = 0
+            self._counts[name] = max(self._counts[name] + delta, 0)
+
+    def suggest(self, prefix, limit=10):
+        """Returns the most used tags starting with prefix, ignoring case.
+
+        Args:
+            prefix (str): Beginning of the tag name
+            limit (int): Maximum number of suggestions
+
+        Returns:
+            list: (name, post_count) pairs, most used first
+        """
+        key = prefix.casefold()
+        with self._lock:
+            self._ensure_loaded()
+            start = bisect.bisect_left(self._entries, (key,))
+            end = bisect.bisect_left(self._entries, (key + _PREFIX_END,), lo=start)
+            matches = [(name, self._counts[name]) for _, name in self._entries[start:end]]
+        return heapq.nlargest(limit, matches, key=lambda match: match[1])
+
+    def reset(self):
+        """Drops the index so it is reloaded on next use."""
+        with self._lock:
+            self._entries = []
+            self._counts = {}
+            self._loaded_at = None
+
+
+tag_index = TagPrefixIndex(ttl=app.config["TAG_INDEX_TTL"])
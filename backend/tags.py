@@ -0,0 +1,42 @@
+"""
+Tag resolution for the DevHub API
+
+Tags are identified by their normalized name (`Tag.name_key`), which has a
+unique index. A post's tags are resolved with one IN query on that index, and
+the missing ones are created with a single multi-row insert that skips rows
+another request created in the meantime, so concurrent posts cannot create
+duplicate tags.
+"""
+
+from models import Tag, normalize_tag_name
+from associations import insert_ignoring_conflicts
+
+
+def resolve_tags(names):
+    """Returns the tags with the given names, creating the missing ones.
+
+    Names are matched by their normalized form; a new tag keeps the spelling
+    it was first given. Blank names and repeats are dropped.
+
+    Args:
+        names (list): Tag names as entered by the user
+
+    Returns:
+        list: Tag objects in the order the names were given
+    """
+    wanted = {}
+    for name in names:
+        if not isinstance(name, str) or not name.strip():
+            continue
+        wanted.setdefault(normalize_tag_name(name), " ".join(name.split()))
+    if not wanted:
+        return []
+
+    tags = {tag.name_key: tag for tag in Tag.query.filter(Tag.name_key.in_(wanted))}
+    missing = [key for key in wanted if key not in tags]
+    if missing:
+        insert_ignoring_conflicts(Tag.__table__,
+                                  [{"name": wanted[key], "name_key": key, "post_count": 0} for key in missing],
+                                  ["name_key"])
+        tags.update((tag.name_key, tag) for tag in Tag.query.filter(Tag.name_key.in_(missing)))
+    return [tags[key] for key in wanted]
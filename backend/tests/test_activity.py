@@ -0,0 +1,121 @@
+import unittest
+import json
+from sqlalchemy import event
+from config import app, db
+from models import Activity, Post, User
+from flask_jwt_extended import create_access_token
+from activity import MemoryActivityStore
+from trending import MemoryTrendingStore
+import main
+
+
+class ActivityStreamTestCase(unittest.TestCase):
+    def setUp(self):
+        """Set up test variables and initialize app."""
+        main.cache.init_app(app, config={'CACHE_TYPE': 'flask_caching.backends.SimpleCache'})
+        main.trending_index.store = MemoryTrendingStore()
+        main.activity_stream.store = MemoryActivityStore(main.activity_stream.length)
+        self.app = app.test_client()
+        self.app_context = app.app_context()
+        self.app_context.push()
+        db.create_all()
+        main.page_cache.clear()
+
+        self.author = User(username='author', email='author@example.com', first_name='Ada')
+        self.reader = User(username='reader', email='reader@example.com', first_name='Rex')
+        db.session.add_all([self.author, self.reader])
+        db.session.commit()
+        self.author_headers = {'Authorization': f'Bearer {create_access_token(identity=self.author.id)}'}
+        self.reader_headers = {'Authorization': f'Bearer {create_access_token(identity=self.reader.id)}'}
+
+        self.app.post('/create_post', headers=self.author_headers,
+                      json={'title': 'First post', 'body': '<p>Hello</p>'})
+        self.post_id = db.session.execute(db.select(Post.id)).scalar()
+
+    def tearDown(self):
+        """Clean up after each test."""
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def feed(self, query=''):
+        """Helper method to fetch the feed as (name, action, title) tuples."""
+        data = json.loads(self.app.get(f'/recent_activities{query}', headers=self.reader_headers).data)
+        return [(entry['user']['name'], entry['action'], entry['post']['title']) for entry in data]
+
+    def test_feed_records_posts_comments_and_likes(self):
+        """Test that every kind of event appears, newest first."""
+        self.app.post(f'/add_comment/{self.post_id}', headers=self.reader_headers, json={'content': 'Nice'})
+        self.app.post(f'/like_post/{self.post_id}', headers=self.reader_headers)
+        self.assertEqual(self.feed(), [
+            ('Rex', 'liked', 'First post'),
+            ('Rex', 'commented on', 'First post'),
+            ('Ada', 'published', 'First post'),
+        ])
+        self.assertEqual(self.feed('?limit=1'), [('Rex', 'liked', 'First post')])
+        self.assertEqual(Activity.query.count(), 3)
+
+    def test_feed_is_read_without_queries(self):
+        """Test that reading a loaded feed does not touch the database."""
+        self.feed()
+        statements = []
+
+        def record(conn, cursor, statement, *args):
+            statements.append(statement)
+
+        event.listen(db.engine, "before_cursor_execute", record)
+        try:
+            self.assertEqual(len(self.feed()), 1)
+        finally:
+            event.remove(db.engine, "before_cursor_execute", record)
+        self.assertEqual(statements, [])
+
+    def test_retracted_events_leave_the_feed(self):
+        """Test that unlikes and deleted comments and posts are removed."""
+        self.app.post(f'/like_post/{self.post_id}', headers=self.reader_headers)
+        response = self.app.post(f'/add_comment/{self.post_id}', headers=self.reader_headers,
+                                 json={'content': 'Nice'})
+        comment_id = json.loads(response.data)['id']
+        self.assertEqual(len(self.feed()), 3)
+
+        self.app.post(f'/like_post/{self.post_id}', headers=self.reader_headers)
+        self.app.delete(f'/delete_comment/{comment_id}', headers=self.reader_headers)
+        self.assertEqual(self.feed(), [('Ada', 'published', 'First post')])
+
+        self.app.delete(f'/delete_post/{self.post_id}', headers=self.author_headers)
+        self.assertEqual(self.feed(), [])
+        self.assertEqual(Activity.query.count(), 0)
+
+    def test_renames_refresh_the_feed(self):
+        """Test that the feed shows edited titles and names."""
+        self.feed()
+        self.app.put(f'/edit_post/{self.post_id}', headers=self.author_headers, json={'title': 'Renamed'})
+        self.app.put('/edit_profile', headers=self.author_headers, data={'firstName': 'Ava'})
+        self.assertEqual(self.feed(), [('Ava', 'published', 'Renamed')])
+
+    def test_feed_is_capped_and_reloaded(self):
+        """Test that the store keeps only the newest entries and reloads when missing."""
+        main.activity_stream.store = MemoryActivityStore(2)
+        self.feed()
+        for index in range(3):
+            self.app.post(f'/add_comment/{self.post_id}', headers=self.reader_headers,
+                          json={'content': f'Comment {index}'})
+        self.assertEqual(len(self.feed()), 2)
+        self.assertEqual(len(main.activity_stream.store.latest(10)), 2)
+
+        # A fresh worker loads the newest entries from the database
+        main.activity_stream.store = MemoryActivityStore(main.activity_stream.length)
+        self.assertEqual(len(self.feed('?limit=50')), 4)
+
+    def test_unchanged_feed_returns_304(self):
+        """Test that the feed is revalidated with its ETag."""
+        response = self.app.get('/recent_activities', headers=self.reader_headers)
+        etag = response.headers['ETag']
+        headers = {**self.reader_headers, 'If-None-Match': etag}
+        self.assertEqual(self.app.get('/recent_activities', headers=headers).status_code, 304)
+
+        self.app.post(f'/like_post/{self.post_id}', headers=self.reader_headers)
+        self.assertEqual(self.app.get('/recent_activities', headers=headers).status_code, 200)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,121 @@
+import unittest
+import io
+import json
+import os
+import shutil
+import tempfile
+from PIL import Image
+from config import app, db
+from models import Post, User
+from flask_jwt_extended import create_access_token
+import main
+
+
+def make_image(size=(1000, 800), mode="RGBA", image_format="PNG"):
+    """Helper function to encode a generated image."""
+    buffer = io.BytesIO()
+    Image.new(mode, size, (200, 30, 30, 128) if mode == "RGBA" else (200, 30, 30)).save(buffer, image_format)
+    return buffer.getvalue()
+
+
+class AvatarTestCase(unittest.TestCase):
+    def setUp(self):
+        """Set up test variables and initialize app."""
+        main.cache.init_app(app, config={'CACHE_TYPE': 'flask_caching.backends.SimpleCache'})
+        self.folders = (app.config['UPLOAD_FOLDER'], app.config['AVATAR_FOLDER'])
+        self.upload_folder = tempfile.mkdtemp()
+        app.config['UPLOAD_FOLDER'] = self.upload_folder
+        app.config['AVATAR_FOLDER'] = os.path.join(self.upload_folder, 'avatars')
+        os.makedirs(app.config['AVATAR_FOLDER'])
+        self.app = app.test_client()
+        self.app_context = app.app_context()
+        self.app_context.push()
+        db.create_all()
+        main.page_cache.clear()
+
+        self.user = User(username='testuser', email='test@example.com', first_name='Test')
+        db.session.add(self.user)
+        db.session.commit()
+        self.headers = {'Authorization': f'Bearer {create_access_token(identity=self.user.id)}'}
+
+    def tearDown(self):
+        """Clean up after each test."""
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+        app.config['UPLOAD_FOLDER'], app.config['AVATAR_FOLDER'] = self.folders
+        shutil.rmtree(self.upload_folder)
+
+    def upload(self, data, filename='me.png'):
+        """Helper method to upload a profile picture."""
+        return self.app.put('/edit_profile', headers=self.headers,
+                            data={'profile_pic': (io.BytesIO(data), filename)},
+                            content_type='multipart/form-data')
+
+    def test_upload_stores_variants_under_content_hash(self):
+        """Test that an upload is stored as resized WebP and JPEG variants."""
+        data = make_image()
+        response = self.upload(data)
+        self.assertEqual(response.status_code, 200)
+        user_data = json.loads(response.data)['user']
+        digest = user_data['profile_pic'].split('/')[1].rsplit('-', 1)[0]
+        self.assertEqual(user_data['avatars'], {size: f'avatars/{digest}-{size}' for size in ('48', '128', '512')})
+        self.assertEqual(len(os.listdir(app.config['AVATAR_FOLDER'])), 6)
+
+        # Uploading the same file again reuses the stored variants
+        self.assertEqual(json.loads(self.upload(data, 'again.png').data)['user']['profile_pic'],
+                         user_data['profile_pic'])
+        self.assertEqual(len(os.listdir(app.config['AVATAR_FOLDER'])), 6)
+
+    def test_variants_are_negotiated_and_immutable(self):
+        """Test that variants are served as WebP or JPEG with long-lived caching."""
+        self.upload(make_image())
+        path = json.loads(self.app.get('/current_user', headers=self.headers).data)['avatars']['48']
+
+        response = self.app.get(f'/uploads/{path}', headers={'Accept': 'image/avif,image/webp,*/*'})
+        self.assertEqual(response.mimetype, 'image/webp')
+        self.assertEqual(Image.open(io.BytesIO(response.data)).size, (48, 48))
+        self.assertIn('immutable', response.headers['Cache-Control'])
+        self.assertIn('max-age=31536000', response.headers['Cache-Control'])
+        self.assertIn('Accept', response.headers['Vary'])
+
+        response = self.app.get(f'/uploads/{path}', headers={'Accept': 'image/png,image/*;q=0.8'})
+        self.assertEqual(response.mimetype, 'image/jpeg')
+        self.assertEqual(self.app.get('/uploads/avatars/abc-49').status_code, 404)
+
+    def test_responses_reference_small_variants(self):
+        """Test that comment authors and post listings get the 48px variant."""
+        self.upload(make_image(mode='RGB', image_format='JPEG'), 'me.jpg')
+        post = Post(host=self.user, title='Post', body='body')
+        db.session.add(post)
+        db.session.commit()
+        self.app.post(f'/add_comment/{post.id}', headers=self.headers, json={'content': 'Hi'})
+
+        data = json.loads(self.app.get(f'/get_post/{post.id}').data)
+        self.assertTrue(data['comments'][0]['author']['avatar'].endswith('-48'))
+        self.assertTrue(data['host_avatar'].endswith('-128'))
+        data = json.loads(self.app.get('/get_posts').data)
+        self.assertTrue(data['posts'][0]['host_avatar'].endswith('-48'))
+
+    def test_invalid_image_is_rejected(self):
+        """Test that a file that is not an image is refused."""
+        response = self.upload(b'not an image')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(os.listdir(app.config['AVATAR_FOLDER']), [])
+
+    def test_rebuild_command(self):
+        """Test that pictures uploaded before processing get variants."""
+        with open(os.path.join(self.upload_folder, 'legacy.png'), 'wb') as legacy:
+            legacy.write(make_image((300, 300)))
+        self.user.profile_pic = 'legacy.png'
+        db.session.commit()
+        self.assertEqual(json.loads(self.app.get('/current_user', headers=self.headers).data)['profile_pic'],
+                         'legacy.png')
+
+        result = app.test_cli_runner().invoke(args=['avatars-rebuild'])
+        self.assertIn('Processed 1 pictures', result.output)
+        db.session.expire_all()
+        self.assertTrue(db.session.get(User, self.user.id).profile_pic.startswith('avatars/'))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,166 @@
+import unittest
+import json
+from config import app, db
+from models import User, Post, Tag, Comment
+from flask_jwt_extended import create_access_token
+from activity import MemoryActivityStore
+from trending import MemoryTrendingStore
+from bulk import export_records, import_lines
+import main
+
+
+class BulkDataTestCase(unittest.TestCase):
+    def setUp(self):
+        """Set up test variables and initialize app."""
+        main.cache.init_app(app, config={'CACHE_TYPE': 'flask_caching.backends.SimpleCache'})
+        main.trending_index.store = MemoryTrendingStore()
+        main.activity_stream.store = MemoryActivityStore(main.activity_stream.length)
+        self.app = app.test_client()
+        self.app_context = app.app_context()
+        self.app_context.push()
+        db.create_all()
+        main.page_cache.clear()
+
+        self.users = []
+        for name in ('alice', 'bob'):
+            user = User(username=name, email=f'{name}@example.com', first_name=name.title())
+            user.set_password('password')
+            db.session.add(user)
+            db.session.commit()
+            self.users.append({'Authorization': f'Bearer {create_access_token(identity=user.id)}'})
+        alice, bob = self.users
+        self.app.post('/create_post', headers=alice,
+                      json={'title': 'Bulk loading', 'body': '<p>Fast inserts</p>', 'tags': ['Python', 'SQL']})
+        self.app.post('/create_post', headers=bob, json={'title': 'Untagged', 'body': '<p>Plain</p>', 'tags': []})
+        self.app.post('/add_comment/1', headers=bob, json={'content': 'Nice'})
+        self.app.post('/like_post/1', headers=bob)
+        self.app.post('/bookmark_post/1', headers=alice)
+        self.app.post('/like_comment/1', headers=alice)
+        self.app.post('/follow_tag/python', headers=bob)
+
+    def tearDown(self):
+        """Clean up after each test."""
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def export(self, **options):
+        """Helper method to export the database as NDJSON lines."""
+        return [json.dumps(record) for record in export_records(batch_size=1, **options)]
+
+    def test_export_records(self):
+        """Test that every row is exported, posts with their tag names."""
+        records = [json.loads(line) for line in self.export()]
+        self.assertEqual([record['type'] for record in records],
+                         ['user', 'user', 'tag', 'tag', 'post', 'post', 'comment', 'like', 'bookmark',
+                          'comment_like', 'tag_follow'])
+        self.assertEqual(records[4]['tags'], ['Python', 'SQL'])
+        self.assertEqual(records[5]['tags'], [])
+        self.assertEqual(records[-1], {'type': 'tag_follow', 'tag': 'Python', 'user_id': 2})
+        self.assertNotIn('password_hash', records[0])
+        self.assertTrue(json.loads(self.export(password_hashes=True)[0])['password_hash'])
+
+    def test_round_trip(self):
+        """Test that an export imported into an empty database recreates it."""
+        lines = self.export(password_hashes=True)
+        db.session.remove()
+        db.drop_all()
+        db.create_all()
+
+        importer = import_lines(lines, batch_size=1)
+        self.assertEqual(importer.error_count, 0)
+        self.assertEqual(importer.inserted['post'], 2)
+        post = db.session.get(Post, 1)
+        self.assertEqual(sorted(tag.name for tag in post.tags), ['Python', 'SQL'])
+        self.assertEqual((post.like_count, post.bookmark_count, post.comment_count), (1, 1, 1))
+        self.assertEqual(db.session.get(Comment, 1).like_count, 1)
+        self.assertEqual(Tag.query.filter_by(name_key='python').one().follower_count, 1)
+        self.assertTrue(User.query.filter_by(username='alice').one().check_password('password'))
+
+        response = self.app.get('/search?q=inserts')
+        self.assertEqual([result['id'] for result in response.get_json()['results']['posts']], [1])
+        feed = self.app.get('/feed', headers=self.users[1]).get_json()
+        self.assertEqual([entry['id'] for entry in feed['posts']], [1])
+
+    def test_import_into_existing_data(self):
+        """Test that imported records get new IDs and existing users and tags are matched."""
+        lines = [
+            {'type': 'user', 'id': 7, 'username': 'Alice', 'email': 'other@example.com', 'first_name': 'A'},
+            {'type': 'user', 'id': 8, 'username': 'carol', 'email': 'carol@example.com', 'first_name': 'Carol'},
+            {'type': 'post', 'id': 1, 'host_id': 8, 'title': 'Imported', 'body': '<p>Hi</p>',
+             'created': '2024-05-01T10:00:00+02:00', 'tags': ['python', 'Rust']},
+            {'type': 'like', 'post_id': 1, 'user_id': 7},
+            {'type': 'like', 'post_id': 1, 'user_id': 7},
+        ]
+        importer = import_lines([json.dumps(line) for line in lines])
+        self.assertEqual(importer.error_count, 0)
+        self.assertEqual(importer.matched, 1)
+
+        carol = User.query.filter_by(username='carol').one()
+        post = Post.query.filter_by(title='Imported').one()
+        self.assertEqual(post.id, 3)
+        self.assertEqual(post.host_id, carol.id)
+        self.assertEqual(post.created.isoformat(), '2024-05-01T08:00:00')
+        self.assertEqual(sorted(tag.name for tag in post.tags), ['Python', 'Rust'])
+        self.assertEqual(Tag.query.count(), 3)
+        self.assertEqual(post.like_count, 1)
+        self.assertEqual(post.liked_by[0].username, 'alice')
+
+    def test_import_keeps_existing_timelines(self):
+        """Test that an import only adds its own posts and follows to the home timelines."""
+        backfill = app.config['FEED_BACKFILL']
+        app.config['FEED_BACKFILL'] = 1
+        try:
+            self.app.post('/create_post', headers=self.users[0],
+                          json={'title': 'Newer', 'body': '<p>More</p>', 'tags': ['python']})
+            lines = [
+                {'type': 'user', 'id': 8, 'username': 'carol', 'email': 'carol@example.com', 'first_name': 'Carol'},
+                {'type': 'post', 'id': 1, 'host_id': 8, 'title': 'Imported', 'body': '<p>Hi</p>', 'tags': ['python']},
+                {'type': 'tag_follow', 'tag': 'SQL', 'user_id': 8},
+            ]
+            importer = import_lines([json.dumps(line) for line in lines])
+        finally:
+            app.config['FEED_BACKFILL'] = backfill
+        self.assertEqual(importer.error_count, 0)
+
+        feed = self.app.get('/feed', headers=self.users[1]).get_json()
+        self.assertEqual([entry['id'] for entry in feed['posts']], [4, 3, 1])
+        carol = User.query.filter_by(username='carol').one()
+        carol_headers = {'Authorization': f'Bearer {create_access_token(identity=carol.id)}'}
+        feed = self.app.get('/feed', headers=carol_headers).get_json()
+        self.assertEqual([entry['id'] for entry in feed['posts']], [1])
+
+    def test_invalid_records_are_skipped(self):
+        """Test that invalid records are reported by line and the rest imported."""
+        lines = [
+            json.dumps({'type': 'user', 'id': 1, 'username': 'dave', 'email': 'alice@example.com',
+                        'first_name': 'Dave'}),
+            '{not json',
+            json.dumps({'type': 'post', 'id': 1, 'host_id': 99, 'title': 'Orphan'}),
+            json.dumps({'type': 'post', 'title': 'Anonymous', 'created': 'yesterday'}),
+            json.dumps({'type': 'post', 'title': 'Kept'}),
+            json.dumps({'type': 'poll'}),
+        ]
+        importer = import_lines(lines)
+        errors = sorted(importer.errors)
+        self.assertEqual([line for line, _ in errors], [1, 2, 3, 4, 6])
+        self.assertIn('already taken', errors[0][1])
+        self.assertIn('does not refer to an imported user', errors[2][1])
+        self.assertEqual(importer.inserted['post'], 1)
+        self.assertEqual(Post.query.filter_by(title='Kept').count(), 1)
+
+    def test_cli_commands(self):
+        """Test that the commands stream records out and back in."""
+        runner = app.test_cli_runner(mix_stderr=False)
+        exported = runner.invoke(args=['export-data'])
+        self.assertEqual(exported.exit_code, 0)
+        self.assertEqual(len(exported.stdout.splitlines()), 11)
+        self.assertIn('Exported 11 records', exported.stderr)
+
+        result = runner.invoke(args=['import-data', '-'], input='{"type": "tag", "name": "Go"}\n{"type": 1}\n')
+        self.assertEqual(result.exit_code, 1)
+        self.assertIn('Imported 1 tags', result.stdout)
+        self.assertIn('line 2: unknown record type 1', result.stderr)
+
+if __name__ == "__main__":
+    unittest.main()
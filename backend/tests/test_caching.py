@@ -0,0 +1,99 @@
+import unittest
+import json
+from config import app, db
+from models import User
+from flask_jwt_extended import create_access_token
+import main
+from search import rebuild_search_index
+
+
+class DependencyCacheTestCase(unittest.TestCase):
+    def setUp(self):
+        """Set up test variables and initialize app."""
+        main.cache.init_app(app, config={'CACHE_TYPE': 'flask_caching.backends.SimpleCache'})
+        self.app = app.test_client()
+        self.app_context = app.app_context()
+        self.app_context.push()
+        db.create_all()
+        main.page_cache.clear()
+
+        user = User(username='testuser', email='test@example.com', first_name='Test')
+        db.session.add(user)
+        db.session.commit()
+        self.headers = {'Authorization': f'Bearer {create_access_token(identity=user.id)}'}
+
+    def tearDown(self):
+        """Clean up after each test."""
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def create_post(self, title, tags=()):
+        """Helper method to create a post through the API."""
+        self.app.post('/create_post', headers=self.headers,
+                      json={'title': title, 'body': f'<p>{title}</p>', 'tags': list(tags)})
+        return db.session.execute(db.text('SELECT max(id) FROM post')).scalar()
+
+    def titles(self, url):
+        """Helper method to fetch a listing and return its post titles."""
+        data = json.loads(self.app.get(url).data)
+        posts = data['results']['posts'] if 'results' in data else data['posts']
+        return [post['title'] for post in posts]
+
+    def test_invalidate_bumps_only_its_dependencies(self):
+        """Test that entries survive writes to unrelated dependencies."""
+        page_cache = main.page_cache
+        page_cache.set('test', 'a', 'value a', depends_on=['post:1'])
+        page_cache.set('test', 'b', 'value b', depends_on=['post:2', 'tags'])
+
+        page_cache.invalidate('post:2')
+        self.assertEqual(page_cache.get('test', 'a'), 'value a')
+        self.assertIsNone(page_cache.get('test', 'b'))
+
+    def test_create_post_invalidates_affected_listings(self):
+        """Test that a new post only invalidates the listings it belongs to."""
+        self.create_post('Python post', tags=['python'])
+        self.create_post('Rust post', tags=['rust'])
+        self.assertEqual(self.titles('/get_posts?tag=rust'), ['Rust post'])
+        self.assertEqual(self.titles('/get_posts?tag=python'), ['Python post'])
+
+        self.create_post('Second python post', tags=['python'])
+        stats = main.page_cache.stats()['posts']
+
+        self.assertEqual(self.titles('/get_posts?tag=python'), ['Second python post', 'Python post'])
+        self.assertEqual(self.titles('/get_posts?tag=rust'), ['Rust post'])
+        self.assertEqual(self.titles('/get_posts'), ['Second python post', 'Rust post', 'Python post'])
+
+        after = main.page_cache.stats()['posts']
+        self.assertEqual(after['hits'] - stats['hits'], 1)
+        self.assertEqual(after['misses'] - stats['misses'], 2)
+
+    def test_edit_and_delete_invalidate_search_entries(self):
+        """Test that search entries containing a post follow its edits and deletion."""
+        post_id = self.create_post('Caching tips')
+        other_id = self.create_post('Unrelated')
+        rebuild_search_index()
+        self.assertEqual(self.titles('/search?q=caching'), ['Caching tips'])
+        self.assertEqual(self.titles('/search?q=unrelated'), ['Unrelated'])
+
+        self.app.put(f'/edit_post/{post_id}', headers=self.headers, json={'title': 'Caching tricks'})
+        self.assertEqual(self.titles('/search?q=caching'), ['Caching tricks'])
+
+        hits = main.page_cache.stats()['search']['hits']
+        self.app.delete(f'/delete_post/{post_id}', headers=self.headers)
+        self.assertEqual(self.titles('/search?q=caching'), [])
+        self.assertEqual(self.titles('/search?q=unrelated'), ['Unrelated'])
+        self.assertEqual(main.page_cache.stats()['search']['hits'], hits + 1)
+        self.assertIsNotNone(other_id)
+
+    def test_cache_stats_endpoint(self):
+        """Test that the stats endpoint reports counters per namespace to logged-in users."""
+        self.app.get('/get_tags')
+        self.app.get('/get_tags')
+        self.assertEqual(self.app.get('/cache_stats').status_code, 401)
+        data = json.loads(self.app.get('/cache_stats', headers=self.headers).data)
+        self.assertGreaterEqual(data['tags']['hits'], 1)
+        self.assertGreaterEqual(data['tags']['misses'], 1)
+
+if __name__ == "__main__":
+    unittest.main()
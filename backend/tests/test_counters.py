@@ -0,0 +1,94 @@
+import unittest
+import json
+from config import app, db
+from models import Post, User, Comment, Tag
+from flask_jwt_extended import create_access_token
+import main
+
+
+class CountersTestCase(unittest.TestCase):
+    def setUp(self):
+        """Set up test variables and initialize app."""
+        main.cache.init_app(app, config={'CACHE_TYPE': 'flask_caching.backends.SimpleCache'})
+        self.app = app.test_client()
+        self.app_context = app.app_context()
+        self.app_context.push()
+        db.create_all()
+        main.page_cache.clear()
+
+        self.user = User(username='testuser', email='test@example.com', first_name='Test')
+        self.user.set_password('testpassword')
+        db.session.add(self.user)
+        db.session.commit()
+        self.headers = {'Authorization': f'Bearer {create_access_token(identity=self.user.id)}'}
+
+        response = self.app.post('/create_post', headers=self.headers, json={
+            'title': 'Test Post', 'body': 'This is a test post.', 'tags': ['python', 'flask']
+        })
+        self.assertEqual(response.status_code, 201)
+        self.post_id = Post.query.filter_by(title='Test Post').first().id
+
+    def tearDown(self):
+        """Clean up after each test."""
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def test_like_and_bookmark_counters(self):
+        """Test that toggling likes and bookmarks adjusts the post counters."""
+        data = json.loads(self.app.post(f'/like_post/{self.post_id}', headers=self.headers).data)
+        self.assertEqual(data['likes'], 1)
+        data = json.loads(self.app.post(f'/bookmark_post/{self.post_id}', headers=self.headers).data)
+        self.assertEqual(data['bookmarks'], 1)
+
+        data = json.loads(self.app.post(f'/like_post/{self.post_id}', headers=self.headers).data)
+        self.assertFalse(data['isLiked'])
+        self.assertEqual(data['likes'], 0)
+        self.assertEqual(db.session.get(Post, self.post_id).like_count, 0)
+
+    def test_comment_counters(self):
+        """Test that adding, liking and deleting comments adjusts the counters."""
+        comment_id = json.loads(self.app.post(f'/add_comment/{self.post_id}', headers=self.headers,
+                                              json={'content': 'A comment'}).data)['id']
+        self.assertEqual(db.session.get(Post, self.post_id).comment_count, 1)
+
+        data = json.loads(self.app.post(f'/like_comment/{comment_id}', headers=self.headers).data)
+        self.assertEqual(data['likes'], 1)
+        self.assertEqual(db.session.get(Comment, comment_id).like_count, 1)
+
+        self.app.delete(f'/delete_comment/{comment_id}', headers=self.headers)
+        db.session.expire_all()
+        self.assertEqual(db.session.get(Post, self.post_id).comment_count, 0)
+
+    def test_tag_counters(self):
+        """Test that tag usage counts follow post creation and deletion."""
+        self.app.post('/create_post', headers=self.headers, json={
+            'title': 'Second Post', 'body': 'Another post.', 'tags': ['python']
+        })
+        tags = {tag['name']: tag['count'] for tag in json.loads(self.app.get('/get_tags').data)}
+        self.assertEqual(tags, {'python': 2, 'flask': 1})
+
+        self.app.delete(f'/delete_post/{self.post_id}', headers=self.headers)
+        db.session.expire_all()
+        self.assertEqual(Tag.query.filter_by(name='python').first().post_count, 1)
+        self.assertEqual(Tag.query.filter_by(name='flask').first().post_count, 0)
+
+    def test_recount_command(self):
+        """Test that the recount command repairs drifted counters."""
+        post = db.session.get(Post, self.post_id)
+        post.liked_by.append(self.user)
+        post.like_count = 42
+        post.comment_count = 7
+        db.session.commit()
+
+        result = app.test_cli_runner().invoke(args=['recount'])
+        self.assertIn('Counters rebuilt', result.output)
+
+        db.session.expire_all()
+        post = db.session.get(Post, self.post_id)
+        self.assertEqual(post.like_count, 1)
+        self.assertEqual(post.comment_count, 0)
+        self.assertEqual(Tag.query.filter_by(name='python').first().post_count, 1)
+
+if __name__ == "__main__":
+    unittest.main()
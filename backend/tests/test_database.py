@@ -0,0 +1,60 @@
+import unittest
+import os
+import shutil
+import tempfile
+from sqlalchemy import create_engine, text
+from config import app, db
+from database import engine_options, configure_engine
+
+
+class EngineProfileTestCase(unittest.TestCase):
+    def setUp(self):
+        """Set up test variables and initialize app."""
+        self.app_context = app.app_context()
+        self.app_context.push()
+        self.config = dict(app.config)
+
+    def tearDown(self):
+        """Clean up after each test."""
+        self.app_context.pop()
+
+    def pragma(self, connection, name):
+        """Helper method to read a pragma's value."""
+        return connection.execute(text(f"PRAGMA {name}")).scalar()
+
+    def test_app_connections_use_wal(self):
+        """Test that the app's SQLite connections get the configured pragmas."""
+        with db.engine.connect() as connection:
+            self.assertEqual(self.pragma(connection, 'journal_mode'), 'wal')
+            self.assertEqual(self.pragma(connection, 'synchronous'), 1)  # NORMAL
+            self.assertEqual(self.pragma(connection, 'busy_timeout'), app.config['SQLITE_BUSY_TIMEOUT'])
+            self.assertEqual(self.pragma(connection, 'cache_size'), app.config['SQLITE_CACHE_SIZE'])
+
+    def test_pragmas_follow_the_config(self):
+        """Test that every new connection of an engine gets the pragmas."""
+        workdir = tempfile.mkdtemp()
+        try:
+            config = {**self.config, 'SQLITE_JOURNAL_MODE': 'delete', 'SQLITE_SYNCHRONOUS': 'full',
+                      'SQLITE_BUSY_TIMEOUT': 1234}
+            engine = create_engine(f"sqlite:///{os.path.join(workdir, 'profile.db')}")
+            configure_engine(engine, config)
+            for _ in range(2):
+                with engine.connect() as connection:
+                    self.assertEqual(self.pragma(connection, 'journal_mode'), 'delete')
+                    self.assertEqual(self.pragma(connection, 'synchronous'), 2)  # FULL
+                    self.assertEqual(self.pragma(connection, 'busy_timeout'), 1234)
+                engine.dispose()
+        finally:
+            shutil.rmtree(workdir)
+
+    def test_server_databases_get_a_pool(self):
+        """Test that pool settings are only used for server databases."""
+        config = {**self.config, 'SQLALCHEMY_DATABASE_URI': 'postgresql+psycopg://devhub@db/devhub',
+                  'DB_POOL_SIZE': 7, 'DB_POOL_PRE_PING': True}
+        options = engine_options(config)
+        self.assertEqual(options['pool_size'], 7)
+        self.assertTrue(options['pool_pre_ping'])
+        self.assertEqual(engine_options({**config, 'SQLALCHEMY_DATABASE_URI': 'sqlite:///devhub.db'}), {})
+
+if __name__ == "__main__":
+    unittest.main()
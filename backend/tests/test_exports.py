@@ -0,0 +1,112 @@
+import unittest
+import json
+from sqlalchemy import event
+from config import app, db
+from models import User
+from flask_jwt_extended import create_access_token
+from activity import MemoryActivityStore
+from trending import MemoryTrendingStore
+import main
+
+
+class PostExportTestCase(unittest.TestCase):
+    def setUp(self):
+        """Set up test variables and initialize app."""
+        main.cache.init_app(app, config={'CACHE_TYPE': 'flask_caching.backends.SimpleCache'})
+        main.trending_index.store = MemoryTrendingStore()
+        main.activity_stream.store = MemoryActivityStore(main.activity_stream.length)
+        self.app = app.test_client()
+        self.app_context = app.app_context()
+        self.app_context.push()
+        db.create_all()
+        main.page_cache.clear()
+        self.batch_size = app.config['EXPORT_BATCH_SIZE']
+        app.config['EXPORT_BATCH_SIZE'] = 2
+
+        user = User(username='testuser', email='test@example.com', first_name='Test')
+        db.session.add(user)
+        db.session.commit()
+        self.headers = {'Authorization': f'Bearer {create_access_token(identity=user.id)}'}
+        for index in range(1, 6):
+            self.app.post('/create_post', headers=self.headers,
+                          json={'title': f'Post {index}', 'body': '<p>Body</p>', 'tags': ['python', f'tag{index}']})
+
+    def tearDown(self):
+        """Clean up after each test."""
+        app.config['EXPORT_BATCH_SIZE'] = self.batch_size
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def export(self, query=''):
+        """Helper method to read an export as a list of records."""
+        response = self.app.get(f'/export/posts{query}', headers=self.headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.mimetype, 'application/x-ndjson')
+        return [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+
+    def post_ids(self, records):
+        """Helper method to list the IDs of the post records in an export."""
+        return [record['id'] for record in records if record['type'] == 'post']
+
+    def test_export_streams_batches(self):
+        """Test that posts stream in batches, each followed by a checkpoint."""
+        records = self.export('?include=tags,counters')
+        self.assertEqual([record['type'] for record in records],
+                         ['post', 'post', 'checkpoint', 'post', 'post', 'checkpoint', 'post', 'checkpoint', 'end'])
+        self.assertEqual(self.post_ids(records), [1, 2, 3, 4, 5])
+        self.assertEqual(records[0]['tags'], ['python', 'tag1'])
+        self.assertEqual(records[0]['like_count'], 0)
+        self.assertEqual(records[-1]['exported'], 5)
+
+        plain = self.export()
+        self.assertNotIn('tags', plain[0])
+        self.assertNotIn('like_count', plain[0])
+
+    def test_statements_per_batch(self):
+        """Test that tags are read with one query per batch, not per post."""
+        statements = []
+
+        def record(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        event.listen(db.engine, "before_cursor_execute", record)
+        try:
+            self.export('?include=tags')
+        finally:
+            event.remove(db.engine, "before_cursor_execute", record)
+        self.assertEqual(len([statement for statement in statements if 'FROM post_tags' in statement]), 3)
+        self.assertEqual(len([statement for statement in statements if 'FROM post ' in statement]), 1)
+
+    def test_resume_from_checkpoint(self):
+        """Test that a checkpoint's resume token continues after its batch."""
+        checkpoint = self.export()[2]
+        records = self.export(f'?resume={checkpoint["resume_token"]}')
+        self.assertEqual(self.post_ids(records), [3, 4, 5])
+        self.assertEqual(records[-1]['exported'], 3)
+
+    def test_incremental_sync(self):
+        """Test that the end token of one export picks up posts edited afterwards."""
+        end = self.export()[-1]
+        self.app.put('/edit_post/1', headers=self.headers, json={'title': 'Edited'})
+
+        records = self.export(f'?resume={end["resume_token"]}')
+        titles = {record['id']: record['title'] for record in records if record['type'] == 'post'}
+        self.assertEqual(titles[1], 'Edited')
+
+    def test_since(self):
+        """Test that since limits the export to posts updated at or after it."""
+        self.assertEqual(self.post_ids(self.export('?since=2000-01-01T00:00:00Z')), [1, 2, 3, 4, 5])
+        records = self.export('?since=2999-01-01T00:00:00')
+        self.assertEqual(records, [{'type': 'end', 'resume_token': records[0]['resume_token'], 'exported': 0}])
+        self.assertIsNotNone(records[0]['resume_token'])
+
+    def test_invalid_requests(self):
+        """Test that exports need a login and valid parameters."""
+        self.assertEqual(self.app.get('/export/posts').status_code, 401)
+        for query in ('?since=yesterday', '?resume=not-a-token', '?include=comments'):
+            response = self.app.get(f'/export/posts{query}', headers=self.headers)
+            self.assertEqual(response.status_code, 400, query)
+
+if __name__ == "__main__":
+    unittest.main()
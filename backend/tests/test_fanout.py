@@ -0,0 +1,135 @@
+import unittest
+import threading
+from unittest import mock
+from flask import g
+from sqlalchemy import create_engine
+from config import app, db
+from database import configure_engine
+from models import User
+from flask_jwt_extended import create_access_token, get_jwt_identity, verify_jwt_in_request
+from activity import MemoryActivityStore
+from trending import MemoryTrendingStore
+from metrics import request_metrics
+from fanout import FanOut
+import loaders
+import main
+
+
+class FanOutTestCase(unittest.TestCase):
+    def setUp(self):
+        """Set up test variables and initialize app."""
+        main.cache.init_app(app, config={'CACHE_TYPE': 'flask_caching.backends.SimpleCache'})
+        main.trending_index.store = MemoryTrendingStore()
+        main.activity_stream.store = MemoryActivityStore(main.activity_stream.length)
+        self.app = app.test_client()
+        self.app_context = app.app_context()
+        self.app_context.push()
+        db.create_all()
+        main.page_cache.clear()
+        self.fan_out = FanOut(2)
+
+        user = User(username='testuser', email='test@example.com', first_name='Test')
+        db.session.add(user)
+        db.session.commit()
+        self.token = create_access_token(identity=user.id)
+        self.headers = {'Authorization': f'Bearer {self.token}'}
+        self.app.post('/create_post', headers=self.headers,
+                      json={'title': 'Fan out', 'body': '<p>Concurrent queries</p>', 'tags': ['python']})
+        self.app.post('/add_comment/1', headers=self.headers, json={'content': 'First'})
+        self.app.post('/like_comment/1', headers=self.headers)
+
+    def tearDown(self):
+        """Clean up after each test."""
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def test_calls_run_concurrently(self):
+        """Test that calls overlap and their results come back in order."""
+        barrier = threading.Barrier(3, timeout=5)
+
+        def call(value):
+            barrier.wait()
+            return value
+
+        self.assertEqual(self.fan_out.run(lambda: call(1), lambda: call(2), lambda: call(3)), [1, 2, 3])
+
+    def test_pooled_calls_get_own_session(self):
+        """Test that pooled calls see the caller's request and g but not its session."""
+        with app.test_request_context('/', headers=self.headers):
+            verify_jwt_in_request()
+            g.marker = 'caller'
+            results = self.fan_out.run(
+                lambda: (db.session(), g.marker, get_jwt_identity()),
+                lambda: (db.session(), g.marker, get_jwt_identity())
+            )
+        (caller_session, *caller_state), (pooled_session, *pooled_state) = results
+        self.assertIsNot(caller_session, pooled_session)
+        self.assertEqual(pooled_state, caller_state)
+
+    def test_errors_and_nesting(self):
+        """Test that a failing call raises in the caller and nested fan-outs run inline."""
+        def fail():
+            raise ValueError('boom')
+
+        with self.assertRaises(ValueError):
+            self.fan_out.run(lambda: 1, fail)
+
+        threads = self.fan_out.run(
+            lambda: threading.current_thread().name,
+            lambda: self.fan_out.run(lambda: threading.current_thread().name,
+                                     lambda: threading.current_thread().name)
+        )
+        self.assertTrue(threads[1][0].startswith('fan-out'))
+        self.assertEqual(threads[1][0], threads[1][1])
+        self.assertEqual(FanOut(0).run(lambda: 1, lambda: 2), [1, 2])
+
+    def test_get_post_matches_sequential(self):
+        """Test that get_post answers the same with fan-out and its pooled queries are measured."""
+        responses = []
+        for workers in (0, 2):
+            with mock.patch.object(loaders, 'fan_out', FanOut(workers)), \
+                    mock.patch.object(request_metrics, 'slow_threshold', 0), \
+                    self.assertLogs('metrics', 'WARNING') as logs:
+                responses.append(self.app.get('/get_post/1', headers=self.headers).get_json())
+        self.assertEqual(responses[0], responses[1])
+        self.assertTrue(responses[1]['comments'][0]['isLiked'])
+        # The comments and the viewer's likes were loaded on pool threads
+        self.assertIn('FROM comment_likes', logs.output[0])
+        self.assertIn('FROM post_likes', logs.output[0])
+
+    def test_nearly_exhausted_pool(self):
+        """Test that get_post answers with one pooled connection left for the request and its calls."""
+        db.session.commit()
+        engine = create_engine(db.engine.url, pool_size=1, max_overflow=1, pool_timeout=2)
+        configure_engine(engine, app.config)
+        held = engine.connect()
+        try:
+            with mock.patch.dict(db.engines, {None: engine}), mock.patch.object(loaders, 'fan_out', FanOut(2)):
+                response = self.app.get('/get_post/1', headers=self.headers)
+        finally:
+            held.close()
+            engine.dispose()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.get_json()['comments'][0]['content'], 'First')
+
+    def test_unsaved_changes(self):
+        """Test that fanning out with unsaved session changes raises rather than dropping them."""
+        with app.test_request_context('/'):
+            db.session.add(User(username='pending', email='pending@example.com', first_name='Pending'))
+            with self.assertRaises(RuntimeError):
+                self.fan_out.run(lambda: 1, lambda: 2)
+            db.session.rollback()
+
+    def test_search_results(self):
+        """Test that /search combines the concurrently searched posts and users."""
+        data = self.app.get('/search?q=test').get_json()
+        self.assertEqual([user['username'] for user in data['results']['users']], ['testuser'])
+        self.assertEqual(data['total_users'], 1)
+
+        data = self.app.get('/search?q=concurrent').get_json()
+        self.assertEqual([post['id'] for post in data['results']['posts']], [1])
+        self.assertEqual((data['total_posts'], data['posts_pages']), (1, 1))
+
+if __name__ == "__main__":
+    unittest.main()
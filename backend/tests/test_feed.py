@@ -0,0 +1,143 @@
+import unittest
+import json
+from config import app, db
+from models import Tag, User, feed_entries
+from flask_jwt_extended import create_access_token
+from activity import MemoryActivityStore
+from trending import MemoryTrendingStore
+import main
+
+
+class HomeFeedTestCase(unittest.TestCase):
+    def setUp(self):
+        """Set up test variables and initialize app."""
+        main.cache.init_app(app, config={'CACHE_TYPE': 'flask_caching.backends.SimpleCache'})
+        main.trending_index.store = MemoryTrendingStore()
+        main.activity_stream.store = MemoryActivityStore(main.activity_stream.length)
+        self.fanout_limit = app.config['FEED_FANOUT_LIMIT']
+        self.app = app.test_client()
+        self.app_context = app.app_context()
+        self.app_context.push()
+        db.create_all()
+        main.page_cache.clear()
+
+        self.users = [User(username=f'user{index}', email=f'user{index}@example.com', first_name=f'User{index}')
+                      for index in range(3)]
+        db.session.add_all(self.users)
+        db.session.commit()
+        self.headers = [{'Authorization': f'Bearer {create_access_token(identity=user.id)}'}
+                        for user in self.users]
+
+    def tearDown(self):
+        """Clean up after each test."""
+        app.config['FEED_FANOUT_LIMIT'] = self.fanout_limit
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def create_post(self, title, tags):
+        """Helper method to create a post through the API as the first user."""
+        self.app.post('/create_post', headers=self.headers[0],
+                      json={'title': title, 'body': f'<p>{title}</p>', 'tags': list(tags)})
+
+    def follow(self, user, tag):
+        """Helper method to toggle a tag follow."""
+        return json.loads(self.app.post(f'/follow_tag/{tag}', headers=self.headers[user]).data)
+
+    def feed(self, user, cursor=None):
+        """Helper method to fetch a page of a feed as (titles, next cursor)."""
+        url = f'/feed?cursor={cursor}' if cursor else '/feed'
+        data = json.loads(self.app.get(url, headers=self.headers[user]).data)
+        return [post['title'] for post in data['posts']], data['next_cursor']
+
+    def timeline_size(self, user):
+        """Helper method to count a user's timeline entries."""
+        return db.session.execute(db.select(db.func.count()).select_from(feed_entries)
+                                  .where(feed_entries.c.user_id == self.users[user].id)).scalar()
+
+    def test_feed_lists_followed_tags(self):
+        """Test that following backfills the feed and new posts are fanned out."""
+        self.create_post('Old python', ['python'])
+        self.create_post('Rust post', ['rust'])
+        state = self.follow(1, 'Python')
+        self.assertEqual((state['isFollowing'], state['followers']), (True, 1))
+        self.create_post('New python', ['python', 'web'])
+
+        self.assertEqual(self.feed(1), (['New python', 'Old python'], None))
+        self.assertEqual(self.feed(2), ([], None))
+        self.assertEqual(json.loads(self.app.get('/followed_tags', headers=self.headers[1]).data),
+                         [{'name': 'python', 'count': 2}])
+        self.assertEqual(self.app.post('/follow_tag/missing', headers=self.headers[1]).status_code, 404)
+
+    def test_feed_pages_with_cursor(self):
+        """Test that feed pages follow each other without gaps or repeats."""
+        self.create_post('Seed', ['python'])
+        self.follow(1, 'python')
+        for index in range(12):
+            self.create_post(f'Post {index}', ['python'])
+
+        first, cursor = self.feed(1)
+        second, last_cursor = self.feed(1, cursor)
+        self.assertEqual(first, [f'Post {index}' for index in range(11, 1, -1)])
+        self.assertEqual(second, ['Post 1', 'Post 0', 'Seed'])
+        self.assertIsNone(last_cursor)
+        self.assertEqual(self.app.get('/feed?cursor=abc', headers=self.headers[1]).status_code, 400)
+
+    def test_unfollow_keeps_posts_of_other_followed_tags(self):
+        """Test that unfollowing removes only posts no followed tag has."""
+        self.create_post('Python only', ['python'])
+        self.create_post('Python and web', ['python', 'web'])
+        self.follow(1, 'python')
+        self.follow(1, 'web')
+
+        state = self.follow(1, 'python')
+        self.assertEqual((state['isFollowing'], state['followers']), (False, 0))
+        self.assertEqual(self.feed(1), (['Python and web'], None))
+
+    def test_popular_tags_are_merged_at_read_time(self):
+        """Test that posts of tags past the fan-out limit are read from the tag."""
+        app.config['FEED_FANOUT_LIMIT'] = 1
+        self.create_post('Before', ['python'])
+        self.follow(1, 'python')
+        self.follow(2, 'python')
+        self.follow(2, 'web')
+        self.assertTrue(Tag.query.filter_by(name_key='python').first().fan_in)
+        # The second follower was not backfilled, the first keeps their timeline
+        self.assertEqual((self.timeline_size(1), self.timeline_size(2)), (1, 0))
+
+        self.create_post('Popular', ['python'])
+        self.create_post('Both', ['python', 'web'])
+        self.assertEqual(self.timeline_size(1), 1)
+        self.assertEqual(self.feed(1), (['Both', 'Popular', 'Before'], None))
+        self.assertEqual(self.feed(2), (['Both', 'Popular', 'Before'], None))
+
+    def test_deleted_posts_leave_timelines(self):
+        """Test that a deleted post is removed from every timeline."""
+        self.create_post('Doomed', ['python'])
+        self.follow(1, 'python')
+        post_id = db.session.execute(db.text('SELECT max(id) FROM post')).scalar()
+        self.app.delete(f'/delete_post/{post_id}', headers=self.headers[0])
+        self.assertEqual(self.timeline_size(1), 0)
+        self.assertEqual(self.feed(1), ([], None))
+
+    def test_rebuild_command(self):
+        """Test that timelines and fan-in marks are rebuilt from the follows."""
+        self.create_post('First', ['python'])
+        self.follow(1, 'python')
+        self.follow(2, 'python')
+        db.session.execute(feed_entries.delete())
+        db.session.commit()
+
+        app.config['FEED_FANOUT_LIMIT'] = 1
+        result = app.test_cli_runner().invoke(args=['feed-rebuild'])
+        self.assertIn('Wrote 0 timeline entries', result.output)
+        self.assertEqual(self.feed(1), (['First'], None))
+
+        app.config['FEED_FANOUT_LIMIT'] = 10
+        result = app.test_cli_runner().invoke(args=['feed-rebuild'])
+        self.assertIn('Wrote 2 timeline entries', result.output)
+        db.session.expire_all()
+        self.assertFalse(Tag.query.filter_by(name_key='python').first().fan_in)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,86 @@
+import unittest
+import re
+from config import app, db
+from models import User
+from flask_jwt_extended import create_access_token
+from activity import MemoryActivityStore
+from trending import MemoryTrendingStore
+from metrics import request_metrics, Histogram
+import main
+
+
+class RequestMetricsTestCase(unittest.TestCase):
+    def setUp(self):
+        """Set up test variables and initialize app."""
+        main.cache.init_app(app, config={'CACHE_TYPE': 'flask_caching.backends.SimpleCache'})
+        main.trending_index.store = MemoryTrendingStore()
+        main.activity_stream.store = MemoryActivityStore(main.activity_stream.length)
+        self.app = app.test_client()
+        self.app_context = app.app_context()
+        self.app_context.push()
+        db.create_all()
+        main.page_cache.clear()
+
+        user = User(username='testuser', email='test@example.com', first_name='Test')
+        db.session.add(user)
+        db.session.commit()
+        self.headers = {'Authorization': f'Bearer {create_access_token(identity=user.id)}'}
+        self.app.post('/create_post', headers=self.headers,
+                      json={'title': 'Metrics', 'body': '<p>Body</p>', 'tags': ['python']})
+        request_metrics.reset()
+
+    def tearDown(self):
+        """Clean up after each test."""
+        request_metrics.slow_threshold = app.config['SLOW_REQUEST_MS'] / 1000
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def sample(self, text, line):
+        """Helper method to read the value of one sample from the metrics text."""
+        match = re.search(rf'^{re.escape(line)} (\S+)$', text, re.MULTILINE)
+        self.assertIsNotNone(match, line)
+        return float(match.group(1))
+
+    def test_metrics_per_endpoint(self):
+        """Test that requests are counted with their statements, cache lookups and sizes."""
+        self.app.get('/get_posts')
+        self.app.get('/get_posts')
+        self.app.get('/get_post/1')
+        self.assertEqual(self.app.get('/metrics').status_code, 401)
+        response = self.app.get('/metrics', headers=self.headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.content_type.startswith('text/plain; version=0.0.4'))
+        text = response.get_data(as_text=True)
+
+        labels = 'endpoint="get_posts",method="GET"'
+        self.assertEqual(self.sample(text, f'devhub_requests_total{{{labels},status="200"}}'), 2)
+        self.assertEqual(self.sample(text, f'devhub_request_duration_seconds_count{{{labels}}}'), 2)
+        self.assertEqual(self.sample(text, f'devhub_request_duration_seconds_bucket{{{labels},le="+Inf"}}'), 2)
+        self.assertEqual(self.sample(
+            text, 'devhub_cache_lookups_total{endpoint="get_posts",namespace="posts",result="miss"}'), 1)
+        self.assertEqual(self.sample(
+            text, 'devhub_cache_lookups_total{endpoint="get_posts",namespace="posts",result="hit"}'), 1)
+        # The cached response ran no statements
+        self.assertEqual(self.sample(text, f'devhub_request_sql_statements_bucket{{{labels},le="0"}}'), 1)
+        self.assertGreater(self.sample(text, 'devhub_request_sql_statements_sum{endpoint="get_post",method="GET"}'), 0)
+        self.assertGreater(self.sample(text, f'devhub_response_size_bytes_sum{{{labels}}}'), 0)
+
+    def test_slow_requests_are_logged(self):
+        """Test that requests over the threshold are logged with their statements."""
+        request_metrics.slow_threshold = 0
+        with self.assertLogs('metrics', 'WARNING') as logs:
+            self.app.get('/get_post/1')
+        self.assertIn('Slow request GET /get_post/1 (get_post) answered 200', logs.output[0])
+        self.assertIn('FROM post', logs.output[0])
+
+    def test_histogram_buckets(self):
+        """Test that bucket counts are cumulative and end with +Inf."""
+        histogram = Histogram((1, 5))
+        for value in (0, 1, 3, 9):
+            histogram.observe(value)
+        self.assertEqual(histogram.cumulative(), [(1, 2), (5, 3), (float('inf'), 4)])
+        self.assertEqual((histogram.sum, histogram.count), (13, 4))
+
+if __name__ == "__main__":
+    unittest.main()
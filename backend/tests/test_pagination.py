@@ -0,0 +1,136 @@
+import unittest
+import base64
+import json
+from datetime import datetime, timedelta
+from sqlalchemy.dialects import postgresql
+from config import app, db
+from models import Post, User, Tag
+from flask_jwt_extended import create_access_token
+import main
+from search import rebuild_search_index
+from pagination import after_position
+from activity import MemoryActivityStore
+from trending import MemoryTrendingStore
+
+
+class KeysetPaginationTestCase(unittest.TestCase):
+    def setUp(self):
+        """Set up test variables and initialize app."""
+        main.cache.init_app(app, config={'CACHE_TYPE': 'flask_caching.backends.SimpleCache'})
+        self.app = app.test_client()
+        self.app_context = app.app_context()
+        self.app_context.push()
+        db.create_all()
+        main.page_cache.clear()
+
+        user = User(username='testuser', email='test@example.com', first_name='Test')
+        db.session.add(user)
+        tag = Tag(name='python')
+        # Pairs of posts share a creation time so ties are broken by ID
+        start = datetime(2024, 1, 1)
+        for i in range(25):
+            post = Post(host=user, title=f'Paged post {i}', body='<p>paged body</p>',
+                        created=start + timedelta(minutes=i // 2))
+            if i % 2 == 0:
+                post.tags.append(tag)
+            post.bookmarked_by.append(user)
+            db.session.add(post)
+        db.session.commit()
+        rebuild_search_index()
+        self.headers = {'Authorization': f'Bearer {create_access_token(identity=user.id)}'}
+
+    def tearDown(self):
+        """Clean up after each test."""
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def walk(self, url, key=None, **kwargs):
+        """Helper method to follow next_cursor until the last page."""
+        ids, cursor, pages = [], '', 0
+        while cursor is not None:
+            data = json.loads(self.app.get(url, query_string={**kwargs, 'cursor': cursor},
+                                           headers=self.headers).data)
+            posts = data['results']['posts'] if key == 'results' else data['posts']
+            ids.extend(post['id'] for post in posts)
+            cursor = data['next_cursor']
+            pages += 1
+            self.assertLess(pages, 50, 'cursor does not advance')
+        return ids, pages
+
+    def test_cursor_pages_match_page_numbers(self):
+        """Test that walking cursors yields the same order as page numbers."""
+        page_ids = []
+        for page in range(1, 4):
+            data = json.loads(self.app.get(f'/get_posts?page={page}').data)
+            page_ids.extend(post['id'] for post in data['posts'])
+
+        cursor_ids, pages = self.walk('/get_posts')
+        self.assertEqual(cursor_ids, page_ids)
+        self.assertEqual(len(cursor_ids), 25)
+        self.assertEqual(pages, 3)
+
+    def test_cursor_mode_with_tag_filter(self):
+        """Test that cursor mode applies the tag filter."""
+        ids, _ = self.walk('/get_posts', tag='python')
+        self.assertEqual(len(ids), 13)
+
+    def test_total_only_when_requested(self):
+        """Test that the total count is opt-in in cursor mode."""
+        data = json.loads(self.app.get('/get_posts?cursor=').data)
+        self.assertNotIn('total', data)
+        data = json.loads(self.app.get('/get_posts?cursor=&with_total=1').data)
+        self.assertEqual(data['total'], 25)
+
+    def test_search_and_bookmarks_cursor_mode(self):
+        """Test cursor mode on the search and bookmarks endpoints."""
+        ids, _ = self.walk('/search', key='results', q='paged', per_page=10)
+        self.assertEqual(len(ids), 25)
+        self.assertEqual(len(set(ids)), 25)
+
+        ids, pages = self.walk('/bookmarks', per_page=20)
+        self.assertEqual(len(ids), 25)
+        self.assertEqual(pages, 2)
+
+        # Without a cursor the bookmarks endpoint keeps returning a plain list
+        data = json.loads(self.app.get('/bookmarks', headers=self.headers).data)
+        self.assertEqual(len(data), 25)
+
+    def test_posts_created_in_the_same_second(self):
+        """Test that cursors walk posts whose creation time the database filled in."""
+        main.trending_index.store = MemoryTrendingStore()
+        main.activity_stream.store = MemoryActivityStore(main.activity_stream.length)
+        Post.query.delete()
+        db.session.commit()
+        main.page_cache.clear()
+        for i in range(25):
+            self.app.post('/create_post', headers=self.headers,
+                          json={'title': f'Created post {i}', 'body': '<p>body</p>', 'tags': []})
+
+        ids, pages = self.walk('/get_posts')
+        self.assertEqual(len(ids), 25)
+        self.assertEqual(ids, sorted(ids, reverse=True))
+        self.assertEqual(pages, 3)
+
+        # Cursors carrying the stored text rather than ISO 8601 still work
+        post = Post.query.order_by(Post.id.desc()).offset(9).first()
+        raw = f"{post.created.isoformat(' ')}|{post.id}".encode()
+        legacy = base64.urlsafe_b64encode(raw).decode().rstrip('=')
+        data = json.loads(self.app.get(f'/get_posts?cursor={legacy}').data)
+        self.assertEqual(data['posts'][0]['id'], post.id - 1)
+
+    def test_position_compiles_for_postgresql(self):
+        """Test that positions compare as timestamps, not text, on PostgreSQL."""
+        for timestamp in (datetime(2024, 1, 1), datetime(2024, 1, 1, 0, 0, 0, 5)):
+            condition = after_position(Post.created, Post.id, (timestamp, 1), descending=True)
+            compiled = condition.compile(dialect=postgresql.dialect())
+            self.assertNotIn('VARCHAR', str(compiled))
+            self.assertTrue(all(value == timestamp for key, value in compiled.params.items() if key != 'id_1'))
+
+    def test_invalid_cursor(self):
+        """Test that a malformed cursor is rejected."""
+        response = self.app.get('/get_posts?cursor=not-a-cursor')
+        self.assertEqual(response.status_code, 400)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,80 @@
+import unittest
+import threading
+from werkzeug.security import generate_password_hash
+from config import app, db
+from models import User
+import main
+import passwords
+from passwords import HashingPool, PasswordHashingBusy
+
+
+class PasswordHashingTestCase(unittest.TestCase):
+    def setUp(self):
+        """Set up test variables and initialize app."""
+        main.cache.init_app(app, config={'CACHE_TYPE': 'flask_caching.backends.SimpleCache'})
+        self.method = app.config['PASSWORD_HASH_METHOD']
+        app.config['PASSWORD_HASH_METHOD'] = 'pbkdf2:sha256:1000'
+        self.app = app.test_client()
+        self.app_context = app.app_context()
+        self.app_context.push()
+        db.create_all()
+
+        user = User(username='testuser', email='test@example.com', first_name='Test',
+                    password_hash=generate_password_hash('password123', 'pbkdf2:sha256:2000'))
+        db.session.add(user)
+        db.session.commit()
+
+    def tearDown(self):
+        """Clean up after each test."""
+        app.config['PASSWORD_HASH_METHOD'] = self.method
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def login(self, password='password123'):
+        """Helper method to log in as the test user."""
+        return self.app.post('/login', json={'username': 'testuser', 'password': password})
+
+    def stored_hash(self):
+        """Helper method to read the test user's stored hash."""
+        db.session.expire_all()
+        return User.query.filter_by(username='testuser').first().password_hash
+
+    def test_login_upgrades_old_hashes(self):
+        """Test that a successful login rehashes with the configured method."""
+        self.assertEqual(self.login('wrong').status_code, 401)
+        self.assertTrue(self.stored_hash().startswith('pbkdf2:sha256:2000$'))
+
+        self.assertEqual(self.login().status_code, 200)
+        self.assertTrue(self.stored_hash().startswith('pbkdf2:sha256:1000$'))
+        self.assertEqual(self.login().status_code, 200)
+
+    def test_full_queue_returns_503(self):
+        """Test that logins are rejected while the hashing pool is saturated."""
+        release = threading.Event()
+        busy_pool = HashingPool(workers=1, queue_size=0, timeout=5)
+        original_pool, passwords.pool = passwords.pool, busy_pool
+        try:
+            blocker = threading.Thread(target=busy_pool.run, args=(release.wait,))
+            blocker.start()
+            response = self.login()
+            self.assertEqual(response.status_code, 503)
+            self.assertEqual(response.headers['Retry-After'], '1')
+
+            release.set()
+            blocker.join()
+            self.assertEqual(self.login().status_code, 200)
+        finally:
+            passwords.pool = original_pool
+
+    def test_slow_hash_times_out(self):
+        """Test that a caller stops waiting after the pool timeout."""
+        release = threading.Event()
+        pool = HashingPool(workers=1, queue_size=1, timeout=0.05)
+        with self.assertRaises(PasswordHashingBusy):
+            pool.run(release.wait)
+        release.set()
+        self.assertEqual(pool.run(len, 'abc'), 3)
+
+if __name__ == "__main__":
+    unittest.main()
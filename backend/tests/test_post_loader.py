@@ -0,0 +1,149 @@
+import unittest
+import json
+from sqlalchemy import event
+from config import app, db
+from models import Post, User, Comment, Tag
+from flask_jwt_extended import create_access_token
+import main
+from counters import recount_all
+from search import rebuild_search_index
+
+
+class PostLoaderTestCase(unittest.TestCase):
+    def setUp(self):
+        """Set up test variables and initialize app."""
+        main.cache.init_app(app, config={'CACHE_TYPE': 'flask_caching.backends.SimpleCache'})
+        self.app = app.test_client()
+        self.app_context = app.app_context()
+        self.app_context.push()
+        db.create_all()
+        main.page_cache.clear()
+
+        self.user = User(username='testuser', email='test@example.com', first_name='Test')
+        self.user.set_password('testpassword')
+        db.session.add(self.user)
+        db.session.commit()
+        self.access_token = create_access_token(identity=self.user.id)
+
+        self.post = Post(host_id=self.user.id, title='Test Post', body='This is a test post.')
+        db.session.add(self.post)
+        db.session.commit()
+
+    def tearDown(self):
+        """Clean up after each test."""
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def add_comments(self, count):
+        """Helper method to add comments from distinct authors, each liked by its author."""
+        start = Comment.query.count()
+        for i in range(start, start + count):
+            author = User(username=f'author{i}', email=f'author{i}@example.com', first_name='Author')
+            comment = Comment(user=author, post_id=self.post.id, body=f'Comment {i}')
+            comment.likes.append(author)
+            db.session.add(comment)
+        db.session.commit()
+        recount_all()
+
+    def count_queries(self, url, **kwargs):
+        """Helper method to count the SQL statements issued while serving a request."""
+        statements = []
+
+        def record(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        db.session.remove()
+        event.listen(db.engine, 'before_cursor_execute', record)
+        try:
+            response = self.app.get(url, **kwargs)
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', record)
+        return response, len(statements)
+
+    def test_get_post_query_count_is_constant(self):
+        """Test that get_post does not issue queries per comment."""
+        self.add_comments(1)
+        _, few_queries = self.count_queries(f'/get_post/{self.post.id}')
+
+        self.add_comments(20)
+        response, many_queries = self.count_queries(f'/get_post/{self.post.id}')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(json.loads(response.data)['comments']), 21)
+        self.assertEqual(few_queries, many_queries)
+
+    def test_get_post_viewer_state(self):
+        """Test that like counts and viewer state are reported per comment."""
+        self.add_comments(2)
+        comment = Comment.query.filter_by(body='Comment 1').first()
+        comment.likes.append(self.user)
+        self.post.liked_by.append(self.user)
+        db.session.commit()
+        recount_all()
+
+        response = self.app.get(f'/get_post/{self.post.id}',
+                                headers={'Authorization': f'Bearer {self.access_token}'})
+        data = json.loads(response.data)
+        self.assertEqual(data['likes'], 1)
+        self.assertTrue(data['isLiked'])
+        self.assertEqual([c['likes'] for c in data['comments']], [1, 2])
+        self.assertEqual([c['isLiked'] for c in data['comments']], [False, True])
+        self.assertEqual(data['comments'][0]['author']['name'], 'Author')
+
+    def add_posts(self, count):
+        """Helper method to add tagged posts, each liked and bookmarked by its host."""
+        start = Post.query.count()
+        for i in range(start, start + count):
+            host = User(username=f'host{i}', email=f'host{i}@example.com', first_name='Host')
+            post = Post(host=host, title=f'Listed Post {i}', body='x' * 300,
+                        tags=[Tag(name=f'tag{i}'), Tag(name=f'other{i}')])
+            post.liked_by.append(host)
+            post.bookmarked_by.append(self.user)
+            db.session.add(post)
+        db.session.commit()
+        recount_all()
+        rebuild_search_index()
+
+    def test_listing_query_count_is_constant(self):
+        """Test that get_posts, search and bookmarks do not issue queries per post."""
+        headers = {'Authorization': f'Bearer {self.access_token}'}
+        self.add_posts(1)
+        few = [self.count_queries('/get_posts')[1],
+               self.count_queries('/search?q=Listed')[1],
+               self.count_queries('/bookmarks', headers=headers)[1]]
+
+        main.page_cache.clear()
+        self.add_posts(8)
+        many = [self.count_queries('/get_posts')[1],
+                self.count_queries('/search?q=Listed')[1],
+                self.count_queries('/bookmarks', headers=headers)[1]]
+
+        self.assertEqual(few, many)
+
+    def test_listing_payloads(self):
+        """Test the shared listing serializer output for each endpoint."""
+        self.add_posts(2)
+
+        posts = json.loads(self.app.get('/get_posts').data)['posts']
+        self.assertEqual(posts[0]['host_username'], 'host2')
+        self.assertEqual(posts[0]['likes'], 1)
+        self.assertEqual(sorted(posts[0]['tags']), ['other2', 'tag2'])
+
+        results = json.loads(self.app.get('/search?q=Listed').data)['results']
+        self.assertEqual(len(results['posts']), 2)
+        self.assertEqual(len(results['posts'][0]['body']), 203)
+
+        bookmarks = json.loads(self.app.get('/bookmarks', headers={
+            'Authorization': f'Bearer {self.access_token}'}).data)
+        self.assertEqual(len(bookmarks), 2)
+        self.assertNotIn('body', bookmarks[0])
+        self.assertEqual(bookmarks[1]['host_username'], 'host1')
+
+    def test_get_nonexistent_post(self):
+        """Test retrieving a non-existent post."""
+        response = self.app.get('/get_post/9999')
+        self.assertEqual(response.status_code, 404)
+
+if __name__ == "__main__":
+    unittest.main()
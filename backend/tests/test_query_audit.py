@@ -0,0 +1,63 @@
+import unittest
+from config import app, db
+from models import Comment, User
+from flask_jwt_extended import create_access_token
+from activity import MemoryActivityStore
+from trending import MemoryTrendingStore
+from query_audit import audit
+import main
+
+
+class QueryAuditTestCase(unittest.TestCase):
+    def setUp(self):
+        """Set up test variables and initialize app."""
+        main.cache.init_app(app, config={'CACHE_TYPE': 'flask_caching.backends.SimpleCache'})
+        main.trending_index.store = MemoryTrendingStore()
+        main.activity_stream.store = MemoryActivityStore(main.activity_stream.length)
+        self.app = app.test_client()
+        self.app_context = app.app_context()
+        self.app_context.push()
+        db.create_all()
+        main.page_cache.clear()
+
+        self.user = User(username='testuser', email='test@example.com', first_name='Test')
+        db.session.add(self.user)
+        db.session.commit()
+        headers = {'Authorization': f'Bearer {create_access_token(identity=self.user.id)}'}
+        for index in range(3):
+            self.app.post('/create_post', headers=headers,
+                          json={'title': f'Python post {index}', 'body': '<p>Body</p>', 'tags': ['python']})
+        self.app.post('/follow_tag/python', headers=headers)
+        self.app.post('/add_comment/1', headers=headers, json={'content': 'Hi'})
+        self.app.post('/like_post/1', headers=headers)
+        self.app.post('/bookmark_post/1', headers=headers)
+        self.app.post('/like_comment/1', headers=headers)
+
+    def tearDown(self):
+        """Clean up after each test."""
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def test_read_endpoints_use_indexes(self):
+        """Test that no audited endpoint reads a whole table unexpectedly."""
+        report = audit(self.user)
+        self.assertNotIn(None, [count for _, count, _ in report])
+        scans = [(endpoint, detail) for endpoint, _, problems in report
+                 for kind, _, detail, _ in problems if kind == 'scan']
+        self.assertEqual(scans, [])
+
+    def test_command_reports_scans(self):
+        """Test that the command flags a query that cannot use an index."""
+        index = next(index for index in Comment.__table__.indexes if index.name == 'ix_comment_post_id')
+        index.drop(db.engine)
+        try:
+            result = app.test_cli_runner().invoke(args=['audit-queries'])
+        finally:
+            index.create(db.engine)
+        self.assertEqual(result.exit_code, 1)
+        self.assertIn('FLAG  GET /get_post/{post_id}', result.output)
+        self.assertIn('scan: SCAN comment', result.output)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,164 @@
+import unittest
+import gzip
+import json
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import event
+from config import app, db
+from models import Post, User
+from flask_jwt_extended import create_access_token
+import main
+import responses
+from trending import MemoryTrendingStore
+
+
+class PreparedResponseTestCase(unittest.TestCase):
+    def setUp(self):
+        """Set up test variables and initialize app."""
+        main.cache.init_app(app, config={'CACHE_TYPE': 'flask_caching.backends.SimpleCache'})
+        main.trending_index.store = MemoryTrendingStore()
+        self.app = app.test_client()
+        self.app_context = app.app_context()
+        self.app_context.push()
+        db.create_all()
+        main.page_cache.clear()
+
+        self.user = User(username='testuser', email='test@example.com', first_name='Test')
+        db.session.add(self.user)
+        self.post = Post(host=self.user, title='Post', body='body')
+        db.session.add(self.post)
+        db.session.commit()
+        self.headers = {'Authorization': f'Bearer {create_access_token(identity=self.user.id)}'}
+
+    def tearDown(self):
+        """Clean up after each test."""
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def revalidate(self, url, response, headers=None):
+        """Helper method to repeat a request with the validators of an earlier response."""
+        return self.app.get(url, headers={**(headers or {}), 'If-None-Match': response.headers['ETag']})
+
+    def test_get_post_revalidates_with_a_probe(self):
+        """Test that an unchanged post is answered with 304 after one probe query."""
+        url = f'/get_post/{self.post.id}'
+        first = self.app.get(url, headers=self.headers)
+        self.assertEqual(first.status_code, 200)
+        self.assertTrue(first.headers['ETag'].startswith('W/"'))
+        self.assertIn('Last-Modified', first.headers)
+        self.assertIn('no-cache', first.headers['Cache-Control'])
+
+        statements = []
+        listener = lambda conn, cursor, statement, *args: statements.append(statement)
+        event.listen(db.engine, 'before_cursor_execute', listener)
+        try:
+            second = self.revalidate(url, first, self.headers)
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', listener)
+        self.assertEqual(second.status_code, 304)
+        self.assertEqual(second.data, b'')
+        self.assertEqual(len(statements), 1)
+
+        # The ETag depends on the viewer and on likes and comments
+        self.assertEqual(self.revalidate(url, first).status_code, 200)
+        self.app.post(f'/like_post/{self.post.id}', headers=self.headers)
+        self.assertEqual(self.revalidate(url, first, self.headers).status_code, 200)
+        liked = self.app.get(url, headers=self.headers)
+        self.app.post(f'/add_comment/{self.post.id}', headers=self.headers, json={'content': 'Hi'})
+        self.assertEqual(self.revalidate(url, liked, self.headers).status_code, 200)
+
+    def test_listings_revalidate_from_the_cache(self):
+        """Test that listings answer 304 until a write changes them."""
+        for url in ('/get_posts', '/get_posts?cursor=', '/trending_stories', '/get_tags'):
+            first = self.app.get(url)
+            self.assertEqual(self.revalidate(url, first).status_code, 304, url)
+
+        first = self.app.get('/get_posts')
+        self.app.post('/create_post', headers=self.headers,
+                      json={'title': 'New', 'body': 'body', 'tags': ['python']})
+        self.assertEqual(self.revalidate('/get_posts', first).status_code, 200)
+
+        # Rebuilding an unchanged listing yields the same ETag
+        first = self.app.get('/get_posts')
+        main.page_cache.clear()
+        self.assertEqual(self.revalidate('/get_posts', first).status_code, 304)
+
+    def test_profile_edits_change_validators(self):
+        """Test that renaming the host or a commenter refreshes posts showing their name."""
+        commenter = User(username='commenter', email='commenter@example.com', first_name='Old')
+        db.session.add(commenter)
+        db.session.commit()
+        commenter_headers = {'Authorization': f'Bearer {create_access_token(identity=commenter.id)}'}
+        self.app.post(f'/add_comment/{self.post.id}', headers=commenter_headers, json={'content': 'Hi'})
+
+        url = f'/get_post/{self.post.id}'
+        first = self.app.get(url, headers=self.headers)
+        self.app.put('/edit_profile', headers=commenter_headers, data={'firstName': 'New'})
+        second = self.revalidate(url, first, self.headers)
+        self.assertEqual(second.status_code, 200)
+        self.assertEqual(second.get_json()['comments'][0]['author']['name'], 'New')
+
+        listings = {listing: self.app.get(listing) for listing in ('/get_posts', '/trending_stories')}
+        self.app.put('/edit_profile', headers=self.headers, data={'username': 'renamed'})
+        for listing, response in listings.items():
+            refreshed = self.revalidate(listing, response)
+            self.assertEqual(refreshed.status_code, 200, listing)
+            self.assertIn('renamed', refreshed.get_data(as_text=True), listing)
+        self.assertEqual(self.revalidate(url, second, self.headers).status_code, 200)
+
+    def test_if_modified_since(self):
+        """Test that If-Modified-Since is honoured when there is no If-None-Match."""
+        first = self.app.get('/get_tags')
+        last_modified = first.headers['Last-Modified']
+        self.assertEqual(self.app.get('/get_tags', headers={'If-Modified-Since': last_modified}).status_code, 304)
+
+        earlier = datetime.now(timezone.utc) - timedelta(days=1)
+        response = self.app.get('/get_tags', headers={
+            'If-Modified-Since': earlier.strftime('%a, %d %b %Y %H:%M:%S GMT')})
+        self.assertEqual(response.status_code, 200)
+
+        # If-None-Match takes precedence
+        response = self.app.get('/get_tags', headers={'If-Modified-Since': last_modified,
+                                                      'If-None-Match': 'W/"other"'})
+        self.assertEqual(response.status_code, 200)
+
+    def test_cached_bytes_are_sent_compressed(self):
+        """Test that cache hits send stored bytes in the negotiated encoding."""
+        for i in range(10):
+            db.session.add(Post(host=self.user, title=f'Listed post {i}', body='<p>body text</p>' * 20))
+        db.session.commit()
+
+        plain = self.app.get('/get_posts')
+        self.assertNotIn('Content-Encoding', plain.headers)
+        self.assertIn('Accept-Encoding', plain.headers['Vary'])
+        payload = main.page_cache.get('posts', 'posts_page_1_tag_None')
+        self.assertEqual(payload['data'], plain.data)
+
+        response = self.app.get('/get_posts', headers={'Accept-Encoding': 'gzip, deflate'})
+        self.assertEqual(response.headers['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(response.data), plain.data)
+        self.assertEqual(response.data, payload['encoded']['gzip'])
+        self.assertEqual(response.headers['ETag'], plain.headers['ETag'])
+
+        if responses.brotli:
+            response = self.app.get('/get_posts', headers={'Accept-Encoding': 'gzip, br'})
+            self.assertEqual(response.headers['Content-Encoding'], 'br')
+            self.assertEqual(responses.brotli.decompress(response.data), plain.data)
+
+        response = self.app.get('/get_posts', headers={'Accept-Encoding': 'gzip;q=0, identity'})
+        self.assertNotIn('Content-Encoding', response.headers)
+        self.assertEqual(json.loads(response.data)['total'], 11)
+
+    def test_small_and_uncached_bodies(self):
+        """Test that small bodies stay uncompressed and uncached ones compress on demand."""
+        response = self.app.get('/get_tags', headers={'Accept-Encoding': 'gzip'})
+        self.assertNotIn('Content-Encoding', response.headers)
+
+        db.session.get(Post, self.post.id).body = '<p>long body</p>' * 100
+        db.session.commit()
+        response = self.app.get(f'/get_post/{self.post.id}', headers={'Accept-Encoding': 'gzip'})
+        self.assertEqual(response.headers['Content-Encoding'], 'gzip')
+        self.assertEqual(json.loads(gzip.decompress(response.data))['id'], self.post.id)
+
+if __name__ == "__main__":
+    unittest.main()
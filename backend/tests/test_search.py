@@ -0,0 +1,96 @@
+import unittest
+import json
+from config import app, db
+from models import User
+from flask_jwt_extended import create_access_token
+import main
+from search import html_to_text, build_match_expression
+
+
+class SearchTestCase(unittest.TestCase):
+    def setUp(self):
+        """Set up test variables and initialize app."""
+        main.cache.init_app(app, config={'CACHE_TYPE': 'flask_caching.backends.SimpleCache'})
+        self.app = app.test_client()
+        self.app_context = app.app_context()
+        self.app_context.push()
+        db.create_all()
+        main.page_cache.clear()
+
+        user = User(username='testuser', email='test@example.com', first_name='Test')
+        user.set_password('testpassword')
+        db.session.add(user)
+        db.session.commit()
+        self.headers = {'Authorization': f'Bearer {create_access_token(identity=user.id)}'}
+
+    def tearDown(self):
+        """Clean up after each test."""
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def create_post(self, title, body):
+        """Helper method to create a post through the API."""
+        self.app.post('/create_post', headers=self.headers, json={'title': title, 'body': body})
+        return db.session.execute(db.text('SELECT max(id) FROM post')).scalar()
+
+    def search(self, query):
+        """Helper method to run a search and return the matching post titles."""
+        main.page_cache.clear()
+        data = json.loads(self.app.get('/search', query_string={'q': query}).data)
+        return [post['title'] for post in data['results']['posts']], data
+
+    def test_search_matches_body_text(self):
+        """Test that post bodies are searchable as plain text."""
+        self.create_post('Deploying apps', '<p>Use <strong>gunicorn</strong> behind nginx</p>')
+        self.create_post('Unrelated', '<p>Nothing to see</p>')
+
+        titles, data = self.search('gunicorn')
+        self.assertEqual(titles, ['Deploying apps'])
+        self.assertEqual(data['total_posts'], 1)
+        self.assertIn('<mark>gunicorn</mark>', data['results']['posts'][0]['snippet'])
+
+        titles, _ = self.search('strong')
+        self.assertEqual(titles, [])
+
+    def test_search_ranks_title_matches_first(self):
+        """Test that BM25 ranking favours title matches."""
+        self.create_post('Notes', '<p>redis is mentioned here once</p>')
+        self.create_post('Redis tips', '<p>Some tips</p>')
+
+        titles, _ = self.search('redis')
+        self.assertEqual(titles, ['Redis tips', 'Notes'])
+
+    def test_index_follows_edits_and_deletes(self):
+        """Test that the index is kept in sync with post edits and deletes."""
+        post_id = self.create_post('Original title', '<p>first body</p>')
+
+        self.app.put(f'/edit_post/{post_id}', headers=self.headers, json={'body': '<p>second body</p>'})
+        self.assertEqual(self.search('first')[0], [])
+        self.assertEqual(self.search('second')[0], ['Original title'])
+
+        self.app.delete(f'/delete_post/{post_id}', headers=self.headers)
+        self.assertEqual(self.search('second')[0], [])
+
+    def test_rebuild_search_index(self):
+        """Test that the reindex command indexes existing posts."""
+        self.create_post('Kept post', '<p>rebuild me</p>')
+        db.session.execute(db.text('DELETE FROM post_search'))
+        db.session.commit()
+        self.assertEqual(self.search('rebuild')[0], [])
+
+        result = app.test_cli_runner().invoke(args=['search-reindex'])
+        self.assertIn('Indexed 1 posts', result.output)
+        self.assertEqual(self.search('rebuild')[0], ['Kept post'])
+
+    def test_query_syntax_is_escaped(self):
+        """Test that FTS5 operators in user input are treated as plain words."""
+        self.create_post('C++ tricks', '<p>templates AND macros</p>')
+        self.assertEqual(build_match_expression('"c++" OR -'), '"c"* "OR"*')
+        self.assertIsNone(build_match_expression('!!!'))
+        self.assertEqual(self.search('c++')[0], ['C++ tricks'])
+        self.assertEqual(self.search('***')[0], [])
+        self.assertEqual(html_to_text('<p>a &amp; b</p><p>c</p>'), 'a & b c')
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,66 @@
+import unittest
+import json
+from config import app, db
+from models import User, Tag
+from flask_jwt_extended import create_access_token
+import main
+from tag_index import tag_index
+
+
+class TagSuggestTestCase(unittest.TestCase):
+    def setUp(self):
+        """Set up test variables and initialize app."""
+        main.cache.init_app(app, config={'CACHE_TYPE': 'flask_caching.backends.SimpleCache'})
+        self.app = app.test_client()
+        self.app_context = app.app_context()
+        self.app_context.push()
+        db.create_all()
+        main.page_cache.clear()
+        tag_index.reset()
+
+        user = User(username='testuser', email='test@example.com', first_name='Test')
+        db.session.add(user)
+        db.session.add_all([Tag(name='Python', post_count=3), Tag(name='pytest', post_count=5),
+                            Tag(name='rust', post_count=1)])
+        db.session.commit()
+        self.headers = {'Authorization': f'Bearer {create_access_token(identity=user.id)}'}
+
+    def tearDown(self):
+        """Clean up after each test."""
+        tag_index.reset()
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def suggest(self, prefix):
+        """Helper method to fetch the suggestions for a prefix."""
+        response = self.app.get('/tags/suggest', query_string={'prefix': prefix})
+        return [(tag['name'], tag['count']) for tag in json.loads(response.data)]
+
+    def test_suggestions_match_prefix_ignoring_case(self):
+        """Test that matching tags are returned most used first."""
+        self.assertEqual(self.suggest('PY'), [('pytest', 5), ('Python', 3)])
+        self.assertEqual(self.suggest('pyt'), [('pytest', 5), ('Python', 3)])
+        self.assertEqual(self.suggest('pyth'), [('Python', 3)])
+        self.assertEqual(self.suggest('go'), [])
+        self.assertEqual(self.app.get('/tags/suggest').status_code, 400)
+
+    def test_create_and_delete_post_update_the_index(self):
+        """Test that tags added by new posts are suggested without a reload."""
+        self.suggest('py')
+        self.app.post('/create_post', headers=self.headers,
+                      json={'title': 'Typed', 'body': 'body', 'tags': ['pydantic', 'Python']})
+        self.assertEqual(self.suggest('py'), [('pytest', 5), ('Python', 4), ('pydantic', 1)])
+
+        post_id = db.session.execute(db.text('SELECT max(id) FROM post')).scalar()
+        self.app.delete(f'/delete_post/{post_id}', headers=self.headers)
+        self.assertEqual(self.suggest('py'), [('pytest', 5), ('Python', 3), ('pydantic', 0)])
+
+    def test_get_tags_reports_counts(self):
+        """Test that the tag list reads the maintained post counts."""
+        data = json.loads(self.app.get('/get_tags').data)
+        self.assertEqual({tag['name']: tag['count'] for tag in data},
+                         {'Python': 3, 'pytest': 5, 'rust': 1})
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,70 @@
+import unittest
+import json
+from config import app, db
+from models import User, Tag
+from flask_jwt_extended import create_access_token
+import main
+from tags import resolve_tags
+from tag_index import tag_index
+
+
+class TagResolutionTestCase(unittest.TestCase):
+    def setUp(self):
+        """Set up test variables and initialize app."""
+        main.cache.init_app(app, config={'CACHE_TYPE': 'flask_caching.backends.SimpleCache'})
+        self.app = app.test_client()
+        self.app_context = app.app_context()
+        self.app_context.push()
+        db.create_all()
+        main.page_cache.clear()
+        tag_index.reset()
+
+        user = User(username='testuser', email='test@example.com', first_name='Test')
+        db.session.add(user)
+        db.session.add(Tag(name='Python'))
+        db.session.commit()
+        self.headers = {'Authorization': f'Bearer {create_access_token(identity=user.id)}'}
+
+    def tearDown(self):
+        """Clean up after each test."""
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def create_post(self, tags):
+        """Helper method to create a post with the given tags."""
+        return self.app.post('/create_post', headers=self.headers,
+                             json={'title': 'Tagged', 'body': 'body', 'tags': tags})
+
+    def test_resolve_tags_matches_normalized_names(self):
+        """Test that names differing in case or spacing resolve to one tag."""
+        tags = resolve_tags(['python', ' PYTHON ', 'Machine  learning', '', 'machine learning'])
+        self.assertEqual([tag.name for tag in tags], ['Python', 'Machine learning'])
+        self.assertEqual(tags[1].name_key, 'machine learning')
+        self.assertEqual(Tag.query.count(), 2)
+
+        self.assertEqual(resolve_tags(['MACHINE LEARNING'])[0].id, tags[1].id)
+        self.assertEqual(Tag.query.count(), 2)
+
+    def test_create_post_reuses_existing_tags(self):
+        """Test that posts share tags regardless of how they were typed."""
+        self.assertEqual(self.create_post(['python', 'Flask']).status_code, 201)
+        self.assertEqual(self.create_post(['PYTHON', 'flask', 'Flask']).status_code, 201)
+
+        counts = {tag.name: tag.post_count for tag in Tag.query.all()}
+        self.assertEqual(counts, {'Python': 2, 'Flask': 2})
+
+    def test_tag_filter_ignores_case(self):
+        """Test that listings filtered by tag match any spelling of it."""
+        self.create_post(['python'])
+        for name in ('python', 'PYTHON'):
+            data = json.loads(self.app.get('/get_posts', query_string={'tag': name}).data)
+            self.assertEqual(len(data['posts']), 1)
+
+        # A new post invalidates the listing cached under another spelling
+        self.create_post(['Python'])
+        data = json.loads(self.app.get('/get_posts', query_string={'tag': 'PYTHON'}).data)
+        self.assertEqual(len(data['posts']), 2)
+
+if __name__ == "__main__":
+    unittest.main()
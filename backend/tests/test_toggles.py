@@ -0,0 +1,113 @@
+import unittest
+import json
+from sqlalchemy import event
+from config import app, db
+from models import Post, User, Comment, post_likes
+from flask_jwt_extended import create_access_token
+import main
+from associations import has_association, insert_ignoring_conflicts, toggle_association
+
+
+class TogglesTestCase(unittest.TestCase):
+    def setUp(self):
+        """Set up test variables and initialize app."""
+        main.cache.init_app(app, config={'CACHE_TYPE': 'flask_caching.backends.SimpleCache'})
+        self.app = app.test_client()
+        self.app_context = app.app_context()
+        self.app_context.push()
+        db.create_all()
+        main.page_cache.clear()
+
+        self.user = User(username='testuser', email='test@example.com', first_name='Test')
+        db.session.add(self.user)
+        posts = [Post(host=self.user, title=f'Post {i}', body='body') for i in range(50)]
+        db.session.add_all(posts)
+        db.session.flush()
+        self.comment = Comment(user=self.user, post_id=posts[0].id, body='A comment')
+        db.session.add(self.comment)
+        # The user has already liked and bookmarked every other post
+        self.user.liked_posts.extend(posts[1:])
+        self.user.bookmarked_posts.extend(posts[1:])
+        db.session.commit()
+        self.post_id = posts[0].id
+        self.headers = {'Authorization': f'Bearer {create_access_token(identity=self.user.id)}'}
+
+    def tearDown(self):
+        """Clean up after each test."""
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def count_statements(self, method, url):
+        """Helper method to count the SQL statements a request executes."""
+        statements = []
+
+        def record(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        event.listen(db.engine, "before_cursor_execute", record)
+        try:
+            response = method(url, headers=self.headers)
+        finally:
+            event.remove(db.engine, "before_cursor_execute", record)
+        return json.loads(response.data), statements
+
+    def test_toggles_never_load_collections(self):
+        """Test that toggling and probing touch single rows, not the user's collections."""
+        for url in (f'/like_post/{self.post_id}', f'/bookmark_post/{self.post_id}',
+                    f'/is_liked/{self.post_id}', f'/is_bookmarked/{self.post_id}',
+                    f'/like_comment/{self.comment.id}', f'/is_comment_liked/{self.comment.id}'):
+            method = self.app.get if url.startswith('/is_') else self.app.post
+            _, statements = self.count_statements(method, url)
+            self.assertLessEqual(len(statements), 8, url)
+            # Collection loads join the association table to the owner table
+            for statement in statements:
+                self.assertNotRegex(statement, r'JOIN|FROM \w+, \w+', url)
+
+    def test_toggle_results(self):
+        """Test that toggles report membership and counts from the counter columns."""
+        data, _ = self.count_statements(self.app.post, f'/like_post/{self.post_id}')
+        self.assertEqual((data['isLiked'], data['likes']), (True, 1))
+        data, _ = self.count_statements(self.app.get, f'/is_liked/{self.post_id}')
+        self.assertTrue(data['isLiked'])
+        data, _ = self.count_statements(self.app.post, f'/like_post/{self.post_id}')
+        self.assertEqual((data['isLiked'], data['likes']), (False, 0))
+
+        data, _ = self.count_statements(self.app.post, f'/bookmark_post/{self.post_id}')
+        self.assertEqual((data['isBookmarked'], data['bookmarks']), (True, 1))
+
+        data, _ = self.count_statements(self.app.post, f'/like_comment/{self.comment.id}')
+        self.assertEqual((data['isLiked'], data['likes']), (True, 1))
+        data, _ = self.count_statements(self.app.get, f'/is_comment_liked/{self.comment.id}')
+        self.assertTrue(data['isLiked'])
+
+    def test_existing_row_is_not_counted_twice(self):
+        """Test that an insert losing a race to another request leaves the counter alone."""
+        key = {'post_id': self.post_id, 'user_id': self.user.id}
+        self.assertEqual(insert_ignoring_conflicts(post_likes, [key], list(key)), 1)
+        self.assertEqual(insert_ignoring_conflicts(post_likes, [key], list(key)), 0)
+        self.assertTrue(has_association(post_likes, **key))
+
+        self.assertFalse(toggle_association(post_likes, Post.like_count, self.post_id, **key))
+        self.assertFalse(has_association(post_likes, **key))
+
+    def test_viewer_state_batches_lookups(self):
+        """Test that viewer state for many IDs takes one query per association table."""
+        self.app.post(f'/like_comment/{self.comment.id}', headers=self.headers)
+        post_ids = Post.query.with_entities(Post.id).order_by(Post.id).limit(3).all()
+        post_ids = [post_id for post_id, in post_ids]
+
+        data, statements = self.count_statements(
+            self.app.get, f'/viewer_state?post_ids={",".join(map(str, post_ids))}&comment_ids={self.comment.id},999')
+        self.assertEqual(data['posts'][str(post_ids[0])], {'isLiked': False, 'isBookmarked': False})
+        self.assertEqual(data['posts'][str(post_ids[1])], {'isLiked': True, 'isBookmarked': True})
+        self.assertEqual(data['comments'], {str(self.comment.id): {'isLiked': True}, '999': {'isLiked': False}})
+        self.assertEqual(len([statement for statement in statements if statement.lstrip().startswith('SELECT')]), 3)
+
+        response = self.app.get('/viewer_state?post_ids=1,x', headers=self.headers)
+        self.assertEqual(response.status_code, 400)
+        response = self.app.get('/viewer_state?post_ids=' + ','.join(map(str, range(500))), headers=self.headers)
+        self.assertEqual(response.status_code, 400)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,129 @@
+import unittest
+import json
+import time
+from datetime import datetime, timezone
+from config import app, db
+from models import Post, User
+from flask_jwt_extended import create_access_token
+import main
+from trending import MemoryTrendingStore, TrendingIndex, REBASE_AFTER_HALF_LIVES
+
+HOUR = 3600
+
+
+class TrendingTestCase(unittest.TestCase):
+    def setUp(self):
+        """Set up test variables and initialize app."""
+        main.cache.init_app(app, config={'CACHE_TYPE': 'flask_caching.backends.SimpleCache'})
+        main.trending_index.store = MemoryTrendingStore()
+        self.app = app.test_client()
+        self.app_context = app.app_context()
+        self.app_context.push()
+        db.create_all()
+        main.page_cache.clear()
+
+        self.user = User(username='testuser', email='test@example.com', first_name='Test')
+        db.session.add(self.user)
+        for i in range(3):
+            db.session.add(Post(host=self.user, title=f'Post {i}', body='body'))
+        db.session.commit()
+        self.headers = {'Authorization': f'Bearer {create_access_token(identity=self.user.id)}'}
+
+    def tearDown(self):
+        """Clean up after each test."""
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def trending_titles(self):
+        """Helper method to fetch the trending story titles."""
+        return [story['title'] for story in json.loads(self.app.get('/trending_stories').data)]
+
+    def test_decay_favours_recent_engagement(self):
+        """Test that recent events outweigh more numerous older ones."""
+        index = TrendingIndex(MemoryTrendingStore(), half_life=HOUR)
+        now = 1_000_000.0
+        for _ in range(3):
+            index.record(1, 1.0, timestamp=now - 4 * HOUR)
+        index.record(2, 1.0, timestamp=now)
+
+        self.assertEqual([post_id for post_id, _ in index.top(2)], [2, 1])
+        index.record(1, 1.0, timestamp=now)
+        self.assertEqual([post_id for post_id, _ in index.top(2)], [1, 2])
+
+    def test_rebase_preserves_ranking(self):
+        """Test that moving the epoch forward rescales scores without reordering them."""
+        index = TrendingIndex(MemoryTrendingStore(), half_life=1.0)
+        index.record(1, 1.0, timestamp=0.0)
+        index.record(2, 3.0, timestamp=0.0)
+        index.record(3, 1.0, timestamp=REBASE_AFTER_HALF_LIVES + 10)
+
+        self.assertEqual(index.store.get_epoch(), REBASE_AFTER_HALF_LIVES + 10)
+        self.assertEqual([post_id for post_id, _ in index.top(3)], [3, 2, 1])
+        self.assertLess(max(score for _, score in index.store.top(3)), 2.0)
+
+    def test_endpoint_follows_likes_comments_and_bookmarks(self):
+        """Test that engagement updates the trending ranking."""
+        posts = {post.title: post.id for post in Post.query.all()}
+        self.app.post(f"/like_post/{posts['Post 0']}", headers=self.headers)
+        self.assertEqual(self.trending_titles(), ['Post 0', 'Post 2', 'Post 1'])
+
+        self.app.post(f"/add_comment/{posts['Post 1']}", headers=self.headers, json={'content': 'Nice'})
+        self.assertEqual(self.trending_titles(), ['Post 1', 'Post 0', 'Post 2'])
+
+        self.app.post(f"/bookmark_post/{posts['Post 2']}", headers=self.headers)
+        self.assertEqual(self.trending_titles(), ['Post 1', 'Post 2', 'Post 0'])
+
+        self.app.delete(f"/delete_post/{posts['Post 1']}", headers=self.headers)
+        self.assertEqual(self.trending_titles(), ['Post 2', 'Post 0'])
+
+    def test_backfill_command(self):
+        """Test that the backfill command scores posts from their counters."""
+        post = Post.query.filter_by(title='Post 1').first()
+        post.like_count = 5
+        db.session.commit()
+
+        result = app.test_cli_runner().invoke(args=['trending-backfill'])
+        self.assertIn('Scored 1 posts', result.output)
+        self.assertEqual(self.trending_titles(), ['Post 1', 'Post 2', 'Post 0'])
+
+    def test_unlike_and_unbookmark_withdraw_weight(self):
+        """Test that undoing a like, bookmark or comment takes its weight back off the score."""
+        posts = {post.title: post.id for post in Post.query.all()}
+        self.app.post(f"/like_post/{posts['Post 0']}", headers=self.headers)
+        self.app.post(f"/bookmark_post/{posts['Post 0']}", headers=self.headers)
+        self.app.post(f"/like_post/{posts['Post 1']}", headers=self.headers)
+        self.assertEqual(self.trending_titles(), ['Post 0', 'Post 1', 'Post 2'])
+
+        self.app.post(f"/bookmark_post/{posts['Post 0']}", headers=self.headers)
+        self.app.post(f"/like_post/{posts['Post 0']}", headers=self.headers)
+        self.app.post(f"/add_comment/{posts['Post 2']}", headers=self.headers, json={'content': 'Nice'})
+        self.app.delete('/delete_comment/1', headers=self.headers)
+        scores = dict(main.trending_index.top(10))
+        self.assertAlmostEqual(scores[posts['Post 1']], 1.0, places=3)
+        self.assertLess(scores.get(posts['Post 0'], 0), 0.001)
+        self.assertLess(scores.get(posts['Post 2'], 0), 0.001)
+
+    def test_withdraw_at_event_time(self):
+        """Test that a withdrawal is weighed at the time of the event it undoes."""
+        index = TrendingIndex(MemoryTrendingStore(), half_life=HOUR)
+        liked = time.time() - 5 * HOUR
+        for _ in range(10):
+            index.record(1, 1.0, timestamp=liked)
+        index.withdraw(1, 1.0, datetime.fromtimestamp(liked, timezone.utc).replace(tzinfo=None))
+        [(post_id, score)] = index.top(10)
+        self.assertEqual(post_id, 1)
+        self.assertAlmostEqual(score, 9 * 2.0 ** -5, places=3)
+
+    def test_withdrawal_never_goes_below_zero(self):
+        """Test that withdrawing more than a post's score leaves it at zero, out of the ranking."""
+        index = TrendingIndex(MemoryTrendingStore(), half_life=HOUR)
+        index.record(1, 1.0)
+        index.withdraw(1, 5.0)
+        index.withdraw(2, 1.0)
+        self.assertEqual(index.top(10), [])
+        self.assertEqual(index.store.score(1), 0)
+        self.assertIsNone(index.store.score(2))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,142 @@
+import unittest
+import queue
+import threading
+import time
+from redis.exceptions import ConnectionError
+from flask_caching import Cache
+from config import app
+from caching import DependencyCache, LocalCache
+
+
+class FakeRedis:
+    """In-memory stand-in for the Redis pub/sub API used by the cache."""
+
+    def __init__(self):
+        self.subscribers = []
+        self.lock = threading.Lock()
+
+    def publish(self, channel, data):
+        with self.lock:
+            for subscriber_channel, messages in self.subscribers:
+                if subscriber_channel == channel:
+                    messages.put({"type": "message", "channel": channel, "data": data})
+
+    def pubsub(self, ignore_subscribe_messages=False):
+        return FakePubSub(self)
+
+
+class FakePubSub:
+    def __init__(self, redis):
+        self.redis = redis
+        self.messages = queue.Queue()
+
+    def subscribe(self, channel):
+        with self.redis.lock:
+            self.redis.subscribers.append((channel, self.messages))
+
+    def listen(self):
+        while True:
+            yield self.messages.get()
+
+
+class UnreachableBackend:
+    """Cache backend that fails like a Redis server that is down."""
+
+    def __getattr__(self, name):
+        def fail(*args, **kwargs):
+            raise ConnectionError("Connection refused")
+        return fail
+
+
+class UnreachableCache(UnreachableBackend):
+    cache = UnreachableBackend()
+
+
+class TwoTierCacheTestCase(unittest.TestCase):
+    def setUp(self):
+        """Set up two workers sharing one cache and one pub/sub broker."""
+        self.app_context = app.app_context()
+        self.app_context.push()
+        self.shared = Cache(app, config={'CACHE_TYPE': 'flask_caching.backends.SimpleCache'})
+        self.redis = FakeRedis()
+        self.worker_a = DependencyCache(self.shared, LocalCache(), self.redis)
+        self.worker_b = DependencyCache(self.shared, LocalCache(), self.redis)
+
+    def tearDown(self):
+        """Clean up after each test."""
+        self.app_context.pop()
+
+    def wait_for(self, condition, timeout=2):
+        """Helper method to wait for a pub/sub message to be applied."""
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if condition():
+                return True
+            time.sleep(0.01)
+        return False
+
+    def test_local_hits_skip_the_shared_cache(self):
+        """Test that a repeated read is served from process memory."""
+        self.worker_a.set('posts', 'page_1', ['post'], depends_on=['listing:all'])
+        self.shared.clear()
+
+        self.assertEqual(self.worker_a.get('posts', 'page_1'), ['post'])
+        self.assertEqual(self.worker_a.stats()['posts'], {'hits': 1, 'local_hits': 1, 'misses': 0})
+
+    def test_shared_hits_fill_the_local_cache(self):
+        """Test that another worker's entry is found in the shared cache."""
+        self.worker_a.set('tags', 'all_tags', ['python'], depends_on=['tags'])
+
+        self.assertEqual(self.worker_b.get('tags', 'all_tags'), ['python'])
+        self.assertEqual(self.worker_b.get('tags', 'all_tags'), ['python'])
+        self.assertEqual(self.worker_b.stats()['tags'], {'hits': 2, 'local_hits': 1, 'misses': 0})
+
+    def test_invalidation_reaches_other_workers(self):
+        """Test that an invalidation is broadcast to every worker's local cache."""
+        self.worker_a.set('tags', 'all_tags', ['python'], depends_on=['tags'])
+        self.worker_b.get('tags', 'all_tags')
+        self.assertEqual(len(self.worker_b.local), 1)
+
+        self.worker_a.invalidate('tags')
+        self.assertTrue(self.wait_for(lambda: len(self.worker_b.local) == 0))
+        self.assertIsNone(self.worker_b.get('tags', 'all_tags'))
+        self.assertIsNone(self.worker_a.get('tags', 'all_tags'))
+
+    def test_local_cache_is_bounded_and_expires(self):
+        """Test LRU eviction and TTL expiry of the local cache."""
+        local = LocalCache(max_entries=2, ttl=60)
+        local.set('a', 1)
+        local.set('b', 2)
+        local.get('a')
+        local.set('c', 3)
+        self.assertEqual((local.get('a'), local.get('b'), local.get('c')), (1, None, 3))
+
+        local.set('d', 4, timeout=0.01)
+        time.sleep(0.02)
+        self.assertIsNone(local.get('d'))
+
+    def test_degrades_to_local_cache_without_redis(self):
+        """Test that reads and writes keep working while Redis is down."""
+        cache = DependencyCache(UnreachableCache(), LocalCache())
+        with self.assertLogs('caching', level='WARNING'):
+            cache.set('posts', 'page_1', ['post'], depends_on=['post:1'])
+        self.assertEqual(cache.get('posts', 'page_1'), ['post'])
+
+        cache.invalidate('post:1')
+        self.assertIsNone(cache.get('posts', 'page_1'))
+
+    def test_pending_invalidations_replay_after_outage(self):
+        """Test that invalidations made during an outage are applied once Redis is back."""
+        self.worker_a.set('tags', 'all_tags', ['python'], depends_on=['tags'])
+
+        self.worker_b._shared_down_until = time.monotonic() + 60
+        self.worker_b.invalidate('tags')
+        self.assertEqual(self.worker_a.get('tags', 'all_tags'), ['python'])
+
+        self.worker_b._shared_down_until = 0
+        self.worker_b.get('posts', 'page_1')
+        self.assertTrue(self.wait_for(lambda: len(self.worker_a.local) == 0))
+        self.assertIsNone(self.worker_a.get('tags', 'all_tags'))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,285 @@
+"""
+Trending stories for the DevHub API
+
+Posts are ranked by a time-decayed engagement score that is updated as likes,
+comments and bookmarks happen, so reading the top stories never aggregates
+over the association tables.
+
+Every event adds weight * 2^((t - epoch) / half_life) to the post's stored
+score, and undoing it (an unlike, unbookmark or comment deletion) subtracts
+the same for the time the event happened, never taking the score below zero.
+Because all stored scores share the same epoch, ordering them gives the
+ranking by decayed score at any moment, and the score decayed to now is
+the stored score times 2^(-(now - epoch) / half_life). Older events therefore
+never need to be rewritten; the stored scores are only rescaled when the
+epoch moves forward, which keeps them within floating point range.
+
+Scores live in a Redis sorted set, or in process memory when TRENDING_STORE
+is set to "memory". `flask trending-backfill` rebuilds them from the post
+counters.
+"""
+
+import bisect
+import logging
+import threading
+import time
+from datetime import timezone
+import click
+from redis.exceptions import RedisError, WatchError
+from config import app, db, redis_client
+from models import Post
+
+logger = logging.getLogger(__name__)
+
+LIKE_WEIGHT = 1.0
+BOOKMARK_WEIGHT = 2.0
+COMMENT_WEIGHT = 3.0
+
+# Move the epoch forward once stored scores have grown by 2^64
+REBASE_AFTER_HALF_LIVES = 64
+
+
+class MemoryTrendingStore:
+    """Sorted scores held in process memory."""
+
+    def __init__(self):
+        self.epoch = None
+        self._scores = {}
+        self._ranking = []
+        self._lock = threading.Lock()
+
+    def get_epoch(self):
+        return self.epoch
+
+    def set_epoch(self, epoch, expected=None, factor=1.0):
+        """Moves the epoch and rescales every score, unless it changed meanwhile."""
+        with self._lock:
+            if self.epoch != expected:
+                return False
+            self._scores = {post_id: score * factor for post_id, score in self._scores.items()}
+            self._ranking = sorted((score, post_id) for post_id, score in self._scores.items())
+            self.epoch = epoch
+            return True
+
+    def increment(self, post_id, amount):
+        with self._lock:
+            old = self._scores.get(post_id)
+            if old is not None:
+                del self._ranking[bisect.bisect_left(self._ranking, (old, post_id))]
+            score = (old or 0.0) + amount
+            self._scores[post_id] = score
+            bisect.insort(self._ranking, (score, post_id))
+
+    def score(self, post_id):
+        with self._lock:
+            return self._scores.get(post_id)
+
+    def remove(self, post_id):
+        with self._lock:
+            old = self._scores.pop(post_id, None)
+            if old is not None:
+                del self._ranking[bisect.bisect_left(self._ranking, (old, post_id))]
+
+    def top(self, count):
+        with self._lock:
+            return [(post_id, score) for score, post_id in reversed(self._ranking[-count:])]
+
+    def replace(self, scores, epoch):
+        with self._lock:
+            self._scores = dict(scores)
+            self._ranking = sorted((score, post_id) for post_id, score in self._scores.items())
+            self.epoch = epoch
+
+
+class RedisTrendingStore:
+    """Sorted scores held in a Redis sorted set shared by every worker."""
+
+    def __init__(self, client, key="trending:scores"):
+        self.client = client
+        self.key = key
+        self.epoch_key = f"{key}:epoch"
+
+    def get_epoch(self):
+        epoch = self.client.get(self.epoch_key)
+        return float(epoch) if epoch is not None else None
+
+    def set_epoch(self, epoch, expected=None, factor=1.0):
+        """Moves the epoch and rescales every score, unless it changed meanwhile."""
+        with self.client.pipeline() as pipe:
+            try:
+                pipe.watch(self.epoch_key)
+                current = pipe.get(self.epoch_key)
+                if (float(current) if current is not None else None) != expected:
+                    return False
+                pipe.multi()
+                if factor != 1.0:
+                    pipe.zunionstore(self.key, {self.key: factor})
+                pipe.set(self.epoch_key, epoch)
+                pipe.execute()
+                return True
+            except WatchError:
+                return False
+
+    def increment(self, post_id, amount):
+        self.client.zincrby(self.key, amount, post_id)
+
+    def score(self, post_id):
+        return self.client.zscore(self.key, post_id)
+
+    def remove(self, post_id):
+        self.client.zrem(self.key, post_id)
+
+    def top(self, count):
+        return [(int(post_id), score) for post_id, score in
+                self.client.zrevrange(self.key, 0, count - 1, withscores=True)]
+
+    def replace(self, scores, epoch, batch_size=5000):
+        staging_key = f"{self.key}:staging"
+        self.client.delete(staging_key)
+        items = list(scores.items())
+        for start in range(0, len(items), batch_size):
+            self.client.zadd(staging_key, dict(items[start:start + batch_size]))
+        with self.client.pipeline() as pipe:
+            if items:
+                pipe.rename(staging_key, self.key)
+            else:
+                pipe.delete(self.key)
+            pipe.set(self.epoch_key, epoch)
+            pipe.execute()
+
+
+def database_timestamp(value):
+    """Converts a timestamp read from the database to seconds since the Unix epoch."""
+    # SQLite stores CURRENT_TIMESTAMP values as naive UTC
+    return value.replace(tzinfo=timezone.utc).timestamp()
+
+
+class TrendingIndex:
+    """Time-decayed engagement ranking of posts.
+
+    Args:
+        store: MemoryTrendingStore or RedisTrendingStore holding the scores
+        half_life (float): Seconds after which an event counts half as much
+    """
+
+    def __init__(self, store, half_life):
+        self.store = store
+        self.half_life = half_life
+
+    def _epoch(self, now):
+        """Returns the current epoch, moving it forward when scores grow too large."""
+        epoch = self.store.get_epoch()
+        if epoch is None:
+            self.store.set_epoch(now, expected=None)
+            return self.store.get_epoch()
+        elapsed_half_lives = (now - epoch) / self.half_life
+        if elapsed_half_lives > REBASE_AFTER_HALF_LIVES:
+            if self.store.set_epoch(now, expected=epoch, factor=2.0 ** -elapsed_half_lives):
+                return now
+            return self.store.get_epoch()
+        return epoch
+
+    def weight_at(self, timestamp, epoch):
+        """Scales an event weight to the epoch of the stored scores."""
+        return 2.0 ** ((timestamp - epoch) / self.half_life)
+
+    def record(self, post_id, weight, timestamp=None):
+        """Adds an engagement event to a post's score.
+
+        Failures are logged rather than raised; the backfill command repairs
+        scores that missed events.
+        """
+        now = timestamp if timestamp is not None else time.time()
+        try:
+            epoch = self._epoch(now)
+            self.store.increment(post_id, weight * self.weight_at(now, epoch))
+        except RedisError as exc:
+            logger.warning("Could not update trending score of post %s: %s", post_id, exc)
+
+    def withdraw(self, post_id, weight, happened=None):
+        """Takes an undone engagement event back off a post's score.
+
+        Args:
+            post_id (int): ID of the post
+            weight (float): Weight the event was recorded with
+            happened (datetime, optional): When the event was recorded, as the
+                database stores it; events without a known time are withdrawn
+                at the current time
+
+        The score never drops below zero, and the post keeps its place in the
+        store until it is deleted.
+        """
+        now = time.time()
+        timestamp = database_timestamp(happened) if happened is not None else now
+        try:
+            epoch = self._epoch(now)
+            amount = weight * self.weight_at(timestamp, epoch)
+            score = self.store.score(post_id)
+            if score:
+                self.store.increment(post_id, -min(amount, score))
+        except RedisError as exc:
+            logger.warning("Could not update trending score of post %s: %s", post_id, exc)
+
+    def remove(self, post_id):
+        """Drops a post from the ranking."""
+        try:
+            self.store.remove(post_id)
+        except RedisError as exc:
+            logger.warning("Could not remove post %s from trending: %s", post_id, exc)
+
+    def top(self, count=10):
+        """Returns the highest ranked posts as (post_id, score decayed to now) pairs.
+
+        Returns None if the scores cannot be read.
+        """
+        try:
+            epoch = self.store.get_epoch()
+            ranked = self.store.top(count)
+        except RedisError as exc:
+            logger.warning("Could not read trending scores: %s", exc)
+            return None
+        if epoch is None:
+            return []
+        decay = self.weight_at(epoch, time.time())
+        # Posts whose every event was undone keep a score of zero
+        return [(post_id, score * decay) for post_id, score in ranked if score > 0]
+
+    def rebuild(self, batch_size=1000):
+        """Rebuilds every score from the post counters.
+
+        Counted events are treated as if they happened when the post was
+        created, so older posts start out with lower scores.
+
+        Returns:
+            int: Number of posts with a score
+        """
+        epoch = time.time()
+        scores = {}
+        rows = db.session.execute(
+            db.select(Post.id, Post.created, Post.like_count, Post.bookmark_count, Post.comment_count)
+            .execution_options(yield_per=batch_size)
+        )
+        for post_id, created, likes, bookmarks, comments in rows:
+            engagement = likes * LIKE_WEIGHT + bookmarks * BOOKMARK_WEIGHT + comments * COMMENT_WEIGHT
+            if engagement and created:
+                scores[post_id] = engagement * self.weight_at(database_timestamp(created), epoch)
+        self.store.replace(scores, epoch)
+        return len(scores)
+
+
+def create_trending_index():
+    """Builds the trending index configured for the app."""
+    if app.config["TRENDING_STORE"] == "memory":
+        store = MemoryTrendingStore()
+    else:
+        store = RedisTrendingStore(redis_client)
+    return TrendingIndex(store, app.config["TRENDING_HALF_LIFE_HOURS"] * 3600)
+
+
+trending_index = create_trending_index()
+
+
+@app.cli.command("trending-backfill")
+def trending_backfill_command():
+    """Rebuilds the trending scores from the post counters."""
+    click.echo(f"Scored {trending_index.rebuild()} posts.")
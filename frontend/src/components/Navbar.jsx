@@ -324,7 +324,7 @@ export default function Navbar({ showWriteStory = true }) {
                       <div className="relative cursor-pointer hidden md:block">
                         <Avatar>
                           <AvatarImage
-                            src={`${API_URL}/uploads/${userData.profile_pic}`}
+                            src={`${API_URL}/uploads/${userData.avatars?.["128"] ?? userData.profile_pic}`}
                             alt="User"
                           />
                           <AvatarFallback className="bg-gradient-to-br from-blue-500 to-purple-600 text-white">
@@ -489,7 +489,7 @@ export default function Navbar({ showWriteStory = true }) {
                       <div className="flex items-center gap-4">
                         <Avatar>
                           <AvatarImage
-                            src={`${API_URL}/uploads/${userData.profile_pic}`}
+                            src={`${API_URL}/uploads/${userData.avatars?.["128"] ?? userData.profile_pic}`}
                             alt="User"
                           />
                           <AvatarFallback className="bg-gradient-to-br from-blue-500 to-purple-600 text-white">
@@ -17,6 +17,7 @@ export default function CreatePost() {
   const [tags, setTags] = useState([]);
   const [availableTags, setAvailableTags] = useState([]);
   const [newTag, setNewTag] = useState('');
+  const [suggestedTags, setSuggestedTags] = useState([]);
   const [isLoading, setIsLoading] = useState(false);
   const [error, setError] = useState(null);
   const quillWrapperRef = useRef(null);
@@ -73,6 +74,24 @@ export default function CreatePost() {
     }
   };
 
+  useEffect(() => {
+    const prefix = newTag.trim();
+    if (!prefix) {
+      setSuggestedTags([]);
+      return;
+    }
+    const controller = new AbortController();
+    fetch(`${API_URL}/tags/suggest?prefix=${encodeURIComponent(prefix)}`, { signal: controller.signal })
+      .then(response => (response.ok ? response.json() : []))
+      .then(data => setSuggestedTags(data.map(tag => tag.name)))
+      .catch(error => {
+        if (error.name !== 'AbortError') {
+          console.error('Error fetching tag suggestions:', error);
+        }
+      });
+    return () => controller.abort();
+  }, [newTag]);
+
   const handleTagClick = (tag) => {
     if (!tags.includes(tag)) {
       setTags([...tags, tag]);
@@ -171,9 +190,9 @@ export default function CreatePost() {
                     <Button type="button" onClick={handleAddNewTag}>Add Tag</Button>
                   </div>
                   <div className="mt-2">
-                    <p className="text-sm text-gray-400 mb-1">Available tags:</p>
+                    <p className="text-sm text-gray-400 mb-1">{newTag.trim() ? 'Suggested tags:' : 'Available tags:'}</p>
                     <div className="flex flex-wrap gap-2">
-                      {availableTags.map((tag, index) => (
+                      {(newTag.trim() ? suggestedTags : availableTags).map((tag, index) => (
                         <button
                           key={index}
                           type="button"
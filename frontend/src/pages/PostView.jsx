@@ -68,7 +68,6 @@ export default function PostView() {
   useEffect(() => {
     if (post) {
       setLikeCount(post.likes);
-      checkIfLiked();
     }
   }, [post]);
 
@@ -91,27 +90,31 @@ export default function PostView() {
       const currentUserId = getCurrentUserId();
       setIsOwner(currentUserId === data.host_id);
 
-      // Fetch bookmark status
-      fetchBookmarkStatus(postId);
+      // Fetch like and bookmark status
+      fetchViewerState(postId);
     } catch (error) {
       console.error('Error fetching post details:', error);
     }
   };
 
-  const fetchBookmarkStatus = async (postId) => {
+  const fetchViewerState = async (postId) => {
     try {
-      const response = await fetch(`${API_URL}/is_bookmarked/${postId}`, {
+      const response = await fetch(`${API_URL}/viewer_state?post_ids=${postId}`, {
         headers: {
           Authorization: `Bearer ${getToken()}`,
         },
       });
       if (!response.ok) {
-        throw new Error('Network response was not ok (bookmark status)');
+        throw new Error('Network response was not ok (viewer state)');
       }
       const data = await response.json();
-      setIsBookmarked(data.isBookmarked);
+      const state = data.posts[postId];
+      if (state) {
+        setIsLiked(state.isLiked);
+        setIsBookmarked(state.isBookmarked);
+      }
     } catch (error) {
-      console.error('Error fetching bookmark status:', error);
+      console.error('Error fetching like and bookmark status:', error);
     }
   };
 
@@ -143,21 +146,6 @@ export default function PostView() {
     }
   };
 
-  const checkIfLiked = async () => {
-    try {
-      const response = await fetch(`${API_URL}/is_liked/${id}`, {
-        headers: {
-          Authorization: `Bearer ${getToken()}`,
-        },
-      });
-      if (!response.ok) throw new Error('Failed to check like status');
-      const data = await response.json();
-      setIsLiked(data.isLiked);
-    } catch (error) {
-      console.error('Error checking like status:', error);
-    }
-  };
-
   const handleComment = async () => {
     if (newComment.trim()) {
       try {